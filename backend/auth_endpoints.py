@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import jwt
 import bcrypt
@@ -15,14 +16,19 @@ from typing import Optional
 from sqlalchemy.exc import IntegrityError
 
 # Import our database models and dependencies
-from database_models import get_db, User, StudyHours, CurriculumData
+from database_models import get_async_db, User, StudyHours, CurriculumData
 from utils import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     SECRET_KEY,
     ALGORITHM,
     create_access_token,
+    create_user_access_token,
     verify_token,
+    get_current_user,
+    invalidate_cached_user,
+    revoke_user_tokens,
+    CurrentUser,
 )
 
 # Create router for authentication endpoints
@@ -55,11 +61,11 @@ class UserResponse(BaseModel):
 # Authentication endpoints
 
 @auth_router.post("/register", response_model=TokenResponse)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user with email verification"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -67,7 +73,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         )
      
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         password_hash=hashed_password,
@@ -76,16 +82,17 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     
     db.add(new_user)
     try:
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        invalidate_cached_user(new_user.email)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Registration failed",
@@ -94,8 +101,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user_data.email}, expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        new_user, expires_delta=access_token_expires
     )
     
     return TokenResponse(
@@ -111,11 +118,11 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @auth_router.post("/login", response_model=TokenResponse)
-async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
     
     # Find user
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await db.scalar(select(User).where(User.email == user_data.email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -123,7 +130,7 @@ async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(user_data.password, user.password_hash):
+    if not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -131,8 +138,8 @@ async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        user, expires_delta=access_token_expires
     )
     
     return TokenResponse(
@@ -146,16 +153,9 @@ async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
     )
 
 @auth_router.get("/me", response_model=UserResponse)
-async def get_current_user(current_user_email: str = Depends(verify_token), db: Session = Depends(get_db)):
+async def read_current_user(user: CurrentUser = Depends(get_current_user)):
     """Get current user information"""
     
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     return UserResponse(
         id=user.id,
         email=user.email,
@@ -163,5 +163,21 @@ async def get_current_user(current_user_email: str = Depends(verify_token), db:
         created_at=user.created_at
     )
 
+@auth_router.post("/revoke-tokens", response_model=dict)
+async def revoke_tokens(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Revoke every access token issued to the current user (log out everywhere)"""
+    
+    token_version = await db.scalar(
+        update(User)
+        .where(User.id == user.id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+    await db.commit()
+    
+    revoke_user_tokens(user.id, user.email, token_version)
+    
+    return {"message": "All access tokens have been revoked"}
+
 # Include the router in main app
 # This will be imported in main.py
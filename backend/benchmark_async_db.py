@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the async database layer
+Compares p50/p95/p99 latency under concurrent load for a handler that uses the
+blocking sync Session (old pattern) against one that uses the AsyncSession.
+Each request simulates a slow Postgres round trip with pg_sleep.
+
+Usage: python benchmark_async_db.py [--requests 200] [--rate 150] [--delay 0.02]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import SessionLocal, get_async_db, async_engine
+
+# Keep SQL echo out of the benchmark output
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+logging.getLogger("sqlalchemy.engine.Engine").disabled = True
+
+bench_app = FastAPI()
+
+@bench_app.get("/sync")
+async def sync_query(delay: float):
+    """Old pattern: sync Session call inside an async handler (blocks the event loop)"""
+    # The session is opened inline so its connection goes back to the pool right away;
+    # with the get_db dependency the blocked loop can't run the teardown and the pool starves
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_sleep(:delay)"), {"delay": delay})
+    return {"ok": True}
+
+@bench_app.get("/async")
+async def async_query(delay: float, db: AsyncSession = Depends(get_async_db)):
+    """New pattern: AsyncSession call (yields to the event loop while waiting)"""
+    await db.execute(text("SELECT pg_sleep(:delay)"), {"delay": delay})
+    return {"ok": True}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+async def run_load(client, path, total_requests, rate, delay):
+    """Open-loop load: start a request every 1/rate seconds, measure from its scheduled start"""
+    latencies = []
+
+    async def one_request(scheduled):
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.get(path, params={"delay": delay})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - scheduled)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(started + i / rate) for i in range(total_requests)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+def report(name, latencies, elapsed):
+    print(f"{name:>6}: p50={statistics.median(latencies) * 1000:8.1f}ms  "
+          f"p95={percentile(latencies, 95) * 1000:8.1f}ms  "
+          f"p99={percentile(latencies, 99) * 1000:8.1f}ms  "
+          f"throughput={len(latencies) / elapsed:8.1f} req/s")
+
+async def main(total_requests, rate, delay):
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm up both connection pools
+        await run_load(client, "/sync", 5, 100, 0)
+        await run_load(client, "/async", 5, 100, 0)
+
+        print(f"{total_requests} requests at {rate:.0f} req/s, simulated query time {delay * 1000:.0f}ms")
+        print("-" * 80)
+        report("before", *await run_load(client, "/sync", total_requests, rate, delay))
+        report("after", *await run_load(client, "/async", total_requests, rate, delay))
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync vs async session latency under concurrent load")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=150, help="request arrival rate in req/s")
+    parser.add_argument("--delay", type=float, default=0.02, help="simulated query time in seconds")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.rate, args.delay))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for JSON response serialization
+Serializes a synthetic study hours history (10k rows by default) the way
+GET /api/study-hours/all used to (build a model per row, FastAPI response_model
+validation, stdlib json) and the way it does now (rows straight to orjson), plus
+the pydantic-core path used for month summaries. No database needed.
+
+Usage: python benchmark_serialization.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# study_hours_endpoints imports database_models, which only needs a URL to build its engines
+os.environ.setdefault("DATABASE_URL", "postgresql://benchmark@localhost/benchmark")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from fast_responses import rows_response, model_response
+from study_hours_endpoints import STUDY_HOURS_COLUMNS, StudyHoursResponse, StudyHoursListResponse
+
+def make_rows(count: int) -> list:
+    """SQLAlchemy rows shaped like the GET /all query result"""
+    start = datetime(2020, 1, 1, 8, 30)
+    rows = []
+    for index in range(count):
+        day = start + timedelta(days=index)
+        rows.append((index + 1, 1, None, day.month, day.year, day.day, (index % 9) + 0.5, day, day))
+    keys = [column.key for column in STUDY_HOURS_COLUMNS]
+    return IteratorResult(SimpleResultMetaData(keys), iter(rows)).all()
+
+def model_path(rows: list) -> bytes:
+    """Old GET /all: one model per row, response_model validation, jsonable_encoder + json.dumps"""
+    models = [
+        StudyHoursResponse(
+            id=row.id,
+            user_id=row.user_id,
+            visitor_id=row.visitor_id,
+            month=row.month,
+            year=row.year,
+            day=row.day,
+            hours=row.hours,
+            created_at=row.created_at,
+            updated_at=row.updated_at
+        )
+        for row in rows
+    ]
+    field = create_response_field(name="response", type_=List[StudyHoursResponse])
+    content = asyncio.run(serialize_response(field=field, response_content=models, is_coroutine=True))
+    return JSONResponse(content).body
+
+def orjson_rows_path(rows: list) -> bytes:
+    """New GET /all: rows straight to orjson"""
+    return rows_response(rows).body
+
+def summary_model(rows: list) -> StudyHoursListResponse:
+    return StudyHoursListResponse(
+        data=[StudyHoursResponse.model_validate(row) for row in rows],
+        total_hours=0.0,
+        average_hours=0.0,
+        days_logged=len(rows),
+        max_day_hours=0.0,
+        progress_percentage=0.0
+    )
+
+def summary_response_model_path(summary: StudyHoursListResponse) -> bytes:
+    """Old month summary: FastAPI validates the returned model again, then json.dumps"""
+    field = create_response_field(name="response", type_=StudyHoursListResponse)
+    content = asyncio.run(serialize_response(field=field, response_content=summary, is_coroutine=True))
+    return JSONResponse(content).body
+
+def summary_pydantic_core_path(summary: StudyHoursListResponse) -> bytes:
+    """New month summary: serialized once by pydantic-core"""
+    return model_response(summary).body
+
+def time_per_call(function, argument, repeat: int) -> float:
+    """Best of `repeat` runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON response serialization paths")
+    parser.add_argument("--rows", type=int, default=10000, help="rows in the synthetic history")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per path (best one is reported)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    summary = summary_model(rows)
+    if model_path(rows) != orjson_rows_path(rows):
+        raise SystemExit("❌ orjson output differs from the response_model output")
+
+    results = [
+        ("GET /all, model + response_model", time_per_call(model_path, rows, args.repeat)),
+        ("GET /all, rows -> orjson", time_per_call(orjson_rows_path, rows, args.repeat)),
+        ("summary, response_model", time_per_call(summary_response_model_path, summary, args.repeat)),
+        ("summary, pydantic-core", time_per_call(summary_pydantic_core_path, summary, args.repeat)),
+    ]
+
+    print(f"Serializing {args.rows:,} study hours rows (best of {args.repeat})")
+    print("-" * 60)
+    for name, seconds in results:
+        print(f"{name:>34}: {seconds * 1000:9.1f} ms  ({args.rows / seconds:12,.0f} rows/s)")
+    print(f"GET /all: orjson rows are {results[0][1] / results[1][1]:.1f}x faster")
+    print(f"summary: pydantic-core is {results[2][1] / results[3][1]:.1f}x faster")
@@ -0,0 +1,105 @@
+"""
+Shared pytest fixtures for Win GATE
+Behavior tests drive the real app and its real SQL through an in-process ASGI
+client. The database is a throwaway SQLite file (aiosqlite), so the suite runs
+without a server; with TEST_DATABASE_URL set every test runs against that
+scratch Postgres database instead (test_query_plans.py needs it).
+
+The environment is set here, before any test module imports database_models.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCRATCH_DIR = tempfile.mkdtemp(prefix="win_gate_test_")
+
+# Never point the tests at the database from .env
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH_DIR}/win_gate_test.db"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{SCRATCH_DIR}/win_gate_test.db"
+os.environ["DB_ECHO"] = "false"
+os.environ["PENDING_SIGNUP_STORE"] = "database"
+os.environ["EMAIL_SPOOL_DIR"] = os.path.join(SCRATCH_DIR, "email_spool")
+
+def run_async(scenario):
+    """Run `await scenario()` on a fresh event loop
+
+    Pooled connections belong to the loop that opened them, so the async engine
+    is disposed before the loop closes.
+    """
+    from database_models import async_engine
+
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+@pytest.fixture(scope="session")
+def database():
+    """Tables and the curriculum catalogue, created once per test run"""
+    from curriculum_catalogue import seed_curriculum_catalogue
+    from database_models import create_tables, engine
+
+    create_tables()
+    if TEST_DATABASE_URL:
+        from migrations import run_migrations
+        run_migrations()
+    seed_curriculum_catalogue()
+    yield
+    engine.dispose()
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+@pytest.fixture
+def api(database):
+    """api(scenario) runs `await scenario(client)` with an httpx client bound to the app"""
+    import httpx
+    from main import app
+
+    def run(scenario):
+        async def with_client():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await scenario(client)
+        return run_async(with_client)
+
+    return run
+
+@pytest.fixture
+def db_session(database):
+    """db_session(scenario) runs `await scenario(db)` with an AsyncSession"""
+    from database_models import AsyncSessionLocal
+
+    def run(scenario):
+        async def with_session():
+            async with AsyncSessionLocal() as db:
+                return await scenario(db)
+        return run_async(with_session)
+
+    return run
+
+@pytest.fixture
+def visitor_id() -> str:
+    return f"visitor-{uuid.uuid4().hex[:12]}"
+
+@pytest.fixture
+def register_user():
+    """await register_user(client) -> (auth headers, user dict) for a new account"""
+    async def register(client, password: str = "test-password"):
+        email = f"test-{uuid.uuid4().hex[:12]}@example.com"
+        response = await client.post("/api/auth/register", json={"email": email, "password": password, "name": "Test"})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]
+
+    return register
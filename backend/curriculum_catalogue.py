@@ -0,0 +1,153 @@
+"""
+Shared curriculum catalogue for Win GATE
+Subjects and topics are stored once in curriculum_subjects/curriculum_topics
+and referenced by integer id from curriculum_data. The catalogue holds the GATE
+CS syllabus (seeded at startup) plus entries saved before saves were checked
+against it, so it stays small. Entries never change once created, so every
+worker keeps them in a process-wide cache and only goes to the database for
+names or ids it has not seen yet.
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from curriculum_syllabus import GATE_CS_SYLLABUS, SYLLABUS_TOPICS, unknown_topics
+from database_models import AsyncSessionLocal, CurriculumSubject, CurriculumTopic, engine
+
+# Whole-catalogue reads (load() runs them once per process; filtered lookups add a WHERE)
+SUBJECTS_QUERY = select(CurriculumSubject.id, CurriculumSubject.name)
+TOPICS_QUERY = select(CurriculumTopic.id, CurriculumTopic.subject_id, CurriculumTopic.name)
+
+def insert_subjects(names: Iterable[str]):
+    return insert(CurriculumSubject).values([{"name": name} for name in names]).on_conflict_do_nothing()
+
+def select_subject_ids(names: Iterable[str]):
+    return select(CurriculumSubject.name, CurriculumSubject.id).where(CurriculumSubject.name.in_(list(names)))
+
+def insert_topics(pairs: Iterable[Tuple[str, str]], subject_ids: Dict[str, int]):
+    return (
+        insert(CurriculumTopic)
+        .values([{"subject_id": subject_ids[subject], "name": topic} for subject, topic in pairs])
+        .on_conflict_do_nothing()
+    )
+
+def seed_curriculum_catalogue():
+    """Add the syllabus subjects and topics that are missing (idempotent, run at startup)"""
+    with engine.begin() as connection:
+        connection.execute(insert_subjects(GATE_CS_SYLLABUS))
+        subject_ids = dict(connection.execute(select_subject_ids(GATE_CS_SYLLABUS)).all())
+        connection.execute(insert_topics(sorted(SYLLABUS_TOPICS), subject_ids))
+
+class CurriculumCatalogue:
+    """Process-wide cache of subject and topic ids"""
+
+    def __init__(self):
+        self._subject_ids: Dict[str, int] = {}
+        self._subject_names: Dict[int, str] = {}
+        self._topic_ids: Dict[Tuple[str, str], int] = {}
+        self._topics: Dict[int, Tuple[int, str]] = {}   # topic id -> (subject id, topic name)
+        self._loaded = False
+
+    def _remember_subject(self, subject_id: int, name: str):
+        self._subject_ids[name] = subject_id
+        self._subject_names[subject_id] = name
+
+    def _remember_topic(self, topic_id: int, subject_id: int, name: str):
+        self._topics[topic_id] = (subject_id, name)
+        self._topic_ids[(self._subject_names[subject_id], name)] = topic_id
+
+    async def _load_subjects(self, db: AsyncSession, where=None):
+        query = SUBJECTS_QUERY if where is None else SUBJECTS_QUERY.where(where)
+        for subject_id, name in (await db.execute(query)).all():
+            self._remember_subject(subject_id, name)
+
+    async def _load_topics(self, db: AsyncSession, where=None):
+        query = TOPICS_QUERY if where is None else TOPICS_QUERY.where(where)
+        rows = (await db.execute(query)).all()
+        unknown_subjects = {subject_id for _, subject_id, _ in rows if subject_id not in self._subject_names}
+        if unknown_subjects:
+            await self._load_subjects(db, CurriculumSubject.id.in_(unknown_subjects))
+        for topic_id, subject_id, name in rows:
+            self._remember_topic(topic_id, subject_id, name)
+
+    async def _load_topics_by_name(self, db: AsyncSession, pairs: set):
+        subject_names = {subject for subject, _ in pairs}
+        if subject_names - self._subject_ids.keys():
+            await self._load_subjects(db, CurriculumSubject.name.in_(subject_names))
+        keys = [(self._subject_ids[subject], topic) for subject, topic in pairs if subject in self._subject_ids]
+        if keys:
+            await self._load_topics(db, tuple_(CurriculumTopic.subject_id, CurriculumTopic.name).in_(keys))
+
+    async def load(self, db: AsyncSession):
+        """Read the whole catalogue once per process (the syllabus plus older entries, a few hundred rows at most)"""
+        if self._loaded:
+            return
+        await self._load_subjects(db)
+        await self._load_topics(db)
+        self._loaded = True
+
+    async def subject_id(self, db: AsyncSession, name: str) -> Optional[int]:
+        """Id of a subject, or None if no one has saved progress for it yet"""
+        await self.load(db)
+        if name not in self._subject_ids and name in GATE_CS_SYLLABUS:
+            await self._load_subjects(db, CurriculumSubject.name == name)
+        return self._subject_ids.get(name)
+
+    async def subject_names(self, db: AsyncSession, subject_ids: Iterable[int]) -> Dict[int, str]:
+        """Names for subject ids, fetching ids added by other workers"""
+        await self.load(db)
+        subject_ids = set(subject_ids)
+        missing = subject_ids - self._subject_names.keys()
+        if missing:
+            await self._load_subjects(db, CurriculumSubject.id.in_(missing))
+        return {subject_id: self._subject_names[subject_id] for subject_id in subject_ids}
+
+    async def topic_names(self, db: AsyncSession, topic_ids: Iterable[int]) -> Dict[int, Tuple[str, str]]:
+        """(subject, topic) names for topic ids, fetching ids added by other workers"""
+        await self.load(db)
+        topic_ids = set(topic_ids)
+        missing = topic_ids - self._topics.keys()
+        if missing:
+            await self._load_topics(db, CurriculumTopic.id.in_(missing))
+        return {
+            topic_id: (self._subject_names[self._topics[topic_id][0]], self._topics[topic_id][1])
+            for topic_id in topic_ids
+        }
+
+    async def resolve_topic_ids(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Topic ids for syllabus (subject, topic) pairs (ValueError for any other pair)
+
+        Syllabus entries missing from the database (startup seeding did not run) are
+        added in a short transaction of its own, and their ids are only cached once it
+        committed. Call it before the request session runs its first query, so a request
+        never holds two pooled connections at once.
+        """
+        pairs = set(pairs)
+        unknown = unknown_topics(pairs)
+        if unknown:
+            raise ValueError(f"Not in the syllabus: {unknown}")
+        missing = pairs - self._topic_ids.keys()
+        if missing:
+            async with AsyncSessionLocal() as db:
+                await self.load(db)
+                missing = pairs - self._topic_ids.keys()
+                if missing:
+                    await self._load_topics_by_name(db, missing)
+                    missing = pairs - self._topic_ids.keys()
+                if missing:
+                    await self._add_topics(db, missing)
+                    await self._load_topics_by_name(db, missing)
+        return {pair: self._topic_ids[pair] for pair in pairs}
+
+    async def _add_topics(self, db: AsyncSession, pairs: set):
+        """Insert catalogue entries and commit, without caching anything before the commit"""
+        subject_names = {subject for subject, _ in pairs}
+        await db.execute(insert_subjects(subject_names))
+        subject_ids = dict((await db.execute(select_subject_ids(subject_names))).all())
+        await db.execute(insert_topics(pairs, subject_ids))
+        await db.commit()
+
+curriculum_catalogue = CurriculumCatalogue()
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import List, Optional
 import os
 
 # Import our database models and dependencies
-from database_models import get_db, User, StudyHours, CurriculumData
-from utils import pwd_context, SECRET_KEY, ALGORITHM, create_access_token, verify_token
+from database_models import (
+    get_async_db, User, StudyHours, CurriculumData, CurriculumTopic,
+    CURRICULUM_WATCHED, CURRICULUM_REVISED, CURRICULUM_TESTED
+)
+from curriculum_catalogue import curriculum_catalogue
+from curriculum_syllabus import unknown_topics
+from response_cache import response_cache, owner_key
+from data_versions import CURRICULUM_SCOPE, bump_data_version, conditional_get
+from fast_responses import model_response, parse_fields
+from utils import pwd_context, SECRET_KEY, ALGORITHM, create_access_token, verify_token, get_current_user_id
 
 # Create router for curriculum endpoints
 curriculum_router = APIRouter(prefix="/api/curriculum", tags=["Curriculum"])
@@ -26,6 +36,7 @@ class CurriculumTopicResponse(BaseModel):
     id: int
     user_id: Optional[int] = None
     visitor_id: Optional[str] = None
+    topic_id: Optional[int] = None
     subject: str
     topic: str
     watched: bool
@@ -50,214 +61,312 @@ class CurriculumStatsResponse(BaseModel):
     overall_progress: float
     subjects: List[CurriculumSubjectResponse]
 
-# Authentication dependency for user endpoints
-def get_current_user_email(current_user_email: str = Depends(verify_token)):
-    return current_user_email
+# fields= projections: columns left out of the SELECT are None, so these models
+# allow it (a cached projection has to survive the redis backend's JSON round trip)
 
-# Curriculum endpoints for authenticated users
+class ProjectedCurriculumTopicResponse(CurriculumTopicResponse):
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-@curriculum_router.post("/save", response_model=CurriculumTopicResponse)
-async def save_curriculum_topic(
-    topic_data: CurriculumTopicCreate,
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
-):
-    """Save curriculum topic for authenticated user"""
+class ProjectedCurriculumSubjectResponse(CurriculumSubjectResponse):
+    topics: List[ProjectedCurriculumTopicResponse]
+
+class ProjectedCurriculumStatsResponse(CurriculumStatsResponse):
+    subjects: List[ProjectedCurriculumSubjectResponse]
+
+class CurriculumTopicsBulkCreate(BaseModel):
+    topics: List[CurriculumTopicCreate]
+
+# Shared helpers for user and visitor endpoints
+
+FLAG_COUNTS = (
+    ("watched_count", CURRICULUM_WATCHED),
+    ("revised_count", CURRICULUM_REVISED),
+    ("tested_count", CURRICULUM_TESTED),
+)
+
+def topic_flags(topic: CurriculumTopicCreate) -> int:
+    return (
+        (CURRICULUM_WATCHED if topic.watched else 0)
+        | (CURRICULUM_REVISED if topic.revised else 0)
+        | (CURRICULUM_TESTED if topic.tested else 0)
+    )
+
+# Columns behind CurriculumTopicResponse; subject/topic and the flags come from topic_id and flags
+TOPIC_COLUMNS = (
+    CurriculumData.id,
+    CurriculumData.user_id,
+    CurriculumData.visitor_id,
+    CurriculumData.topic_id,
+    CurriculumData.flags,
+    CurriculumData.created_at,
+    CurriculumData.updated_at
+)
+TOPIC_REQUIRED_COLUMNS = ("topic_id", "flags")   # needed for names and counts in every projection
+
+def topic_columns(projection: Optional[List[str]] = None) -> tuple:
+    """Columns to select for a fields= projection of the topics (all of them when not given)"""
+    if projection is None:
+        return TOPIC_COLUMNS
+    return tuple(column for column in TOPIC_COLUMNS if column.key in projection or column.key in TOPIC_REQUIRED_COLUMNS)
+
+def topic_response(row, subject: str, topic: str, model=CurriculumTopicResponse) -> CurriculumTopicResponse:
+    # Built from our own query and the catalogue, no need to validate again.
+    # Columns left out by a projection stay None (model is then ProjectedCurriculumTopicResponse)
+    # and are excluded when serializing.
+    return model.model_construct(
+        id=getattr(row, "id", None),
+        user_id=getattr(row, "user_id", None),
+        visitor_id=getattr(row, "visitor_id", None),
+        topic_id=row.topic_id,
+        subject=subject,
+        topic=topic,
+        watched=bool(row.flags & CURRICULUM_WATCHED),
+        revised=bool(row.flags & CURRICULUM_REVISED),
+        tested=bool(row.flags & CURRICULUM_TESTED),
+        created_at=getattr(row, "created_at", None),
+        updated_at=getattr(row, "updated_at", None)
+    )
+
+async def save_curriculum_topics(
+    db: AsyncSession,
+    topics: List[CurriculumTopicCreate],
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> List[CurriculumData]:
+    """INSERT ... ON CONFLICT (owner, topic_id) DO UPDATE for one owner's topics, returns the rows"""
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
+    # Last change wins when the same topic appears twice (ON CONFLICT can't touch a row twice)
+    latest = {(topic.subject, topic.topic): topic for topic in topics}
+    unknown = unknown_topics(latest.keys())
+    if unknown:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Not in the GATE CS syllabus: " + "; ".join(f"{subject} / {topic}" for subject, topic in unknown[:5])
         )
+    topic_ids = await curriculum_catalogue.resolve_topic_ids(latest.keys())
     
-    # Check if curriculum topic already exists
-    existing_record = db.query(CurriculumData).filter(
-        CurriculumData.user_id == user.id,
-        CurriculumData.subject == topic_data.subject,
-        CurriculumData.topic == topic_data.topic
-    ).first()
-    
-    if existing_record:
-        # Update existing record
-        existing_record.watched = topic_data.watched
-        existing_record.revised = topic_data.revised
-        existing_record.tested = topic_data.tested
-        existing_record.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_record)
-        
-        return CurriculumTopicResponse(
-            id=existing_record.id,
-            user_id=existing_record.user_id,
-            subject=existing_record.subject,
-            topic=existing_record.topic,
-            watched=existing_record.watched,
-            revised=existing_record.revised,
-            tested=existing_record.tested,
-            created_at=existing_record.created_at,
-            updated_at=existing_record.updated_at
-        )
-    else:
-        # Create new record
-        new_record = CurriculumData(
-            user_id=user.id,
-            subject=topic_data.subject,
-            topic=topic_data.topic,
-            watched=topic_data.watched,
-            revised=topic_data.revised,
-            tested=topic_data.tested
-        )
-        
-        db.add(new_record)
-        db.commit()
-        db.refresh(new_record)
-        
-        return CurriculumTopicResponse(
-            id=new_record.id,
-            user_id=new_record.user_id,
-            subject=new_record.subject,
-            topic=new_record.topic,
-            watched=new_record.watched,
-            revised=new_record.revised,
-            tested=new_record.tested,
-            created_at=new_record.created_at,
-            updated_at=new_record.updated_at
-        )
+    owner_column = CurriculumData.user_id if user_id is not None else CurriculumData.visitor_id
+    upsert = insert(CurriculumData).values([
+        {"user_id": user_id, "visitor_id": visitor_id, "topic_id": topic_ids[key], "flags": topic_flags(topic)}
+        for key, topic in latest.items()
+    ])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[owner_column, CurriculumData.topic_id],
+        set_={"flags": upsert.excluded.flags, "updated_at": func.now()}
+    )
+    records = (await db.scalars(
+        upsert.returning(CurriculumData).execution_options(populate_existing=True)
+    )).all()
+    await bump_data_version(db, CURRICULUM_SCOPE, user_id=user_id, visitor_id=visitor_id)
+    await db.commit()
+    return records
 
-@curriculum_router.get("/all", response_model=CurriculumStatsResponse)
-async def get_all_curriculum_data(
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
-):
-    """Get all curriculum data with statistics for authenticated user"""
+async def bulk_save_curriculum_topics(
+    db: AsyncSession,
+    bulk_data: CurriculumTopicsBulkCreate,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> CurriculumStatsResponse:
+    """Upsert many topic states in a single statement and transaction, return the recomputed counts"""
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
+    if not bulk_data.topics:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No curriculum topics provided"
         )
     
-    # Get all curriculum records
-    curriculum_records = db.query(CurriculumData).filter(
-        CurriculumData.user_id == user.id
-    ).all()
+    await save_curriculum_topics(db, bulk_data.topics, user_id=user_id, visitor_id=visitor_id)
+    return await build_curriculum_stats(db, user_id=user_id, visitor_id=visitor_id, stats_only=True)
+
+def topic_fields_exclude(projection: Optional[List[str]]):
+    """model_dump exclude for a fields= projection of the topics inside CurriculumStatsResponse"""
+    if projection is None:
+        return None
+    excluded = set(CurriculumTopicResponse.model_fields) - set(projection)
+    return {"subjects": {"__all__": {"topics": {"__all__": excluded}}}}
+
+async def cached_curriculum_stats(
+    db: AsyncSession,
+    data_version: int,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None,
+    stats_only: bool = False,
+    projection: Optional[List[str]] = None
+) -> CurriculumStatsResponse:
+    """build_curriculum_stats through the response cache (keyed by the owner's data version)"""
+    return await response_cache.get_or_build(
+        "curriculum/all",
+        owner_key(user_id, visitor_id),
+        data_version,
+        (stats_only, ",".join(projection) if projection is not None else "*"),
+        CurriculumStatsResponse if projection is None else ProjectedCurriculumStatsResponse,
+        lambda: build_curriculum_stats(db, user_id=user_id, visitor_id=visitor_id, stats_only=stats_only, projection=projection)
+    )
+
+async def build_curriculum_stats(
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None,
+    stats_only: bool = False,
+    subject_id: Optional[int] = None,
+    projection: Optional[List[str]] = None
+) -> CurriculumStatsResponse:
+    """Per-subject and overall progress counts from one GROUP BY query, plus the topics unless stats_only
+
+    projection (CurriculumTopicResponse field names) narrows the topic SELECT to the columns it needs,
+    and the result is then a ProjectedCurriculumStatsResponse.
+    """
     
-    # Calculate overall statistics
-    total_topics = len(curriculum_records)
-    watched_topics = sum(1 for record in curriculum_records if record.watched)
-    revised_topics = sum(1 for record in curriculum_records if record.revised)
-    tested_topics = sum(1 for record in curriculum_records if record.tested)
-    overall_progress = (tested_topics / total_topics * 100) if total_topics > 0 else 0
+    if projection is None:
+        stats_model, subject_model, topic_model = CurriculumStatsResponse, CurriculumSubjectResponse, CurriculumTopicResponse
+    else:
+        stats_model, subject_model, topic_model = (
+            ProjectedCurriculumStatsResponse, ProjectedCurriculumSubjectResponse, ProjectedCurriculumTopicResponse
+        )
     
-    # Group by subject
-    subjects_dict = {}
-    for record in curriculum_records:
-        if record.subject not in subjects_dict:
-            subjects_dict[record.subject] = []
-        subjects_dict[record.subject].append(record)
+    owner_filter = CurriculumData.user_id == user_id if user_id is not None else CurriculumData.visitor_id == visitor_id
+    subject_filter = (CurriculumTopic.subject_id == subject_id,) if subject_id is not None else ()
     
-    # Convert to response format
-    subjects_response = []
-    for subject, records in subjects_dict.items():
-        topics_response = [
-            CurriculumTopicResponse(
-                id=record.id,
-                user_id=record.user_id,
-                subject=record.subject,
-                topic=record.topic,
-                watched=record.watched,
-                revised=record.revised,
-                tested=record.tested,
-                created_at=record.created_at,
-                updated_at=record.updated_at
-            )
-            for record in records
-        ]
-        
-        watched_count = sum(1 for record in records if record.watched)
-        revised_count = sum(1 for record in records if record.revised)
-        tested_count = sum(1 for record in records if record.tested)
-        
-        subjects_response.append(
-            CurriculumSubjectResponse(
-                subject=subject,
-                topics=topics_response,
-                watched_count=watched_count,
-                revised_count=revised_count,
-                tested_count=tested_count,
-                total_topics=len(records)
+    # Counts per subject (owner/topic index, joined to the small topic catalogue)
+    subject_counts = (await db.execute(
+        select(
+            CurriculumTopic.subject_id,
+            func.count().label("total_topics"),
+            *(
+                func.count().filter(CurriculumData.flags.op("&")(flag) != 0).label(label)
+                for label, flag in FLAG_COUNTS
             )
         )
+        .join(CurriculumTopic, CurriculumTopic.id == CurriculumData.topic_id)
+        .where(owner_filter, *subject_filter)
+        .group_by(CurriculumTopic.subject_id)
+    )).all()
     
-    return CurriculumStatsResponse(
+    # Topic rows carry only ids, names come from the cached catalogue
+    topic_rows = []
+    if not stats_only:
+        topic_rows = (await db.execute(
+            select(*topic_columns(projection))
+            .join(CurriculumTopic, CurriculumTopic.id == CurriculumData.topic_id)
+            .where(owner_filter, *subject_filter)
+            .order_by(CurriculumData.id)
+        )).all()
+    subject_names = await curriculum_catalogue.subject_names(db, (row.subject_id for row in subject_counts))
+    topic_names = await curriculum_catalogue.topic_names(db, (row.topic_id for row in topic_rows))
+    
+    topics_by_subject = {name: [] for name in subject_names.values()}
+    for row in topic_rows:
+        subject, topic = topic_names[row.topic_id]
+        # A topic saved between the two queries has no counts yet, leave it for the next call
+        if subject in topics_by_subject:
+            topics_by_subject[subject].append(topic_response(row, subject, topic, topic_model))
+    
+    subject_counts = sorted(subject_counts, key=lambda row: subject_names[row.subject_id])
+    total_topics = sum(row.total_topics for row in subject_counts)
+    tested_topics = sum(row.tested_count for row in subject_counts)
+    
+    return stats_model(
         total_topics=total_topics,
-        watched_topics=watched_topics,
-        revised_topics=revised_topics,
+        watched_topics=sum(row.watched_count for row in subject_counts),
+        revised_topics=sum(row.revised_count for row in subject_counts),
         tested_topics=tested_topics,
-        overall_progress=overall_progress,
-        subjects=subjects_response
+        overall_progress=(tested_topics / total_topics * 100) if total_topics > 0 else 0,
+        subjects=[
+            subject_model(
+                subject=subject_names[row.subject_id],
+                topics=topics_by_subject[subject_names[row.subject_id]],
+                watched_count=row.watched_count,
+                revised_count=row.revised_count,
+                tested_count=row.tested_count,
+                total_topics=row.total_topics
+            )
+            for row in subject_counts
+        ]
     )
 
+# Curriculum endpoints for authenticated users
+
+@curriculum_router.post("/save", response_model=CurriculumTopicResponse)
+async def save_curriculum_topic(
+    topic_data: CurriculumTopicCreate,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save curriculum topic for authenticated user"""
+    
+    # Insert or update the topic in one round trip
+    record, = await save_curriculum_topics(db, [topic_data], user_id=user_id)
+    return topic_response(record, topic_data.subject, topic_data.topic)
+
+@curriculum_router.post("/save-topics", response_model=CurriculumStatsResponse)
+async def save_curriculum_topics_bulk(
+    bulk_data: CurriculumTopicsBulkCreate,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save many curriculum topic states at once for authenticated user, returns the updated counts"""
+    
+    return await bulk_save_curriculum_topics(db, bulk_data, user_id=user_id)
+
+@curriculum_router.get("/all", response_model=CurriculumStatsResponse)
+async def get_all_curriculum_data(
+    request: Request,
+    response: Response,
+    stats_only: bool = False,
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all curriculum data with statistics for authenticated user
+    
+    - stats_only=true: per-subject counts without the topic lists
+    - fields=topic,tested,...: only these fields of each topic are selected and returned
+    """
+    
+    projection = parse_fields(fields, CurriculumTopicResponse)
+    exclude = topic_fields_exclude(projection)
+    not_modified = await conditional_get(request, response, db, CURRICULUM_SCOPE, user_id=user_id)
+    if not_modified:
+        return not_modified
+    
+    stats = await cached_curriculum_stats(db, request.state.data_version, user_id=user_id, stats_only=stats_only, projection=projection)
+    return model_response(stats, headers=dict(response.headers), exclude=exclude)
+
 @curriculum_router.get("/subject/{subject}", response_model=CurriculumSubjectResponse)
 async def get_curriculum_by_subject(
+    request: Request,
+    response: Response,
     subject: str,
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get curriculum data for a specific subject"""
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    not_modified = await conditional_get(request, response, db, CURRICULUM_SCOPE, user_id=user_id)
+    if not_modified:
+        return not_modified
     
-    # Get curriculum records for the subject
-    curriculum_records = db.query(CurriculumData).filter(
-        CurriculumData.user_id == user.id,
-        CurriculumData.subject == subject
-    ).all()
+    subject_id = await curriculum_catalogue.subject_id(db, subject)
+    stats = None
+    if subject_id is not None:
+        stats = await response_cache.get_or_build(
+            "curriculum/subject",
+            owner_key(user_id, None),
+            request.state.data_version,
+            (subject_id,),
+            CurriculumStatsResponse,
+            lambda: build_curriculum_stats(db, user_id=user_id, subject_id=subject_id)
+        )
     
-    if not curriculum_records:
+    if not stats or not stats.subjects:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No curriculum data found for subject: {subject}"
         )
     
-    # Convert to response format
-    topics_response = [
-        CurriculumTopicResponse(
-            id=record.id,
-            user_id=record.user_id,
-            subject=record.subject,
-            topic=record.topic,
-            watched=record.watched,
-            revised=record.revised,
-            tested=record.tested,
-            created_at=record.created_at,
-            updated_at=record.updated_at
-        )
-        for record in curriculum_records
-    ]
-    
-    watched_count = sum(1 for record in curriculum_records if record.watched)
-    revised_count = sum(1 for record in curriculum_records if record.revised)
-    tested_count = sum(1 for record in curriculum_records if record.tested)
-    
-    return CurriculumSubjectResponse(
-        subject=subject,
-        topics=topics_response,
-        watched_count=watched_count,
-        revised_count=revised_count,
-        tested_count=tested_count,
-        total_topics=len(curriculum_records)
-    )
+    return model_response(stats.subjects[0], headers=dict(response.headers))
 
 # Visitor endpoints (for non-authenticated users)
 
@@ -265,128 +374,40 @@ async def get_curriculum_by_subject(
 async def save_visitor_curriculum_topic(
     topic_data: CurriculumTopicCreate,
     visitor_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Save curriculum topic for visitor (non-authenticated user)"""
     
-    # Check if curriculum topic already exists
-    existing_record = db.query(CurriculumData).filter(
-        CurriculumData.visitor_id == visitor_id,
-        CurriculumData.subject == topic_data.subject,
-        CurriculumData.topic == topic_data.topic
-    ).first()
+    # Insert or update the topic in one round trip
+    record, = await save_curriculum_topics(db, [topic_data], visitor_id=visitor_id)
+    return topic_response(record, topic_data.subject, topic_data.topic)
+
+@curriculum_router.post("/visitor/save-topics", response_model=CurriculumStatsResponse)
+async def save_visitor_curriculum_topics_bulk(
+    bulk_data: CurriculumTopicsBulkCreate,
+    visitor_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save many curriculum topic states at once for visitor, returns the updated counts"""
     
-    if existing_record:
-        # Update existing record
-        existing_record.watched = topic_data.watched
-        existing_record.revised = topic_data.revised
-        existing_record.tested = topic_data.tested
-        existing_record.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_record)
-        
-        return CurriculumTopicResponse(
-            id=existing_record.id,
-            visitor_id=existing_record.visitor_id,
-            subject=existing_record.subject,
-            topic=existing_record.topic,
-            watched=existing_record.watched,
-            revised=existing_record.revised,
-            tested=existing_record.tested,
-            created_at=existing_record.created_at,
-            updated_at=existing_record.updated_at
-        )
-    else:
-        # Create new record
-        new_record = CurriculumData(
-            visitor_id=visitor_id,
-            subject=topic_data.subject,
-            topic=topic_data.topic,
-            watched=topic_data.watched,
-            revised=topic_data.revised,
-            tested=topic_data.tested
-        )
-        
-        db.add(new_record)
-        db.commit()
-        db.refresh(new_record)
-        
-        return CurriculumTopicResponse(
-            id=new_record.id,
-            visitor_id=new_record.visitor_id,
-            subject=new_record.subject,
-            topic=new_record.topic,
-            watched=new_record.watched,
-            revised=new_record.revised,
-            tested=new_record.tested,
-            created_at=new_record.created_at,
-            updated_at=new_record.updated_at
-        )
+    return await bulk_save_curriculum_topics(db, bulk_data, visitor_id=visitor_id)
 
 @curriculum_router.get("/visitor/{visitor_id}", response_model=CurriculumStatsResponse)
 async def get_visitor_curriculum_data(
+    request: Request,
+    response: Response,
     visitor_id: str,
-    db: Session = Depends(get_db)
+    stats_only: bool = False,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all curriculum data for visitor"""
-    
-    # Get all curriculum records for visitor
-    curriculum_records = db.query(CurriculumData).filter(
-        CurriculumData.visitor_id == visitor_id
-    ).all()
-    
-    # Calculate overall statistics
-    total_topics = len(curriculum_records)
-    watched_topics = sum(1 for record in curriculum_records if record.watched)
-    revised_topics = sum(1 for record in curriculum_records if record.revised)
-    tested_topics = sum(1 for record in curriculum_records if record.tested)
-    overall_progress = (tested_topics / total_topics * 100) if total_topics > 0 else 0
+    """Get all curriculum data for visitor (stats_only=true skips the topic lists, fields= narrows each topic)"""
     
-    # Group by subject
-    subjects_dict = {}
-    for record in curriculum_records:
-        if record.subject not in subjects_dict:
-            subjects_dict[record.subject] = []
-        subjects_dict[record.subject].append(record)
+    projection = parse_fields(fields, CurriculumTopicResponse)
+    exclude = topic_fields_exclude(projection)
+    not_modified = await conditional_get(request, response, db, CURRICULUM_SCOPE, visitor_id=visitor_id)
+    if not_modified:
+        return not_modified
     
-    # Convert to response format
-    subjects_response = []
-    for subject, records in subjects_dict.items():
-        topics_response = [
-            CurriculumTopicResponse(
-                id=record.id,
-                visitor_id=record.visitor_id,
-                subject=record.subject,
-                topic=record.topic,
-                watched=record.watched,
-                revised=record.revised,
-                tested=record.tested,
-                created_at=record.created_at,
-                updated_at=record.updated_at
-            )
-            for record in records
-        ]
-        
-        watched_count = sum(1 for record in records if record.watched)
-        revised_count = sum(1 for record in records if record.revised)
-        tested_count = sum(1 for record in records if record.tested)
-        
-        subjects_response.append(
-            CurriculumSubjectResponse(
-                subject=subject,
-                topics=topics_response,
-                watched_count=watched_count,
-                revised_count=revised_count,
-                tested_count=tested_count,
-                total_topics=len(records)
-            )
-        )
-    
-    return CurriculumStatsResponse(
-        total_topics=total_topics,
-        watched_topics=watched_topics,
-        revised_topics=revised_topics,
-        tested_topics=tested_topics,
-        overall_progress=overall_progress,
-        subjects=subjects_response
-    )
+    stats = await cached_curriculum_stats(db, request.state.data_version, visitor_id=visitor_id, stats_only=stats_only, projection=projection)
+    return model_response(stats, headers=dict(response.headers), exclude=exclude)
@@ -0,0 +1,97 @@
+"""
+GATE CS syllabus for Win GATE
+The subjects and topics the curriculum tracker offers. Kept in step with
+curriculumStructure in frontend/src/pages/Curriculum.jsx: the curriculum
+catalogue is seeded from it and saves are only accepted for these topics.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+GATE_CS_SYLLABUS: Dict[str, List[str]] = {
+    "Engineering Mathematics": [
+        "Discrete Mathematics",
+        "Propositional and first-order logic",
+        "Sets, relations, and functions",
+        "Partial orders and lattices",
+        "Monoids, Groups",
+        "Counting, recurrence relations, generating functions",
+    ],
+    "Digital Logic": [
+        "Boolean algebra",
+        "Combinational and sequential circuits",
+        "Minimization",
+        "Number representations and computer arithmetic",
+        "Representation of negative numbers",
+        "Fast adders",
+        "Multipliers, code converters",
+    ],
+    "Computer Organization and Architecture": [
+        "Machine instructions and addressing modes",
+        "ALU, data-path, and control unit",
+        "Instruction pipelining",
+        "Memory hierarchy: cache, main memory, secondary storage",
+        "I/O interface (Interrupt and DMA mode)",
+    ],
+    "Programming and Data Structures": [
+        "Programming in C",
+        "Functions, recursion, parameter passing, scope",
+        "Binding of variables",
+        "Abstract data types",
+        "Stacks, queues, linked lists, trees, binary search trees, heaps, graphs",
+    ],
+    "Algorithms": [
+        "Searching, sorting, hashing",
+        "Asymptotic worst and average case time and space complexity",
+        "Algorithm design techniques: greedy, dynamic programming, divide-and-conquer",
+        "Graph algorithms: DFS, BFS, shortest paths, minimum spanning trees",
+        "Pattern matching and parsing",
+    ],
+    "Theory of Computation": [
+        "Regular expressions and finite automata",
+        "Context-free grammars and push-down automata",
+        "Regular and context-free languages, pumping lemma",
+        "Turing machines and undecidability",
+    ],
+    "Compiler Design": [
+        "Lexical analysis, parsing, syntax-directed translation",
+        "Runtime environments",
+        "Intermediate code generation",
+    ],
+    "Operating System": [
+        "Processes, threads, inter-process communication, synchronization",
+        "Deadlock",
+        "CPU and I/O scheduling",
+        "Memory management and virtual memory",
+        "File systems",
+    ],
+    "Databases": [
+        "ER-model",
+        "Relational model: relational algebra, tuple calculus",
+        "SQL",
+        "Integrity constraints, normal forms",
+        "File organization, indexing",
+        "Transactions and concurrency control",
+    ],
+    "Computer Networks": [
+        "Concept of layering: OSI and TCP/IP stack",
+        "Basics of packet, circuit and virtual circuit switching",
+        "Data link layer: framing, error detection",
+        "MAC addresses, ARP",
+        "Intra-routing, inter-routing (distance vector and link state routing)",
+        "RIP and OSPF",
+        "BGP, IPv4, CIDR notation, Basics of IPv6",
+        "IP addressing, static and dynamic address assignment",
+        "ICMP",
+        "Transport layer: flow control, error control",
+        "TCP/UDP and sockets",
+        "DNS, SMTP, HTTP, FTP, Email",
+    ],
+}
+
+SYLLABUS_TOPICS: FrozenSet[Tuple[str, str]] = frozenset(
+    (subject, topic) for subject, topics in GATE_CS_SYLLABUS.items() for topic in topics
+)
+
+def unknown_topics(pairs: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """(subject, topic) pairs that are not in the syllabus"""
+    return sorted(pair for pair in set(pairs) if pair not in SYLLABUS_TOPICS)
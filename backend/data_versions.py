@@ -0,0 +1,79 @@
+"""
+Per-owner data versions and ETags for Win GATE read endpoints
+Every write bumps its owner's counter for the scope it touches, inside the
+same transaction, so the counter changes exactly when committed data does.
+GET endpoints read the counter first (one unique index lookup) and answer
+If-None-Match with 304 Not Modified before running any data query.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import DataVersion
+
+STUDY_HOURS_SCOPE = "study-hours"   # study hours, monthly rollups and goals
+CURRICULUM_SCOPE = "curriculum"
+
+def data_version_owner_filter(user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    return DataVersion.user_id == user_id if user_id is not None else DataVersion.visitor_id == visitor_id
+
+async def bump_data_version(db: AsyncSession, scope: str, user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    """Increment the owner's version for a scope, inside the caller's transaction (before commit)"""
+    owner_column = DataVersion.user_id if user_id is not None else DataVersion.visitor_id
+    upsert = insert(DataVersion).values(user_id=user_id, visitor_id=visitor_id, scope=scope, version=1)
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[owner_column, DataVersion.scope],
+        set_={"version": DataVersion.version + 1}
+    ))
+
+async def get_data_version(db: AsyncSession, scope: str, user_id: Optional[int] = None, visitor_id: Optional[str] = None) -> int:
+    """Current version for an owner and scope (0 before their first write)"""
+    version = await db.scalar(select(DataVersion.version).where(
+        data_version_owner_filter(user_id, visitor_id),
+        DataVersion.scope == scope
+    ))
+    return version or 0
+
+def make_etag(scope: str, version: int, user_id: Optional[int] = None, visitor_id: Optional[str] = None, *extra) -> str:
+    """Strong ETag for one owner's data version (hashed, so ids are not exposed)"""
+    owner = f"user:{user_id}" if user_id is not None else f"visitor:{visitor_id}"
+    digest = hashlib.sha256(":".join([owner, scope, str(version), *(str(part) for part in extra)]).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+    return "*" in candidates or etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    scope: str,
+    *extra,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> Optional[Response]:
+    """Return a 304 response when the client's ETag is current, otherwise set ETag on `response`
+
+    `extra` is folded into the tag for responses that also depend on something besides
+    the data (e.g. today's date for streaks and pacing). The version read is kept in
+    request.state.data_version: response cache keys include it, so a worker whose
+    cached body predates a write on another worker never serves it under the new ETag.
+    """
+    version = await get_data_version(db, scope, user_id=user_id, visitor_id=visitor_id)
+    request.state.data_version = version
+    etag = make_etag(scope, version, user_id, visitor_id, *extra)
+    # Per-user data: caches may keep it but must revalidate every time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
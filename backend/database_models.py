@@ -1,10 +1,17 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, BigInteger, SmallInteger, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
+from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,10 +19,167 @@ load_dotenv()
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create engine and session
-engine = create_engine(DATABASE_URL, echo=True)
+
+def get_async_database_url(database_url: str) -> str:
+    """Return the async driver variant of a database URL (psycopg2 -> asyncpg)"""
+    url = make_url(database_url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+# Async database URL (can be overridden, defaults to DATABASE_URL with the asyncpg driver)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+
+# Engine profiles - defaults per environment, every value can be overridden from settings
+class EngineProfile(BaseModel):
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout_ms: int
+    echo: bool
+
+ENGINE_PROFILES = {
+    "development": EngineProfile(
+        pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=-1,
+        pool_pre_ping=False, statement_timeout_ms=0, echo=True
+    ),
+    "production": EngineProfile(
+        pool_size=10, max_overflow=5, pool_timeout=10, pool_recycle=1800,
+        pool_pre_ping=True, statement_timeout_ms=15000, echo=False
+    ),
+}
+
+# Settings that override the selected profile
+ENGINE_PROFILE_SETTINGS = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS",
+    "echo": "DB_ECHO",
+}
+
+def load_engine_profile() -> EngineProfile:
+    """Build the engine profile from DB_ENGINE_PROFILE (or ENVIRONMENT) plus DB_* overrides
+
+    An unknown DB_ENGINE_PROFILE is a startup error; an ENVIRONMENT without a profile
+    of its own (e.g. staging) falls back to development with a warning.
+    """
+    valid_profiles = ", ".join(ENGINE_PROFILES)
+    profile_name = os.getenv("DB_ENGINE_PROFILE")
+    if profile_name and profile_name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE: {profile_name} (valid profiles: {valid_profiles})")
+    if not profile_name:
+        profile_name = os.getenv("ENVIRONMENT", "development")
+        if profile_name not in ENGINE_PROFILES:
+            print(f"⚠️ No engine profile for ENVIRONMENT={profile_name}, using development (valid profiles: {valid_profiles}; set DB_ENGINE_PROFILE to choose)")
+            profile_name = "development"
+
+    profile = ENGINE_PROFILES[profile_name].model_dump()
+    for field, setting in ENGINE_PROFILE_SETTINGS.items():
+        if os.getenv(setting) is not None:
+            profile[field] = os.getenv(setting)
+    return EngineProfile.model_validate(profile)
+
+ENGINE_PROFILE = load_engine_profile()
+
+
+class PoolWaitStatsMixin:
+    """Records how long callers wait to check a connection out of the pool
+
+    Time spent opening a new connection (overflow or a first checkout) is not waiting
+    for the pool, so it is left out of the wait times.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkout_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeout_count = 0
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        # Picked up (and subtracted) by the _do_get call that asked for this connection
+        record.info["pool_connect_seconds"] = time.perf_counter() - start
+        return record
+
+    def _do_get(self):
+        start = time.perf_counter()
+        connecting = 0.0
+        try:
+            record = super()._do_get()
+            connecting = record.info.pop("pool_connect_seconds", 0.0)
+            return record
+        except PoolTimeoutError:
+            with self._wait_lock:
+                self.timeout_count += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start - connecting
+            with self._wait_lock:
+                self.checkout_count += 1
+                self.wait_time_total += waited
+                self.wait_time_max = max(self.wait_time_max, waited)
+
+class TimedQueuePool(PoolWaitStatsMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(PoolWaitStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+def get_engine_options(database_url: str, profile: EngineProfile, is_async: bool = False) -> dict:
+    """Translate an engine profile into create_engine / create_async_engine keyword arguments"""
+    options = {
+        "echo": profile.echo,
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+        "pool_timeout": profile.pool_timeout,
+        "pool_recycle": profile.pool_recycle,
+        "pool_pre_ping": profile.pool_pre_ping,
+    }
+
+    if profile.statement_timeout_ms and make_url(database_url).get_backend_name() == "postgresql":
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(profile.statement_timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={profile.statement_timeout_ms}"}
+
+    return options
+
+def get_pool_stats(target_engine) -> dict:
+    """Connection pool usage for an engine (sync or async)"""
+    pool = getattr(target_engine, "sync_engine", target_engine).pool
+    stats = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    if isinstance(pool, PoolWaitStatsMixin):
+        stats.update({
+            "checkouts": pool.checkout_count,
+            "wait_time_total_ms": round(pool.wait_time_total * 1000, 3),
+            "wait_time_avg_ms": round(pool.wait_time_total / pool.checkout_count * 1000, 3) if pool.checkout_count else 0.0,
+            "wait_time_max_ms": round(pool.wait_time_max * 1000, 3),
+            "timeouts": pool.timeout_count,
+        })
+    return stats
+
+# Create engine and session (sync - used by setup and migration scripts)
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL, ENGINE_PROFILE))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async engine and session (used by the API routers)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL, ENGINE_PROFILE, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -29,6 +193,8 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     otp_hash = Column(String, nullable=True)
     otp_expiry = Column(DateTime, nullable=True)
+    otp_attempts = Column(Integer, nullable=False, default=0, server_default="0")  # Wrong guesses for the current OTP
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped to revoke issued tokens
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -45,12 +211,45 @@ class StudyHours(Base):
     month = Column(Integer, nullable=False)
     year = Column(Integer, nullable=False)
     day = Column(Integer, nullable=False)
+    study_date = Column(Date, nullable=True)  # Same day as year/month/day, for date range queries
     hours = Column(Float, nullable=False)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="study_hours")
+    
+    # One row per owner and day (lets saves use INSERT ... ON CONFLICT), plus date range lookups
+    __table_args__ = (
+        Index("uq_study_hours_user_day", "user_id", "year", "month", "day", unique=True),
+        Index("uq_study_hours_visitor_day", "visitor_id", "year", "month", "day", unique=True),
+        Index("ix_study_hours_user_date", "user_id", "study_date", postgresql_include=["hours"]),
+        Index("ix_study_hours_visitor_date", "visitor_id", "study_date", postgresql_include=["hours"]),
+    )
+
+class CurriculumSubject(Base):
+    __tablename__ = "curriculum_subjects"
+    
+    # Shared catalogue of syllabus subjects, referenced by id from curriculum_topics
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+
+class CurriculumTopic(Base):
+    __tablename__ = "curriculum_topics"
+    
+    # Shared catalogue of syllabus topics, referenced by id from curriculum_data
+    id = Column(Integer, primary_key=True, index=True)
+    subject_id = Column(Integer, ForeignKey("curriculum_subjects.id"), nullable=False)
+    name = Column(Text, nullable=False)
+    
+    __table_args__ = (
+        Index("uq_curriculum_topics_subject_name", "subject_id", "name", unique=True),
+    )
+
+# Bits of CurriculumData.flags
+CURRICULUM_WATCHED = 1
+CURRICULUM_REVISED = 2
+CURRICULUM_TESTED = 4
 
 class CurriculumData(Base):
     __tablename__ = "curriculum_data"
@@ -58,16 +257,83 @@ class CurriculumData(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Can be null for visitors
     visitor_id = Column(String, nullable=True)  # For non-authenticated users
-    subject = Column(String, nullable=False)
-    topic = Column(Text, nullable=False)
-    watched = Column(Boolean, default=False)
-    revised = Column(Boolean, default=False)
-    tested = Column(Boolean, default=False)
+    topic_id = Column(Integer, ForeignKey("curriculum_topics.id"), nullable=False)
+    flags = Column(SmallInteger, nullable=False, default=0, server_default="0")  # CURRICULUM_* bits
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="curriculum_data")
+    
+    # One row per owner and topic (lets saves use INSERT ... ON CONFLICT),
+    # INCLUDE lets progress counts run as index-only scans
+    __table_args__ = (
+        Index("uq_curriculum_data_user_topic", "user_id", "topic_id", unique=True, postgresql_include=["flags"]),
+        Index("uq_curriculum_data_visitor_topic", "visitor_id", "topic_id", unique=True, postgresql_include=["flags"]),
+    )
+
+class StudyHoursMonthly(Base):
+    __tablename__ = "study_hours_monthly"
+    
+    # Rollup of study_hours per owner and month, kept current by the save/delete endpoints
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Can be null for visitors
+    visitor_id = Column(String, nullable=True)  # For non-authenticated users
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    total_hours = Column(Float, nullable=False, default=0, server_default="0")
+    days_logged = Column(Integer, nullable=False, default=0, server_default="0")
+    max_day_hours = Column(Float, nullable=False, default=0, server_default="0")  # Best single day
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # One row per owner and month
+    __table_args__ = (
+        Index("uq_study_hours_monthly_user", "user_id", "year", "month", unique=True),
+        Index("uq_study_hours_monthly_visitor", "visitor_id", "year", "month", unique=True),
+    )
+
+class StudyGoal(Base):
+    __tablename__ = "study_goals"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Can be null for visitors
+    visitor_id = Column(String, nullable=True)  # For non-authenticated users
+    daily_hours = Column(Float, nullable=False)  # Target study hours per calendar day
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # One goal per owner
+    __table_args__ = (
+        Index("uq_study_goals_user", "user_id", unique=True),
+        Index("uq_study_goals_visitor", "visitor_id", unique=True),
+    )
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    
+    # Counter per owner and data scope ("study-hours", "curriculum"), bumped by every write;
+    # GET endpoints derive their ETags from it
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Can be null for visitors
+    visitor_id = Column(String, nullable=True)  # For non-authenticated users
+    scope = Column(String, nullable=False)
+    version = Column(BigInteger, nullable=False, default=1)
+    
+    __table_args__ = (
+        Index("uq_data_versions_user_scope", "user_id", "scope", unique=True, postgresql_include=["version"]),
+        Index("uq_data_versions_visitor_scope", "visitor_id", "scope", unique=True, postgresql_include=["version"]),
+    )
+
+class PendingSignup(Base):
+    __tablename__ = "pending_signups"
+    
+    email = Column(String, primary_key=True)
+    otp_hash = Column(String, nullable=False)
+    otp_expiry = Column(DateTime, nullable=False)
+    signup_pending = Column(Boolean, nullable=False, default=True)
+    verified = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    expires_at = Column(DateTime, nullable=False, index=True)  # Row is ignored and purged after this
 
 
 # Create all tables
@@ -81,3 +347,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,313 @@
+"""
+Background email delivery for Win GATE
+Messages are written to a spool directory, then delivered by worker threads
+over a small pool of reusable SMTP connections. Failed sends are retried with
+exponential backoff; spooled messages survive restarts and are picked up again
+when the queue starts.
+
+Every uvicorn worker runs its own queue over the same spool directory, so a
+message is claimed by renaming <id>.json to <id>.sending (atomic, exactly one
+process wins) before it is sent. Messages with an expires_at (OTP emails) are
+dropped once expired, and their body, which holds the OTP, is never kept in a
+*.failed file.
+"""
+
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+class SMTPConnectionPool:
+    """Keeps logged-in SMTP connections around so each message skips the handshake"""
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 use_tls: bool = True, max_idle: int = 2, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle: List[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        print(f"🔌 Connecting to SMTP server {self.host}:{self.port}...")
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def acquire(self) -> smtplib.SMTP:
+        """Return a live connection, reusing an idle one when it still answers NOOP"""
+        while True:
+            with self._lock:
+                server = self._idle.pop() if self._idle else None
+            if server is None:
+                return self._connect()
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP):
+        """Hand a healthy connection back to the pool"""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(server)
+                return
+        self._close(server)
+
+    def discard(self, server: smtplib.SMTP):
+        """Drop a connection that failed mid-send"""
+        self._close(server)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server in idle:
+            self._close(server)
+
+class EmailDeliveryQueue:
+    """File-backed delivery queue with worker threads, retries and exponential backoff"""
+
+    def __init__(self, smtp_pool: SMTPConnectionPool, sender: str, spool_dir: str,
+                 workers: int = 2, max_attempts: int = 5, retry_base_delay: float = 2, retry_max_delay: float = 300,
+                 stale_claim_seconds: float = 600):
+        self.smtp_pool = smtp_pool
+        self.sender = sender
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.stale_claim_seconds = stale_claim_seconds   # a *.sending file this old was left by a crashed process
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._retry_timers: List[threading.Timer] = []
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.expired = 0
+
+    # Spool files
+
+    def _spool_path(self, message_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.spool_dir, message_id + suffix)
+
+    def _write_spool(self, message: dict, suffix: str = ".json"):
+        os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+        path = self._spool_path(message["id"], suffix)
+        temp_path = path + ".tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as spool_file:
+            json.dump(message, spool_file)
+        os.replace(temp_path, path)
+
+    def _read_spool(self, message_id: str, suffix: str = ".json") -> Optional[dict]:
+        try:
+            with open(self._spool_path(message_id, suffix)) as spool_file:
+                return json.load(spool_file)
+        except (OSError, ValueError):
+            return None
+
+    def _claim(self, message_id: str) -> bool:
+        """Take a spooled message for delivery; False when another worker or process has it"""
+        claimed_path = self._spool_path(message_id, ".sending")
+        try:
+            os.rename(self._spool_path(message_id), claimed_path)
+        except FileNotFoundError:
+            return False
+        os.utime(claimed_path)   # claim time, for stale claim detection
+        return True
+
+    def _remove_claimed(self, message_id: str):
+        try:
+            os.remove(self._spool_path(message_id, ".sending"))
+        except FileNotFoundError:
+            pass
+
+    # Producer side
+
+    def enqueue(self, to: str, subject: str, html_body: str, expires_at: Optional[float] = None) -> str:
+        """Spool a message for delivery and return its id (does not wait for SMTP)
+
+        Messages with an expires_at (epoch seconds) are dropped instead of sent once it
+        passes, and are deleted rather than kept as *.failed.
+        """
+        message = {
+            "id": uuid.uuid4().hex,
+            "to": to,
+            "subject": subject,
+            "html_body": html_body,
+            "attempts": 0,
+            "created_at": time.time(),
+            "expires_at": expires_at,
+        }
+        self._write_spool(message)
+        self._queue.put(message["id"])
+        return message["id"]
+
+    # Worker side
+
+    def _build_mime(self, message: dict) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = message["to"]
+        msg['Subject'] = message["subject"]
+        msg.attach(MIMEText(message["html_body"], 'html'))
+        return msg.as_string()
+
+    def _send(self, message: dict):
+        server = self.smtp_pool.acquire()
+        try:
+            server.sendmail(self.sender, [message["to"]], self._build_mime(message))
+        except Exception:
+            self.smtp_pool.discard(server)
+            raise
+        self.smtp_pool.release(server)
+
+    def _schedule_retry(self, message_id: str, delay: float):
+        timer = threading.Timer(delay, self._queue.put, args=(message_id,))
+        timer.daemon = True
+        with self._lock:
+            self._retry_timers = [t for t in self._retry_timers if t.is_alive()]
+            self._retry_timers.append(timer)
+        timer.start()
+
+    def _give_up(self, message: dict):
+        """Keep a failed message for inspection, without the body of expiring (OTP) messages"""
+        if message.get("expires_at") is not None:
+            message["html_body"] = None
+        self._write_spool(message, ".failed")
+        self._remove_claimed(message["id"])
+
+    def _deliver(self, message_id: str):
+        if not self._claim(message_id):
+            return
+        message = self._read_spool(message_id, ".sending")
+        if message is None:
+            self._remove_claimed(message_id)
+            return
+
+        expires_at = message.get("expires_at")
+        if expires_at is not None and time.time() >= expires_at:
+            self._remove_claimed(message_id)
+            with self._lock:
+                self.expired += 1
+            print(f"⌛ Dropping expired email to {message['to']}")
+            return
+
+        try:
+            self._send(message)
+        except Exception as e:
+            message["attempts"] += 1
+            message["last_error"] = f"{type(e).__name__}: {e}"
+            if message["attempts"] >= self.max_attempts:
+                self._give_up(message)
+                with self._lock:
+                    self.failed += 1
+                print(f"❌ Giving up on email to {message['to']} after {message['attempts']} attempts: {e}")
+                return
+
+            delay = min(self.retry_base_delay * 2 ** (message["attempts"] - 1), self.retry_max_delay)
+            # Back to the spool unclaimed, so a restart (of any worker) can pick it up again
+            self._write_spool(message)
+            self._remove_claimed(message_id)
+            with self._lock:
+                self.retried += 1
+            print(f"⚠️ Email to {message['to']} failed ({e}), retrying in {delay:.0f}s")
+            self._schedule_retry(message_id, delay)
+            return
+
+        self._remove_claimed(message_id)
+        with self._lock:
+            self.sent += 1
+        print(f"✅ Email sent successfully to {message['to']}")
+
+    def _worker(self):
+        while True:
+            message_id = self._queue.get()
+            if message_id is None:
+                break
+            try:
+                self._deliver(message_id)
+            except Exception as e:
+                print(f"❌ Email worker error: {e}")
+
+    # Lifecycle
+
+    def start(self):
+        """Start the workers and requeue messages left in the spool by a previous run
+
+        Messages claimed by a process that died mid-send (*.sending older than
+        stale_claim_seconds) are returned to the spool first.
+        """
+        if self._threads:
+            return
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        if os.path.isdir(self.spool_dir):
+            now = time.time()
+            for filename in os.listdir(self.spool_dir):
+                if not filename.endswith(".sending"):
+                    continue
+                path = os.path.join(self.spool_dir, filename)
+                try:
+                    if now - os.path.getmtime(path) >= self.stale_claim_seconds:
+                        os.rename(path, self._spool_path(filename[:-len(".sending")]))
+                except FileNotFoundError:
+                    pass
+            for filename in sorted(os.listdir(self.spool_dir)):
+                if filename.endswith(".json"):
+                    self._queue.put(filename[:-len(".json")])
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"email-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        """Stop the workers; undelivered messages stay in the spool for the next start"""
+        with self._lock:
+            for timer in self._retry_timers:
+                timer.cancel()
+            self._retry_timers = []
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.smtp_pool.close_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "queued": self._queue.qsize(),
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "expired": self.expired,
+                "smtp_connections_opened": self.smtp_pool.connections_opened,
+            }
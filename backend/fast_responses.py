@@ -0,0 +1,49 @@
+"""
+Fast JSON responses for Win GATE read endpoints
+Returning a model from a route makes FastAPI validate it again against
+response_model, convert it with jsonable_encoder and then json.dumps the
+result. Payloads built by our own queries are already the right shape, so the
+large read endpoints return a Response directly instead:
+- rows_response: query rows whose columns match the response model, straight to orjson
+- model_response: a model we built ourselves, serialized once by pydantic-core
+Routes keep their response_model for the OpenAPI schema. Both helpers also
+apply a fields= projection (see parse_fields).
+See benchmark_serialization.py for the numbers.
+"""
+
+from typing import Iterable, List, Mapping, Optional, Type
+
+import orjson
+from fastapi import HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """Field names from a fields=a,b,c parameter in model order, None when not given (all fields)"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - model.model_fields.keys()
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown)) or '(none given)'}. Available: {', '.join(model.model_fields)}"
+        )
+    return [name for name in model.model_fields if name in requested]
+
+def dumps_rows(rows: Iterable) -> bytes:
+    """JSON array of SQLAlchemy rows, one object per row keyed by column label"""
+    return orjson.dumps([row._asdict() for row in rows])
+
+def dumps_rows_ndjson(rows: Iterable) -> bytes:
+    return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+def rows_response(rows: Iterable, headers: Optional[Mapping[str, str]] = None, fields: Optional[List[str]] = None) -> Response:
+    """Rows as a JSON array, only `fields` of each row when given"""
+    if fields is None:
+        return ORJSONResponse([row._asdict() for row in rows], headers=headers)
+    return ORJSONResponse([{name: row._mapping[name] for name in fields} for row in rows], headers=headers)
+
+def model_response(model: BaseModel, headers: Optional[Mapping[str, str]] = None, exclude=None) -> Response:
+    """A model serialized once by pydantic-core (`exclude` as in model_dump_json)"""
+    return Response(content=model.model_dump_json(exclude=exclude), media_type=ORJSONResponse.media_type, headers=headers)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import jwt
@@ -16,11 +16,17 @@ import string
 
 # Import our database models and dependencies
 from database_models import get_db, User, StudyHours, CurriculumData
-from database_models import engine, SessionLocal
+from database_models import engine, SessionLocal, async_engine
+from database_models import ENGINE_PROFILE, get_pool_stats
 from database_models import Base, create_tables
 
 # Import utilities
 from utils import pwd_context, SECRET_KEY, ALGORITHM, create_access_token, verify_token
+from utils import password_pool
+from otp_utils import email_queue
+from compression import CompressionMiddleware
+from curriculum_catalogue import seed_curriculum_catalogue
+from metrics import MetricsMiddleware, instrument_engine, register_pool_metrics, render_metrics
 
 # Import all routers
 from auth_endpoints import auth_router
@@ -43,8 +49,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Compress responses above COMPRESSION_MINIMUM_SIZE bytes (brotli or gzip, per Accept-Encoding)
+app.add_middleware(CompressionMiddleware)
+
+# Request latency, SQL statements and DB time per route (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(async_engine)
+instrument_engine(engine)
+register_pool_metrics({"async": async_engine, "sync": engine})
+
 # Email configuration (optional)
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
@@ -63,7 +79,15 @@ app.include_router(otp_router)
 @app.on_event("startup")
 def startup_event():
     create_tables()
+    seed_curriculum_catalogue()
     print("Database tables created successfully!")
+    email_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await async_engine.dispose()
+    password_pool.shutdown()
+    email_queue.stop()
 
 # Health check endpoints
 @app.get("/")
@@ -74,6 +98,32 @@ def read_root():
 def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/health/db-pool")
+def db_pool_stats():
+    """Connection pool statistics for this worker process"""
+    return {
+        "pid": os.getpid(),
+        "profile": ENGINE_PROFILE.model_dump(),
+        "async_pool": get_pool_stats(async_engine),
+        "sync_pool": get_pool_stats(engine),
+    }
+
+@app.get("/health/password-pool")
+def password_pool_stats():
+    """Queue depth of the password hashing pool for this worker process"""
+    return {"pid": os.getpid(), **password_pool.stats()}
+
+@app.get("/health/email-queue")
+def email_queue_stats():
+    """OTP email delivery queue statistics for this worker process"""
+    return {"pid": os.getpid(), **email_queue.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus metrics for this worker process"""
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
 # API documentation endpoint
 @app.get("/docs-info")
 def get_api_docs_info():
@@ -0,0 +1,150 @@
+"""
+Prometheus metrics for Win GATE
+MetricsMiddleware times every HTTP request and labels it with the route
+template (e.g. /api/study-hours/month/{month}/{year}). SQLAlchemy cursor events
+on the engines count the statements and database time of the request that
+issued them, found through a context variable set by the middleware (it also
+covers queries run while a streaming body is sent). Pool usage is read when
+/metrics is scraped.
+
+Metrics are per worker process; Prometheus scrapes each worker (or sum them).
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database_models import get_pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_DURATION = Histogram(
+    "win_gate_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter("win_gate_http_requests_total", "HTTP requests served", ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = Gauge("win_gate_http_requests_in_flight", "HTTP requests being served", ["method"])
+REQUEST_DB_QUERIES = Histogram(
+    "win_gate_db_queries_per_request", "SQL statements executed per HTTP request",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "win_gate_db_time_per_request_seconds", "Time spent in SQL statements per HTTP request",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+DB_STATEMENT_DURATION = Histogram(
+    "win_gate_db_statement_duration_seconds", "SQL statement latency (all statements, including background work)",
+    buckets=LATENCY_BUCKETS
+)
+
+class RequestDbStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+current_request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("current_request_db_stats", default=None)
+
+# SQLAlchemy event hooks
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DB_STATEMENT_DURATION.observe(elapsed)
+    stats = current_request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+def instrument_engine(target_engine):
+    """Time every statement run through an engine (sync or async)"""
+    sync_engine = getattr(target_engine, "sync_engine", target_engine)
+    if not event.contains(sync_engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+# Pool usage, collected on scrape
+
+class PoolCollector:
+    def __init__(self, engines: Dict[str, object]):
+        self.engines = engines
+
+    def collect(self):
+        connections = GaugeMetricFamily("win_gate_db_pool_connections", "Connections in the pool by state", labels=["engine", "state"])
+        checkouts = CounterMetricFamily("win_gate_db_pool_checkouts", "Connection checkouts", labels=["engine"])
+        wait_time = CounterMetricFamily("win_gate_db_pool_wait_seconds", "Time spent waiting for a connection", labels=["engine"])
+        timeouts = CounterMetricFamily("win_gate_db_pool_timeouts", "Checkouts that timed out", labels=["engine"])
+        for name, target_engine in self.engines.items():
+            stats = get_pool_stats(target_engine)
+            for state in ("pool_size", "checked_out", "checked_in", "overflow"):
+                connections.add_metric([name, state], stats[state])
+            if "checkouts" in stats:
+                checkouts.add_metric([name], stats["checkouts"])
+                wait_time.add_metric([name], stats["wait_time_total_ms"] / 1000)
+                timeouts.add_metric([name], stats["timeouts"])
+        yield from (connections, checkouts, wait_time, timeouts)
+
+def register_pool_metrics(engines: Dict[str, object]):
+    REGISTRY.register(PoolCollector(engines))
+
+def render_metrics() -> tuple:
+    """(body, content type) for the /metrics endpoint"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+# Middleware
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Optional[dict] = None
+
+    def route_label(self, scope: Scope) -> str:
+        """Route template of the matched endpoint ("unmatched" for 404s, to keep label values bounded)"""
+        if self._route_paths is None:
+            routes = scope["app"].routes
+            self._route_paths = {route.endpoint: route.path for route in routes if hasattr(route, "endpoint")}
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestDbStats()
+        token = current_request_db_stats.set(stats)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.labels(method).dec()
+            current_request_db_stats.reset(token)
+
+            # The router fills in scope["endpoint"] once a route matched
+            route = self.route_label(scope)
+            REQUEST_DURATION.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_TIME.labels(method, route).observe(stats.db_time)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for Win GATE Study Tracker
+Applied versions are recorded in the schema_migrations table, so running this
+script again only applies the steps that are new since the last run.
+
+Usage: python migrations.py
+
+Migrations run in one transaction unless they set "transactional": False,
+which is needed for CREATE INDEX CONCURRENTLY (builds the index without
+blocking writes). Those statements run one by one in autocommit mode, so
+they must be safe to repeat if the migration is interrupted.
+
+A migration may also set "skip_if" to a SQL query returning a boolean; when
+it returns true the step is recorded without running (e.g. create_tables()
+already built the newer shape on a fresh database).
+"""
+
+import sys
+from sqlalchemy import text
+from database_models import engine
+
+# True once curriculum_data no longer has the pre-catalogue text columns
+LEGACY_CURRICULUM_GONE = """
+    SELECT NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'curriculum_data' AND column_name = 'topic'
+    )
+"""
+
+# True once both study_hours day indexes exist and are valid (create_tables() built them, or
+# version 3 finished); saves rely on them for ON CONFLICT, so they are never dropped then
+STUDY_HOURS_DAY_INDEXES_VALID = """
+    SELECT COUNT(*) = 2 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname IN ('uq_study_hours_user_day', 'uq_study_hours_visitor_day') AND i.indisvalid
+"""
+
+# Ordered list of migrations - append new steps, never edit applied ones
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "Add users.token_version for access token revocation",
+        "statements": [
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0",
+        ],
+    },
+    {
+        "version": 2,
+        "description": "Add OTP attempt counters for attempt limiting",
+        "statements": [
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS otp_attempts INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE IF EXISTS pending_signups ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+        ],
+    },
+    {
+        "version": 3,
+        "description": "Remove duplicate study_hours days and add unique (owner, year, month, day) indexes",
+        "transactional": False,
+        "skip_if": STUDY_HOURS_DAY_INDEXES_VALID,
+        # Every step is safe to repeat: the dedupe runs again if an index build is interrupted
+        # (or fails on a duplicate written meanwhile), and the build drops any INVALID leftover.
+        "statements": [
+            # Keep the most recently updated row for each user/visitor day
+            """
+            DELETE FROM study_hours older USING study_hours newer
+            WHERE older.user_id = newer.user_id
+              AND older.year = newer.year AND older.month = newer.month AND older.day = newer.day
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            """
+            DELETE FROM study_hours older USING study_hours newer
+            WHERE older.visitor_id = newer.visitor_id
+              AND older.year = newer.year AND older.month = newer.month AND older.day = newer.day
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS uq_study_hours_user_day",
+            "CREATE UNIQUE INDEX CONCURRENTLY uq_study_hours_user_day ON study_hours (user_id, year, month, day)",
+            "DROP INDEX CONCURRENTLY IF EXISTS uq_study_hours_visitor_day",
+            "CREATE UNIQUE INDEX CONCURRENTLY uq_study_hours_visitor_day ON study_hours (visitor_id, year, month, day)",
+        ],
+    },
+    {
+        "version": 4,
+        "description": "Add covering (owner, subject) indexes on curriculum_data",
+        "transactional": False,
+        "skip_if": LEGACY_CURRICULUM_GONE,
+        # study_hours owner lookups are already served by the unique indexes from version 3.
+        # An interrupted concurrent build leaves an INVALID index behind, so drop before creating.
+        "statements": [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_curriculum_data_user_subject",
+            """
+            CREATE INDEX CONCURRENTLY ix_curriculum_data_user_subject
+            ON curriculum_data (user_id, subject) INCLUDE (watched, revised, tested)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_curriculum_data_visitor_subject",
+            """
+            CREATE INDEX CONCURRENTLY ix_curriculum_data_visitor_subject
+            ON curriculum_data (visitor_id, subject) INCLUDE (watched, revised, tested)
+            """,
+        ],
+    },
+    {
+        "version": 5,
+        "description": "Add the study_hours_monthly rollup and fill it from existing study hours",
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS study_hours_monthly (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users (id),
+                visitor_id VARCHAR,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                total_hours FLOAT NOT NULL DEFAULT 0,
+                days_logged INTEGER NOT NULL DEFAULT 0,
+                max_day_hours FLOAT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_study_hours_monthly_user ON study_hours_monthly (user_id, year, month)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_study_hours_monthly_visitor ON study_hours_monthly (visitor_id, year, month)",
+            """
+            INSERT INTO study_hours_monthly (user_id, visitor_id, year, month, total_hours, days_logged, max_day_hours)
+            SELECT user_id, visitor_id, year, month, SUM(hours), COUNT(*), MAX(hours)
+            FROM study_hours
+            GROUP BY user_id, visitor_id, year, month
+            ON CONFLICT DO NOTHING
+            """,
+        ],
+    },
+    {
+        "version": 6,
+        "description": "Add study_hours.study_date and backfill it from year/month/day",
+        "statements": [
+            "ALTER TABLE study_hours ADD COLUMN IF NOT EXISTS study_date DATE",
+            # Rows holding impossible dates (e.g. February 30) are left NULL
+            """
+            UPDATE study_hours SET study_date = make_date(year, month, day)
+            WHERE study_date IS NULL
+              AND CASE WHEN year > 0 AND month BETWEEN 1 AND 12
+                       THEN day BETWEEN 1 AND EXTRACT(DAY FROM make_date(year, month, 1) + INTERVAL '1 month - 1 day')
+                       ELSE FALSE END
+            """,
+        ],
+    },
+    {
+        "version": 7,
+        "description": "Add (owner, study_date) indexes on study_hours for date range queries",
+        "transactional": False,
+        "statements": [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_study_hours_user_date",
+            "CREATE INDEX CONCURRENTLY ix_study_hours_user_date ON study_hours (user_id, study_date) INCLUDE (hours)",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_study_hours_visitor_date",
+            "CREATE INDEX CONCURRENTLY ix_study_hours_visitor_date ON study_hours (visitor_id, study_date) INCLUDE (hours)",
+        ],
+    },
+    {
+        "version": 8,
+        "description": "Remove duplicate curriculum topics and make (owner, subject, topic) unique",
+        "transactional": False,
+        "skip_if": LEGACY_CURRICULUM_GONE,
+        # Every step is safe to repeat: the dedupe runs again if an index build is interrupted.
+        # The unique indexes keep the progress flags INCLUDEd and replace the version 4 indexes.
+        "statements": [
+            # Keep the most recently updated row for each user/visitor topic
+            """
+            DELETE FROM curriculum_data older USING curriculum_data newer
+            WHERE older.user_id = newer.user_id
+              AND older.subject = newer.subject AND older.topic = newer.topic
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            """
+            DELETE FROM curriculum_data older USING curriculum_data newer
+            WHERE older.visitor_id = newer.visitor_id
+              AND older.subject = newer.subject AND older.topic = newer.topic
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS uq_curriculum_data_user_topic",
+            """
+            CREATE UNIQUE INDEX CONCURRENTLY uq_curriculum_data_user_topic
+            ON curriculum_data (user_id, subject, topic) INCLUDE (watched, revised, tested)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS uq_curriculum_data_visitor_topic",
+            """
+            CREATE UNIQUE INDEX CONCURRENTLY uq_curriculum_data_visitor_topic
+            ON curriculum_data (visitor_id, subject, topic) INCLUDE (watched, revised, tested)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_curriculum_data_user_subject",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_curriculum_data_visitor_subject",
+        ],
+    },
+    {
+        "version": 9,
+        "description": "Move curriculum_data onto a shared subject/topic catalogue with integer ids and a flags bitmask",
+        "skip_if": LEGACY_CURRICULUM_GONE,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS curriculum_subjects (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR NOT NULL UNIQUE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS curriculum_topics (
+                id SERIAL PRIMARY KEY,
+                subject_id INTEGER NOT NULL REFERENCES curriculum_subjects (id),
+                name TEXT NOT NULL
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_curriculum_topics_subject_name ON curriculum_topics (subject_id, name)",
+            """
+            INSERT INTO curriculum_subjects (name)
+            SELECT DISTINCT subject FROM curriculum_data
+            ON CONFLICT DO NOTHING
+            """,
+            """
+            INSERT INTO curriculum_topics (subject_id, name)
+            SELECT DISTINCT s.id, d.topic
+            FROM curriculum_data d JOIN curriculum_subjects s ON s.name = d.subject
+            ON CONFLICT DO NOTHING
+            """,
+            "ALTER TABLE curriculum_data ADD COLUMN IF NOT EXISTS topic_id INTEGER REFERENCES curriculum_topics (id)",
+            "ALTER TABLE curriculum_data ADD COLUMN IF NOT EXISTS flags SMALLINT NOT NULL DEFAULT 0",
+            # watched = 1, revised = 2, tested = 4 (see CURRICULUM_* in database_models.py)
+            """
+            UPDATE curriculum_data d
+            SET topic_id = t.id,
+                flags = (CASE WHEN d.watched THEN 1 ELSE 0 END)
+                      | (CASE WHEN d.revised THEN 2 ELSE 0 END)
+                      | (CASE WHEN d.tested THEN 4 ELSE 0 END)
+            FROM curriculum_subjects s JOIN curriculum_topics t ON t.subject_id = s.id
+            WHERE s.name = d.subject AND t.name = d.topic
+            """,
+            # Keep the most recently updated row for each user/visitor topic
+            """
+            DELETE FROM curriculum_data older USING curriculum_data newer
+            WHERE older.user_id = newer.user_id AND older.topic_id = newer.topic_id
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            """
+            DELETE FROM curriculum_data older USING curriculum_data newer
+            WHERE older.visitor_id = newer.visitor_id AND older.topic_id = newer.topic_id
+              AND (COALESCE(older.updated_at, older.created_at), older.id)
+                < (COALESCE(newer.updated_at, newer.created_at), newer.id)
+            """,
+            "ALTER TABLE curriculum_data ALTER COLUMN topic_id SET NOT NULL",
+            "DROP INDEX IF EXISTS uq_curriculum_data_user_topic",
+            "DROP INDEX IF EXISTS uq_curriculum_data_visitor_topic",
+            "DROP INDEX IF EXISTS ix_curriculum_data_user_subject",
+            "DROP INDEX IF EXISTS ix_curriculum_data_visitor_subject",
+            "ALTER TABLE curriculum_data DROP COLUMN subject, DROP COLUMN topic, DROP COLUMN watched, DROP COLUMN revised, DROP COLUMN tested",
+            "CREATE UNIQUE INDEX uq_curriculum_data_user_topic ON curriculum_data (user_id, topic_id) INCLUDE (flags)",
+            "CREATE UNIQUE INDEX uq_curriculum_data_visitor_topic ON curriculum_data (visitor_id, topic_id) INCLUDE (flags)",
+        ],
+    },
+    {
+        "version": 10,
+        "description": "Add the data_versions table behind ETags on study hours and curriculum reads",
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS data_versions (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users (id),
+                visitor_id VARCHAR,
+                scope VARCHAR NOT NULL,
+                version BIGINT NOT NULL DEFAULT 1
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_data_versions_user_scope ON data_versions (user_id, scope) INCLUDE (version)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_data_versions_visitor_scope ON data_versions (visitor_id, scope) INCLUDE (version)",
+        ],
+    },
+]
+
+def ensure_migrations_table(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """))
+
+def get_applied_versions(connection) -> set:
+    return set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+def record_migration(connection, migration: dict):
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+        {"version": migration["version"], "description": migration["description"]}
+    )
+
+def should_skip(migration: dict) -> bool:
+    if "skip_if" not in migration:
+        return False
+    with engine.connect() as connection:
+        return bool(connection.execute(text(migration["skip_if"])).scalar())
+
+def apply_migration(migration: dict):
+    """Run one migration's statements and record it, in a single transaction when possible"""
+    if migration.get("transactional", True):
+        with engine.begin() as connection:
+            for statement in migration["statements"]:
+                connection.execute(text(statement))
+            record_migration(connection, migration)
+        return
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for statement in migration["statements"]:
+            connection.execute(text(statement))
+        record_migration(connection, migration)
+
+def run_migrations() -> list:
+    """Apply all pending migrations in version order, returns the applied versions"""
+    with engine.begin() as connection:
+        ensure_migrations_table(connection)
+        applied_versions = get_applied_versions(connection)
+
+    newly_applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m["version"]):
+        if migration["version"] in applied_versions:
+            continue
+        if should_skip(migration):
+            print(f"Skipping migration {migration['version']} (not needed for this schema): {migration['description']}")
+            with engine.begin() as connection:
+                record_migration(connection, migration)
+            continue
+        print(f"Applying migration {migration['version']}: {migration['description']}")
+        apply_migration(migration)
+        newly_applied.append(migration["version"])
+    return newly_applied
+
+if __name__ == "__main__":
+    try:
+        applied = run_migrations()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+    if applied:
+        print(f"✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        print("✅ Database schema is up to date")
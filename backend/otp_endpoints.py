@@ -1,25 +1,58 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import jwt
 from typing import Dict, Any
 
 # Import our database models and dependencies
-from database_models import get_db, User
-from utils import SECRET_KEY, ALGORITHM, create_access_token, get_password_hash, verify_password
-from otp_utils import generate_otp, hash_otp, verify_otp_hash, send_otp_email, temp_users
+from database_models import get_async_db, User
+from utils import SECRET_KEY, ALGORITHM, create_access_token, create_user_access_token, get_password_hash_async, verify_password_async, invalidate_cached_user
+from otp_utils import generate_otp, hash_otp_async, verify_otp_hash_async, send_otp_email, pending_signups, OTP_MAX_ATTEMPTS
+from pending_signup_store import PendingSignupData, PENDING_SIGNUP_GRACE
 from otp_models import OTPRequest, OTPVerify, OTPResend, OTPLogin, OTPResponse, TokenResponse
 
 # Create router for OTP endpoints
 otp_router = APIRouter(prefix="/api/auth", tags=["OTP Authentication"])
 
+def too_many_otp_attempts():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many invalid attempts. Please request a new OTP"
+    )
+
+async def claim_user_otp_attempt(user: User, db: AsyncSession) -> int:
+    """Count an OTP guess before checking it, in one atomic UPDATE, so parallel guesses
+    cannot get past OTP_MAX_ATTEMPTS. Returns the new attempt count."""
+    attempts = await db.scalar(
+        update(User)
+        .where(User.id == user.id, User.otp_hash.isnot(None))
+        .values(otp_attempts=User.otp_attempts + 1)
+        .returning(User.otp_attempts)
+    )
+    await db.commit()
+    if attempts is None or attempts > OTP_MAX_ATTEMPTS:
+        raise too_many_otp_attempts()
+    return attempts
+
+async def reject_wrong_user_otp(user: User, attempts: int, db: AsyncSession):
+    """Answer a wrong OTP for a stored user, invalidating the OTP on the last allowed attempt"""
+    if attempts >= OTP_MAX_ATTEMPTS:
+        await db.execute(update(User).where(User.id == user.id).values(otp_hash=None, otp_expiry=None))
+        await db.commit()
+        raise too_many_otp_attempts()
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid OTP"
+    )
+
 @otp_router.post("/signup", response_model=OTPResponse)
-async def signup_with_otp(request: OTPRequest, db: Session = Depends(get_db)):
+async def signup_with_otp(request: OTPRequest, db: AsyncSession = Depends(get_async_db)):
     """Initiate signup with OTP"""
     email = request.email
     
     # Check if user already exists and is verified
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user and existing_user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,15 +61,16 @@ async def signup_with_otp(request: OTPRequest, db: Session = Depends(get_db)):
     
     # Generate OTP
     otp = generate_otp()
-    hashed_otp = hash_otp(otp)
+    hashed_otp = await hash_otp_async(otp)
     expiry = datetime.utcnow() + timedelta(minutes=5)
     
     # Store in temporary storage (overwrite if exists)
-    temp_users[email] = {
-        "otp_hash": hashed_otp,
-        "otp_expiry": expiry,
-        "signup_pending": True
-    }
+    await pending_signups.put(db, PendingSignupData(
+        email=email,
+        otp_hash=hashed_otp,
+        otp_expiry=expiry,
+        signup_pending=True
+    ))
     
     # Send OTP email
     if not send_otp_email(email, otp):
@@ -48,36 +82,45 @@ async def signup_with_otp(request: OTPRequest, db: Session = Depends(get_db)):
     return OTPResponse(message="OTP sent to email. Please verify to complete signup")
 
 @otp_router.post("/verify-otp", response_model=OTPResponse)
-async def verify_otp_endpoint(request: OTPVerify, db: Session = Depends(get_db)):
+async def verify_otp_endpoint(request: OTPVerify, db: AsyncSession = Depends(get_async_db)):
     """Verify OTP for signup or login"""
     email = request.email
     otp = request.otp
     
     # First check if user is in temporary storage (new signup)
-    if email in temp_users and temp_users[email].get('signup_pending', False):
-        temp_user_data = temp_users[email]
+    temp_user_data = await pending_signups.get(db, email)
+    if temp_user_data and temp_user_data.signup_pending:
         
-        if datetime.utcnow() > temp_user_data['otp_expiry']:
-            temp_users.pop(email, None)
+        if datetime.utcnow() > temp_user_data.otp_expiry:
+            await pending_signups.delete(db, email)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="OTP expired"
             )
         
-        if not verify_otp_hash(otp, temp_user_data['otp_hash']):
+        # Count the guess before checking it (atomic in the store)
+        attempts = await pending_signups.add_attempt(db, email)
+        if attempts is None or attempts > OTP_MAX_ATTEMPTS:
+            raise too_many_otp_attempts()
+        
+        if not await verify_otp_hash_async(otp, temp_user_data.otp_hash):
+            if attempts >= OTP_MAX_ATTEMPTS:
+                await pending_signups.delete(db, email)
+                raise too_many_otp_attempts()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid OTP"
             )
         
         # Mark as verified in temp storage (waiting for password)
-        temp_users[email]['signup_pending'] = False
-        temp_users[email]['verified'] = True
+        temp_user_data.signup_pending = False
+        temp_user_data.verified = True
+        await pending_signups.put(db, temp_user_data, expires_at=datetime.utcnow() + PENDING_SIGNUP_GRACE)
         
         return OTPResponse(message="OTP verified successfully. Please set your password to complete registration")
     
     # If not in temp storage, check existing user (login verification)
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     
     if not user:
         raise HTTPException(
@@ -88,41 +131,42 @@ async def verify_otp_endpoint(request: OTPVerify, db: Session = Depends(get_db))
     if user.is_verified:
         return OTPResponse(message="User already verified")
     
-    if datetime.utcnow() > user.otp_expiry:
+    if not user.otp_expiry or datetime.utcnow() > user.otp_expiry:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP expired"
         )
     
-    if not verify_otp_hash(otp, user.otp_hash):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid OTP"
-        )
+    attempts = await claim_user_otp_attempt(user, db)
+    if not await verify_otp_hash_async(otp, user.otp_hash):
+        await reject_wrong_user_otp(user, attempts, db)
     
     # Mark user as verified
     user.is_verified = True
     user.otp_hash = None
     user.otp_expiry = None
-    db.commit()
+    user.otp_attempts = 0
+    await db.commit()
+    invalidate_cached_user(email)
     
     return OTPResponse(message="OTP verified successfully")
 
 @otp_router.post("/complete-signup", response_model=TokenResponse)
-async def complete_signup(request: OTPLogin, db: Session = Depends(get_db)):
+async def complete_signup(request: OTPLogin, db: AsyncSession = Depends(get_async_db)):
     """Complete signup after OTP verification"""
     email = request.email
     password = request.password
     
     # Check if user is verified in temp storage
-    if email not in temp_users or not temp_users[email].get('verified', False):
+    temp_user_data = await pending_signups.get(db, email)
+    if not temp_user_data or not temp_user_data.verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Please verify OTP first"
         )
     
     # Check if user already exists in database
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,7 +174,7 @@ async def complete_signup(request: OTPLogin, db: Session = Depends(get_db)):
         )
     
     # Create permanent user in database
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     new_user = User(
         email=email,
         password_hash=hashed_password,
@@ -139,16 +183,17 @@ async def complete_signup(request: OTPLogin, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    invalidate_cached_user(email)
     
     # Remove from temporary storage
-    temp_users.pop(email, None)
+    await pending_signups.delete(db, email)
     
     # Create access token
     access_token_expires = timedelta(hours=2)
-    access_token = create_access_token(
-        data={"sub": email}, expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        new_user, expires_delta=access_token_expires
     )
     
     return TokenResponse(
@@ -162,15 +207,15 @@ async def complete_signup(request: OTPLogin, db: Session = Depends(get_db)):
     )
 
 @otp_router.post("/resend-otp", response_model=OTPResponse)
-async def resend_otp(request: OTPResend, db: Session = Depends(get_db)):
+async def resend_otp(request: OTPResend, db: AsyncSession = Depends(get_async_db)):
     """Resend OTP for signup or verification"""
     email = request.email
     
     # First check if user is in temporary storage (pending signup)
-    if email in temp_users:
-        temp_user_data = temp_users[email]
+    temp_user_data = await pending_signups.get(db, email)
+    if temp_user_data:
         
-        if temp_user_data.get('verified', False):
+        if temp_user_data.verified:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User already verified"
@@ -178,12 +223,14 @@ async def resend_otp(request: OTPResend, db: Session = Depends(get_db)):
         
         # Generate new OTP
         otp = generate_otp()
-        hashed_otp = hash_otp(otp)
+        hashed_otp = await hash_otp_async(otp)
         expiry = datetime.utcnow() + timedelta(minutes=5)
         
         # Update temporary storage
-        temp_users[email]['otp_hash'] = hashed_otp
-        temp_users[email]['otp_expiry'] = expiry
+        temp_user_data.otp_hash = hashed_otp
+        temp_user_data.otp_expiry = expiry
+        temp_user_data.attempts = 0
+        await pending_signups.put(db, temp_user_data)
         
         # Send OTP email
         if not send_otp_email(email, otp):
@@ -195,7 +242,7 @@ async def resend_otp(request: OTPResend, db: Session = Depends(get_db)):
         return OTPResponse(message="OTP resent successfully")
     
     # If not in temp storage, check existing user
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     
     if not user:
         raise HTTPException(
@@ -211,10 +258,11 @@ async def resend_otp(request: OTPResend, db: Session = Depends(get_db)):
     
     # Generate new OTP
     otp = generate_otp()
-    user.otp_hash = hash_otp(otp)
+    user.otp_hash = await hash_otp_async(otp)
     user.otp_expiry = datetime.utcnow() + timedelta(minutes=5)
+    user.otp_attempts = 0
     
-    db.commit()
+    await db.commit()
     
     # Send OTP email
     if not send_otp_email(email, otp):
@@ -226,25 +274,26 @@ async def resend_otp(request: OTPResend, db: Session = Depends(get_db)):
     return OTPResponse(message="OTP resent successfully")
 
 @otp_router.post("/login-otp", response_model=OTPResponse)
-async def login_with_otp_request(request: OTPRequest, db: Session = Depends(get_db)):
+async def login_with_otp_request(request: OTPRequest, db: AsyncSession = Depends(get_async_db)):
     """Request OTP for login"""
     email = request.email
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         # Don't reveal if user exists or not for security
         return OTPResponse(message="If account exists, OTP will be sent to your email")
     
     # Generate OTP
     otp = generate_otp()
-    hashed_otp = hash_otp(otp)
+    hashed_otp = await hash_otp_async(otp)
     expiry = datetime.utcnow() + timedelta(minutes=5)
     
     # Store OTP in database
     user.otp_hash = hashed_otp
     user.otp_expiry = expiry
-    db.commit()
+    user.otp_attempts = 0
+    await db.commit()
     
     # Send OTP email
     if not send_otp_email(email, otp):
@@ -256,13 +305,13 @@ async def login_with_otp_request(request: OTPRequest, db: Session = Depends(get_
     return OTPResponse(message="OTP sent to email for login verification")
 
 @otp_router.post("/login-verify", response_model=TokenResponse)
-async def login_with_otp_verify(request: OTPVerify, db: Session = Depends(get_db)):
+async def login_with_otp_verify(request: OTPVerify, db: AsyncSession = Depends(get_async_db)):
     """Verify OTP and login"""
     email = request.email
     otp = request.otp
     
     # Find user
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -270,29 +319,29 @@ async def login_with_otp_verify(request: OTPVerify, db: Session = Depends(get_db
         )
     
     # Check OTP expiry
-    if datetime.utcnow() > user.otp_expiry:
+    if not user.otp_expiry or datetime.utcnow() > user.otp_expiry:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP expired"
         )
     
     # Verify OTP
-    if not verify_otp_hash(otp, user.otp_hash):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid OTP"
-        )
+    attempts = await claim_user_otp_attempt(user, db)
+    if not await verify_otp_hash_async(otp, user.otp_hash):
+        await reject_wrong_user_otp(user, attempts, db)
     
     # Clear OTP after successful verification
     user.otp_hash = None
     user.otp_expiry = None
+    user.otp_attempts = 0
     user.is_verified = True  # Ensure user is verified
-    db.commit()
+    await db.commit()
+    invalidate_cached_user(email)
     
     # Create access token
     access_token_expires = timedelta(hours=2)
-    access_token = create_access_token(
-        data={"sub": email}, expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        user, expires_delta=access_token_expires
     )
     
     return TokenResponse(
@@ -306,13 +355,13 @@ async def login_with_otp_verify(request: OTPVerify, db: Session = Depends(get_db
     )
 
 @otp_router.post("/login", response_model=TokenResponse)
-async def login_with_otp(request: OTPLogin, db: Session = Depends(get_db)):
+async def login_with_otp(request: OTPLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user with email and password"""
     email = request.email
     password = request.password
     
     # Find user
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -327,7 +376,7 @@ async def login_with_otp(request: OTPLogin, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -335,8 +384,8 @@ async def login_with_otp(request: OTPLogin, db: Session = Depends(get_db)):
     
     # Create access token
     access_token_expires = timedelta(hours=2)
-    access_token = create_access_token(
-        data={"sub": email}, expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        user, expires_delta=access_token_expires
     )
     
     return TokenResponse(
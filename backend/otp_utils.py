@@ -1,16 +1,18 @@
-import smtplib
 import random
 import string
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import hmac
+import hashlib
+import secrets
+import time
 from datetime import datetime, timedelta
 import bcrypt
-from typing import Dict, Any
-import threading
-import time
 from dotenv import load_dotenv
 
+from email_queue import SMTPConnectionPool, EmailDeliveryQueue
+from pending_signup_store import create_pending_signup_store
+from utils import SECRET_KEY, password_pool
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,9 +21,34 @@ EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT"))
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"
+
+# Email delivery queue configuration
+EMAIL_SPOOL_DIR = os.getenv("EMAIL_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_spool"))
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+OTP_EMAIL_TTL_SECONDS = 5 * 60   # OTPs expire after 5 minutes
+
+smtp_pool = SMTPConnectionPool(
+    EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD,
+    use_tls=EMAIL_USE_TLS, max_idle=EMAIL_WORKERS
+)
+email_queue = EmailDeliveryQueue(
+    smtp_pool, sender=EMAIL_USER, spool_dir=EMAIL_SPOOL_DIR,
+    workers=EMAIL_WORKERS, max_attempts=EMAIL_MAX_ATTEMPTS
+)
+
+# OTP hashing configuration
+OTP_HASH_SCHEME = os.getenv("OTP_HASH_SCHEME", "hmac")  # "hmac" (HMAC-SHA256 with a server secret) or "bcrypt"
+OTP_HMAC_SECRET = os.getenv("OTP_HMAC_SECRET") or SECRET_KEY
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))  # wrong guesses before the OTP is invalidated
+HMAC_OTP_PREFIX = "hmac-sha256$"
+
+if OTP_HASH_SCHEME not in ("hmac", "bcrypt"):
+    raise ValueError(f"Unknown OTP_HASH_SCHEME: {OTP_HASH_SCHEME}")
 
-# Temporary storage for unverified users
-temp_users: Dict[str, Dict[str, Any]] = {}
+# Storage for signups waiting for OTP verification (see PENDING_SIGNUP_STORE)
+pending_signups = create_pending_signup_store()
 
 def generate_otp(length: int = 6) -> str:
     """Generate a random OTP"""
@@ -29,70 +56,57 @@ def generate_otp(length: int = 6) -> str:
     print(f"🔢 Generated OTP: {otp}")
     return otp
 
-def hash_otp(otp: str) -> str:
-    """Hash OTP using bcrypt"""
-    return bcrypt.hashpw(otp.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def _hmac_otp_digest(otp: str, salt: str) -> str:
+    return hmac.new(OTP_HMAC_SECRET.encode('utf-8'), f"{salt}:{otp}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def hash_otp(otp: str, scheme: str = None) -> str:
+    """Hash OTP with the configured scheme (keyed HMAC-SHA256 or bcrypt)"""
+    if (scheme or OTP_HASH_SCHEME) == "bcrypt":
+        return bcrypt.hashpw(otp.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    salt = secrets.token_hex(8)
+    return f"{HMAC_OTP_PREFIX}{salt}${_hmac_otp_digest(otp, salt)}"
 
 def verify_otp_hash(otp: str, hashed_otp: str) -> bool:
-    """Verify OTP against hash"""
+    """Verify OTP against hash (the scheme is read from the stored hash)"""
+    if not hashed_otp:
+        return False
+    if hashed_otp.startswith(HMAC_OTP_PREFIX):
+        salt, _, digest = hashed_otp[len(HMAC_OTP_PREFIX):].partition("$")
+        return hmac.compare_digest(_hmac_otp_digest(otp, salt), digest)
     return bcrypt.checkpw(otp.encode('utf-8'), hashed_otp.encode('utf-8'))
 
+async def hash_otp_async(otp: str) -> str:
+    """hash_otp that keeps bcrypt work off the event loop"""
+    if OTP_HASH_SCHEME == "bcrypt":
+        return await password_pool.run(hash_otp, otp)
+    return hash_otp(otp)
+
+async def verify_otp_hash_async(otp: str, hashed_otp: str) -> bool:
+    """verify_otp_hash that keeps bcrypt work off the event loop"""
+    if hashed_otp and not hashed_otp.startswith(HMAC_OTP_PREFIX):
+        return await password_pool.run(verify_otp_hash, otp, hashed_otp)
+    return verify_otp_hash(otp, hashed_otp)
+
 def send_otp_email(email: str, otp: str) -> bool:
-    """Send OTP email"""
+    """Queue the OTP email for background delivery (returns once it is spooled)"""
+    body = f"""
+    <html>
+    <body>
+        <h2>Win GATE - OTP Verification</h2>
+        <p>Your OTP code is: <strong>{otp}</strong></p>
+        <p>This OTP will expire in 5 minutes.</p>
+        <p>If you didn't request this OTP, please ignore this email.</p>
+        <br>
+        <p>Best regards,<br>Win GATE Team</p>
+    </body>
+    </html>
+    """
+    
     try:
-        print(f"📧 Attempting to send OTP to {email}")
-        print(f"🔧 Email config: {EMAIL_HOST}:{EMAIL_PORT}, User: {EMAIL_USER}")
-        
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_USER
-        msg['To'] = email
-        msg['Subject'] = "OTP Verification - Win GATE"
-        
-        body = f"""
-        <html>
-        <body>
-            <h2>Win GATE - OTP Verification</h2>
-            <p>Your OTP code is: <strong>{otp}</strong></p>
-            <p>This OTP will expire in 5 minutes.</p>
-            <p>If you didn't request this OTP, please ignore this email.</p>
-            <br>
-            <p>Best regards,<br>Win GATE Team</p>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        print("🔌 Connecting to SMTP server...")
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        print("🔐 Logging into SMTP...")
-        server.login(EMAIL_USER, EMAIL_PASSWORD)
-        text = msg.as_string()
-        print("📤 Sending email...")
-        server.sendmail(EMAIL_USER, email, text)
-        server.quit()
-        
-        print(f"✅ OTP email sent successfully to {email}")
+        # The OTP is useless after 5 minutes, so an undelivered email is dropped then
+        email_queue.enqueue(email, "OTP Verification - Win GATE", body, expires_at=time.time() + OTP_EMAIL_TTL_SECONDS)
+        print(f"📧 OTP email queued for {email}")
         return True
-    except Exception as e:
-        print(f"❌ Error sending email: {e}")
-        print(f"❌ Error type: {type(e).__name__}")
+    except OSError as e:
+        print(f"❌ Error queueing email: {e}")
         return False
-
-def cleanup_expired_temp_users():
-    """Clean up expired temporary users every 5 minutes"""
-    while True:
-        time.sleep(300)  # 5 minutes
-        current_time = datetime.utcnow()
-        expired_emails = []
-        for email, data in temp_users.items():
-            if current_time > data['otp_expiry']:
-                expired_emails.append(email)
-        for email in expired_emails:
-            temp_users.pop(email, None)
-            print(f"Cleaned up expired temp user: {email}")
-
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_expired_temp_users, daemon=True)
-cleanup_thread.start()
@@ -0,0 +1,175 @@
+"""
+Storage for signups that are waiting for OTP verification / a password
+Two backends share one interface:
+- InMemoryPendingSignupStore: single process, expiry through a min-heap (O(log n))
+- DatabasePendingSignupStore: pending_signups table, shared by every worker process
+Every method takes the request's AsyncSession, so the database store runs on the
+connection the request already holds (and commits its own changes).
+"""
+
+import heapq
+import itertools
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import PendingSignup
+
+# How long a pending signup is kept after its OTP expires (so late attempts get "OTP expired")
+PENDING_SIGNUP_GRACE = timedelta(minutes=int(os.getenv("PENDING_SIGNUP_GRACE_MINUTES", "5")))
+# Expired rows removed per put (keeps each purge a short index range scan)
+PENDING_SIGNUP_PURGE_BATCH = int(os.getenv("PENDING_SIGNUP_PURGE_BATCH", "100"))
+
+class PendingSignupData(BaseModel):
+    email: str
+    otp_hash: str
+    otp_expiry: datetime
+    signup_pending: bool = True
+    verified: bool = False
+    attempts: int = 0           # wrong OTP guesses for the current OTP
+
+class PendingSignupStore(ABC):
+    """Interface for pending signup storage, entries disappear after expires_at"""
+
+    @abstractmethod
+    async def get(self, db: AsyncSession, email: str) -> Optional[PendingSignupData]:
+        ...
+
+    @abstractmethod
+    async def put(self, db: AsyncSession, data: PendingSignupData, expires_at: Optional[datetime] = None) -> None:
+        """Insert or replace an entry (expires_at defaults to otp_expiry + grace period)"""
+
+    @abstractmethod
+    async def delete(self, db: AsyncSession, email: str) -> None:
+        ...
+
+    @abstractmethod
+    async def add_attempt(self, db: AsyncSession, email: str) -> Optional[int]:
+        """Atomically count one OTP guess, returning the new count (None when no pending OTP)"""
+
+    @staticmethod
+    def default_expiry(data: PendingSignupData) -> datetime:
+        return data.otp_expiry + PENDING_SIGNUP_GRACE
+
+class InMemoryPendingSignupStore(PendingSignupStore):
+    """Per-process store, expired entries are dropped from a min-heap on every access"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[PendingSignupData, datetime, int]] = {}
+        self._expiry_heap: List[Tuple[datetime, int, str]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: datetime):
+        # Heap entries whose sequence no longer matches were superseded by a later put/delete
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, sequence, email = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(email)
+            if entry is not None and entry[2] == sequence:
+                del self._entries[email]
+
+    async def get(self, db: AsyncSession, email: str) -> Optional[PendingSignupData]:
+        with self._lock:
+            self._purge_expired(datetime.utcnow())
+            entry = self._entries.get(email)
+            return entry[0].model_copy() if entry else None
+
+    async def put(self, db: AsyncSession, data: PendingSignupData, expires_at: Optional[datetime] = None) -> None:
+        expires_at = expires_at or self.default_expiry(data)
+        with self._lock:
+            self._purge_expired(datetime.utcnow())
+            sequence = next(self._sequence)
+            self._entries[data.email] = (data.model_copy(), expires_at, sequence)
+            heapq.heappush(self._expiry_heap, (expires_at, sequence, data.email))
+
+    async def delete(self, db: AsyncSession, email: str) -> None:
+        with self._lock:
+            self._entries.pop(email, None)
+            self._purge_expired(datetime.utcnow())
+
+    async def add_attempt(self, db: AsyncSession, email: str) -> Optional[int]:
+        with self._lock:
+            self._purge_expired(datetime.utcnow())
+            entry = self._entries.get(email)
+            if entry is None or not entry[0].signup_pending:
+                return None
+            entry[0].attempts += 1
+            return entry[0].attempts
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DatabasePendingSignupStore(PendingSignupStore):
+    """Store backed by the pending_signups table, visible to every worker process"""
+
+    async def get(self, db: AsyncSession, email: str) -> Optional[PendingSignupData]:
+        row = await db.scalar(select(PendingSignup).where(
+            PendingSignup.email == email,
+            PendingSignup.expires_at > datetime.utcnow()
+        ))
+        if row is None:
+            return None
+        return PendingSignupData(
+            email=row.email,
+            otp_hash=row.otp_hash,
+            otp_expiry=row.otp_expiry,
+            signup_pending=row.signup_pending,
+            verified=row.verified,
+            attempts=row.attempts
+        )
+
+    async def put(self, db: AsyncSession, data: PendingSignupData, expires_at: Optional[datetime] = None) -> None:
+        values = {**data.model_dump(), "expires_at": expires_at or self.default_expiry(data)}
+        upsert = insert(PendingSignup).values(**values)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[PendingSignup.email],
+            set_={key: upsert.excluded[key] for key in values if key != "email"}
+        )
+        # Purge a bounded batch of expired rows here (expires_at is indexed) instead of running
+        # a sweeper thread; SKIP LOCKED keeps workers purging at once out of each other's way
+        expired = (
+            select(PendingSignup.email)
+            .where(PendingSignup.expires_at <= datetime.utcnow())
+            .limit(PENDING_SIGNUP_PURGE_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        await db.execute(delete(PendingSignup).where(PendingSignup.email.in_(expired.scalar_subquery())))
+        await db.execute(upsert)
+        await db.commit()
+
+    async def delete(self, db: AsyncSession, email: str) -> None:
+        await db.execute(delete(PendingSignup).where(PendingSignup.email == email))
+        await db.commit()
+
+    async def add_attempt(self, db: AsyncSession, email: str) -> Optional[int]:
+        attempts = await db.scalar(
+            update(PendingSignup)
+            .where(
+                PendingSignup.email == email,
+                PendingSignup.signup_pending.is_(True),
+                PendingSignup.expires_at > datetime.utcnow()
+            )
+            .values(attempts=PendingSignup.attempts + 1)
+            .returning(PendingSignup.attempts)
+        )
+        await db.commit()
+        return attempts
+
+PENDING_SIGNUP_STORES = {
+    "memory": InMemoryPendingSignupStore,
+    "database": DatabasePendingSignupStore,
+}
+
+def create_pending_signup_store(backend: Optional[str] = None) -> PendingSignupStore:
+    """Build the store selected by PENDING_SIGNUP_STORE (memory only works with a single worker)"""
+    backend = backend or os.getenv("PENDING_SIGNUP_STORE", "database")
+    if backend not in PENDING_SIGNUP_STORES:
+        raise ValueError(f"Unknown pending signup store: {backend}")
+    return PENDING_SIGNUP_STORES[backend]()
@@ -0,0 +1,130 @@
+"""
+Per-owner response cache for Win GATE read endpoints
+Cached responses are keyed by endpoint, owner and the owner's data version (the
+counter behind the ETag, see data_versions.py) plus the endpoint's parameters.
+Every write bumps the data version in its own transaction, which makes the
+owner's stale entries unreachable on every worker; they then age out of the
+LRU / expire on their own. There is no separate invalidation step.
+
+Two backends share one interface (RESPONSE_CACHE_BACKEND):
+- memory: per-process LRU
+- redis: shared by every worker process (needs `pip install redis` and REDIS_URL)
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+from cache import TTLCache
+
+ResponseModel = TypeVar("ResponseModel", bound=BaseModel)
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+def owner_key(user_id: Optional[int], visitor_id: Optional[str]) -> str:
+    """Cache key part for one owner, e.g. owner_key(1, None) -> "user:1" """
+    return f"user:{user_id}" if user_id is not None else f"visitor:{visitor_id}"
+
+def encode_response(value: BaseModel) -> str:
+    """JSON stored by the shared (redis) backend"""
+    return value.model_dump_json()
+
+def decode_response(raw, model: Type[ResponseModel]) -> ResponseModel:
+    """Inverse of encode_response; `model` must accept everything the stored value holds"""
+    return model.model_validate_json(raw)
+
+class ResponseCacheBackend(ABC):
+    """Interface for response cache storage"""
+
+    @abstractmethod
+    async def get(self, key: str, model: Type[ResponseModel]) -> Optional[ResponseModel]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: BaseModel) -> None:
+        ...
+
+class InMemoryResponseCacheBackend(ResponseCacheBackend):
+    """Per-process LRU of response models (stored as is, no serialization)"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str, model: Type[ResponseModel]) -> Optional[ResponseModel]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: BaseModel) -> None:
+        self.entries.set(key, value)
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    """Redis-backed cache shared by every worker, entries stored as JSON with a TTL"""
+
+    def __init__(self, url: Optional[str] = None, ttl: float = RESPONSE_CACHE_TTL_SECONDS, prefix: str = "win_gate:response:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+        self.client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        self.ttl = max(int(ttl), 1)
+        self.prefix = prefix
+
+    async def get(self, key: str, model: Type[ResponseModel]) -> Optional[ResponseModel]:
+        raw = await self.client.get(self.prefix + key)
+        return decode_response(raw, model) if raw is not None else None
+
+    async def set(self, key: str, value: BaseModel) -> None:
+        await self.client.set(self.prefix + key, encode_response(value), ex=self.ttl)
+
+RESPONSE_CACHE_BACKENDS = {
+    "memory": InMemoryResponseCacheBackend,
+    "redis": RedisResponseCacheBackend,
+}
+
+class ResponseCache:
+    """Read-through cache in front of a backend, keyed by the owner's data version"""
+
+    def __init__(self, backend: ResponseCacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_build(
+        self,
+        endpoint: str,
+        owner: str,
+        data_version: int,
+        params: tuple,
+        model: Type[ResponseModel],
+        build: Callable[[], Awaitable[ResponseModel]]
+    ) -> ResponseModel:
+        """Cached response for (endpoint, owner, data_version, params), built and stored on a miss
+
+        data_version must be read before building (conditional_get keeps it in
+        request.state.data_version): a write that commits while this builds bumps
+        it, so readers after that write look under a different key.
+        """
+        key = ":".join([endpoint, f"{owner}@{data_version}", *(str(param) for param in params)])
+        cached = await self.backend.get(key, model)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        value = await build()
+        await self.backend.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+def create_response_cache(backend: Optional[str] = None) -> ResponseCache:
+    """Build the cache selected by RESPONSE_CACHE_BACKEND (memory by default)"""
+    backend = backend or os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    if backend not in RESPONSE_CACHE_BACKENDS:
+        raise ValueError(f"Unknown response cache backend: {backend}")
+    return ResponseCache(RESPONSE_CACHE_BACKENDS[backend]())
+
+response_cache = create_response_cache()
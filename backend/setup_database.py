@@ -9,6 +9,8 @@ import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from sqlalchemy import create_engine
 from database_models import Base, create_tables
+from migrations import run_migrations
+from curriculum_catalogue import seed_curriculum_catalogue
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -23,6 +25,8 @@ def setup_database():
         # Create engine and tables
         engine = create_engine(database_url, echo=True)
         create_tables()
+        run_migrations()
+        seed_curriculum_catalogue()
         
         print("Database tables created successfully!")
         return True
@@ -0,0 +1,153 @@
+"""
+Study streak and trend analytics for Win GATE
+An owner's (study_date, hours) pairs are loaded with one index-only scan,
+spread onto a dense per-day numpy array, and every metric is computed with
+vectorized operations. Results are cached per owner, day and study hours data
+version, so a save or delete on any worker makes the next read miss.
+"""
+
+import os
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from database_models import StudyHours
+
+TREND_DAYS = 30
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Per-process cache, entries for superseded data versions age out through the TTL and LRU
+analytics_cache = TTLCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+)
+
+class TrendPoint(BaseModel):
+    date: date
+    hours: float
+    rolling_7_day_average: float
+    rolling_30_day_average: float
+
+class WeekdayStats(BaseModel):
+    weekday: str
+    total_hours: float
+    days_logged: int
+    average_hours: float         # per logged day
+
+class StudyAnalyticsResponse(BaseModel):
+    as_of: date
+    total_hours: float
+    days_logged: int
+    first_study_date: Optional[date] = None
+    last_study_date: Optional[date] = None
+    current_streak: int          # consecutive days up to today (or yesterday, if today is not logged yet)
+    longest_streak: int
+    rolling_7_day_average: float   # hours per calendar day over the last 7 days
+    rolling_30_day_average: float
+    weekday_distribution: List[WeekdayStats]
+    trend: List[TrendPoint]      # last TREND_DAYS days, oldest first
+
+def analytics_cache_key(user_id: Optional[int], visitor_id: Optional[str], today: date, data_version: int) -> tuple:
+    owner = ("user", user_id) if user_id is not None else ("visitor", visitor_id)
+    return (*owner, today, data_version)
+
+def compute_study_analytics(study_dates: np.ndarray, hours: np.ndarray, today: date) -> StudyAnalyticsResponse:
+    """All metrics from parallel arrays of datetime64[D] dates and hours (one entry per logged day)"""
+    today_day = np.datetime64(today, "D")
+
+    # Dense per-day series from the first logged day (or TREND_DAYS back) up to today;
+    # TREND_DAYS - 1 extra leading zeros give every trend point a full 30-day window
+    first_day = min(study_dates.min(), today_day) if study_dates.size else today_day
+    start_day = min(first_day, today_day - (TREND_DAYS - 1)) - (TREND_DAYS - 1)
+    span = int((today_day - start_day).astype(int)) + 1
+    daily_hours = np.zeros(span)
+    in_range = study_dates <= today_day
+    np.add.at(daily_hours, (study_dates[in_range] - start_day).astype(int), hours[in_range])
+
+    # Streaks: run lengths of consecutive logged days
+    active = np.concatenate(([0], (daily_hours > 0).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(active))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+    run_lengths = run_ends - run_starts
+    longest_streak = int(run_lengths.max()) if run_lengths.size else 0
+    # run_ends is exclusive: span means the run includes today, span - 1 that it ended yesterday
+    current_streak = int(run_lengths[-1]) if run_lengths.size and run_ends[-1] >= span - 1 else 0
+
+    # Rolling averages via a cumulative sum: window sum = cumsum[i] - cumsum[i - k]
+    cumulative = np.concatenate(([0.0], np.cumsum(daily_hours)))
+    rolling_7 = (cumulative[7:] - cumulative[:-7]) / 7
+    rolling_30 = (cumulative[30:] - cumulative[:-30]) / 30
+
+    trend_dates = np.arange(today_day - (TREND_DAYS - 1), today_day + 1)
+    trend = [
+        TrendPoint(date=day.item(), hours=day_hours, rolling_7_day_average=avg_7, rolling_30_day_average=avg_30)
+        for day, day_hours, avg_7, avg_30 in zip(
+            trend_dates,
+            daily_hours[-TREND_DAYS:].tolist(),
+            rolling_7[-TREND_DAYS:].tolist(),
+            rolling_30[-TREND_DAYS:].tolist()
+        )
+    ]
+
+    # Weekday distribution (1970-01-01 was a Thursday, so +3 makes Monday 0)
+    logged = hours > 0
+    weekdays = (study_dates[logged].astype(np.int64) + 3) % 7
+    weekday_hours = np.bincount(weekdays, weights=hours[logged], minlength=7)
+    weekday_days = np.bincount(weekdays, minlength=7)
+    weekday_average = np.divide(weekday_hours, weekday_days, out=np.zeros(7), where=weekday_days > 0)
+
+    return StudyAnalyticsResponse(
+        as_of=today,
+        total_hours=float(hours.sum()),
+        days_logged=int(logged.sum()),
+        first_study_date=study_dates.min().item() if study_dates.size else None,
+        last_study_date=study_dates.max().item() if study_dates.size else None,
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+        rolling_7_day_average=float(rolling_7[-1]),
+        rolling_30_day_average=float(rolling_30[-1]),
+        weekday_distribution=[
+            WeekdayStats(
+                weekday=name,
+                total_hours=float(weekday_hours[index]),
+                days_logged=int(weekday_days[index]),
+                average_hours=float(weekday_average[index])
+            )
+            for index, name in enumerate(WEEKDAYS)
+        ],
+        trend=trend
+    )
+
+async def get_study_analytics(
+    db: AsyncSession,
+    data_version: int,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> StudyAnalyticsResponse:
+    """Cached analytics for one owner, recomputed from the database on a miss
+
+    data_version is the owner's study hours version (request.state.data_version)
+    """
+    today = date.today()
+    cache_key = analytics_cache_key(user_id, visitor_id, today, data_version)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    owner_filter = StudyHours.user_id == user_id if user_id is not None else StudyHours.visitor_id == visitor_id
+    rows = (await db.execute(
+        select(StudyHours.study_date, StudyHours.hours)
+        .where(owner_filter, StudyHours.study_date.is_not(None))
+    )).all()
+
+    study_dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    hours = np.array([row[1] for row in rows], dtype=float)
+    analytics = compute_study_analytics(study_dates, hours, today)
+
+    analytics_cache.set(cache_key, analytics)
+    return analytics
@@ -0,0 +1,100 @@
+"""
+Study goals and monthly targets for Win GATE
+Month lengths and targets are looked up from a cache keyed by
+(year, month, daily goal), so progress never recomputes calendar math inline.
+"""
+
+import calendar
+import os
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import StudyGoal
+from data_versions import STUDY_HOURS_SCOPE, bump_data_version
+
+class StudyGoalUpdate(BaseModel):
+    daily_hours: float = Field(gt=0, le=24)
+
+class StudyGoalResponse(BaseModel):
+    daily_hours: float
+    is_default: bool             # True when the owner has not set a goal yet
+
+# Daily target used until an owner sets their own goal
+DEFAULT_DAILY_HOURS = float(os.getenv("DEFAULT_DAILY_STUDY_HOURS", "7"))
+
+class MonthPacing(BaseModel):
+    daily_goal_hours: float
+    days_in_month: int
+    target_hours: float
+    progress_percentage: float
+    remaining_days: int          # days left in the month, today included
+    hours_remaining: float       # hours still needed to reach the target
+    required_daily_hours: Optional[float] = None  # None once the month is over with the target missed
+
+@lru_cache(maxsize=1024)
+def days_in_month(year: int, month: int) -> int:
+    """Calendar length of a month, leap years included"""
+    return calendar.monthrange(year, month)[1]
+
+@lru_cache(maxsize=4096)
+def month_target_hours(year: int, month: int, daily_hours: float) -> float:
+    return days_in_month(year, month) * daily_hours
+
+def remaining_days_in_month(year: int, month: int, today: Optional[date] = None) -> int:
+    today = today or date.today()
+    if (year, month) < (today.year, today.month):
+        return 0
+    if (year, month) > (today.year, today.month):
+        return days_in_month(year, month)
+    return days_in_month(year, month) - today.day + 1
+
+def month_pacing(year: int, month: int, total_hours: float, daily_hours: float, today: Optional[date] = None) -> MonthPacing:
+    """Progress towards the month target and the hours per remaining day needed to reach it"""
+    target_hours = month_target_hours(year, month, daily_hours)
+    remaining_days = remaining_days_in_month(year, month, today)
+    hours_remaining = max(target_hours - total_hours, 0.0)
+    
+    if hours_remaining == 0:
+        required_daily_hours = 0.0
+    elif remaining_days:
+        required_daily_hours = hours_remaining / remaining_days
+    else:
+        required_daily_hours = None
+    
+    return MonthPacing(
+        daily_goal_hours=daily_hours,
+        days_in_month=days_in_month(year, month),
+        target_hours=target_hours,
+        progress_percentage=(total_hours / target_hours * 100) if target_hours > 0 else 0,
+        remaining_days=remaining_days,
+        hours_remaining=hours_remaining,
+        required_daily_hours=required_daily_hours
+    )
+
+def goal_owner_filter(user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    return StudyGoal.user_id == user_id if user_id is not None else StudyGoal.visitor_id == visitor_id
+
+async def get_study_goal(db: AsyncSession, user_id: Optional[int] = None, visitor_id: Optional[str] = None) -> StudyGoalResponse:
+    """The owner's daily goal, or DEFAULT_DAILY_HOURS when none is set"""
+    daily_hours = await db.scalar(select(StudyGoal.daily_hours).where(goal_owner_filter(user_id, visitor_id)))
+    if daily_hours is None:
+        return StudyGoalResponse(daily_hours=DEFAULT_DAILY_HOURS, is_default=True)
+    return StudyGoalResponse(daily_hours=daily_hours, is_default=False)
+
+async def save_study_goal(db: AsyncSession, goal: StudyGoalUpdate, user_id: Optional[int] = None, visitor_id: Optional[str] = None) -> StudyGoalResponse:
+    """Insert or replace the owner's daily goal"""
+    owner_column = StudyGoal.user_id if user_id is not None else StudyGoal.visitor_id
+    upsert = insert(StudyGoal).values(user_id=user_id, visitor_id=visitor_id, daily_hours=goal.daily_hours)
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[owner_column],
+        set_={"daily_hours": upsert.excluded.daily_hours, "updated_at": func.now()}
+    ))
+    await bump_data_version(db, STUDY_HOURS_SCOPE, user_id=user_id, visitor_id=visitor_id)
+    await db.commit()
+    return StudyGoalResponse(daily_hours=goal.daily_hours, is_default=False)
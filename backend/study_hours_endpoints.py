@@ -1,27 +1,49 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List, Optional
+from sqlalchemy import select, delete, func, tuple_, literal_column, Date
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Literal, Optional
+import base64
 import os
 
 # Import our database models and dependencies
-from database_models import get_db, User, StudyHours, CurriculumData
-from utils import pwd_context, SECRET_KEY, ALGORITHM, create_access_token, verify_token
+from database_models import get_async_db, AsyncSessionLocal, User, StudyHours, StudyHoursMonthly, CurriculumData
+from utils import pwd_context, SECRET_KEY, ALGORITHM, create_access_token, verify_token, get_current_user_id
+from study_rollups import refresh_month_rollup, delete_owner_rollups, rollup_owner_filter
+from study_analytics import StudyAnalyticsResponse, get_study_analytics
+from study_goals import MonthPacing, StudyGoalUpdate, StudyGoalResponse, month_pacing, get_study_goal, save_study_goal
+from response_cache import response_cache, owner_key
+from data_versions import STUDY_HOURS_SCOPE, bump_data_version, conditional_get
+from fast_responses import dumps_rows, dumps_rows_ndjson, rows_response, model_response, parse_fields
 
 # Create router for study hours endpoints
 study_router = APIRouter(prefix="/api/study-hours", tags=["Study Hours"])
 
 # Pydantic models for request/response
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, model_validator
 
 class StudyHoursCreate(BaseModel):
     month: int
     year: int
     day: int
     hours: float
+    
+    @model_validator(mode="after")
+    def check_calendar_date(self):
+        try:
+            date(self.year, self.month, self.day)
+        except ValueError:
+            raise ValueError(f"{self.year}-{self.month}-{self.day} is not a valid date")
+        return self
 
 class StudyHoursResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     user_id: Optional[int] = None
     visitor_id: Optional[str] = None 
@@ -36,193 +58,494 @@ class StudyHoursListResponse(BaseModel):
     data: List[StudyHoursResponse]
     total_hours: float
     average_hours: float
+    days_logged: int = 0
+    max_day_hours: float = 0.0
     progress_percentage: float
+    pacing: Optional[MonthPacing] = None
 
-# Authentication dependency for user endpoints
-def get_current_user_email(current_user_email: str = Depends(verify_token)):
-    return current_user_email
+class StudyHoursBulkCreate(BaseModel):
+    entries: List[StudyHoursCreate]
 
-# Study Hours endpoints for authenticated users
+class StudyHoursBucket(BaseModel):
+    start: date                  # first day of the bucket (weeks start on Monday)
+    total_hours: float
+    days_logged: int
 
-@study_router.post("/save-day", response_model=StudyHoursResponse)
-async def save_study_hours(
-    study_data: StudyHoursCreate,
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
-):
-    """Save study hours for authenticated user"""
-    
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
+class StudyHoursRangeResponse(BaseModel):
+    from_date: date
+    to_date: date
+    bucket: str
+    total_hours: float
+    days_logged: int
+    average_hours: float
+    buckets: List[StudyHoursBucket]  # only buckets with logged hours
+
+# Shared helpers for user and visitor endpoints
+
+def study_hours_upsert(rows: List[dict], user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    """INSERT ... ON CONFLICT (owner, year, month, day) DO UPDATE for one owner's days"""
+    owner_column = StudyHours.user_id if user_id is not None else StudyHours.visitor_id
+    upsert = insert(StudyHours).values([
+        {**row, "study_date": date(row["year"], row["month"], row["day"]), "user_id": user_id, "visitor_id": visitor_id}
+        for row in rows
+    ])
+    return upsert.on_conflict_do_update(
+        index_elements=[owner_column, StudyHours.year, StudyHours.month, StudyHours.day],
+        # study_date too: rows inserted without it (by code older than migration 6) get it on their next save
+        set_={"hours": upsert.excluded.hours, "study_date": upsert.excluded.study_date, "updated_at": func.now()}
+    )
+
+# Keyset pagination and streaming for /all
+
+STUDY_HOURS_COLUMNS = (
+    StudyHours.id,
+    StudyHours.user_id,
+    StudyHours.visitor_id,
+    StudyHours.month,
+    StudyHours.year,
+    StudyHours.day,
+    StudyHours.hours,
+    StudyHours.created_at,
+    StudyHours.updated_at
+)
+STUDY_HOURS_ORDER = (StudyHours.year, StudyHours.month, StudyHours.day)
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+
+def encode_study_hours_cursor(year: int, month: int, day: int) -> str:
+    """Opaque cursor pointing just after (year, month, day)"""
+    return base64.urlsafe_b64encode(f"{year}-{month}-{day}".encode()).decode().rstrip("=")
+
+def decode_study_hours_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        year, month, day = (int(part) for part in base64.urlsafe_b64decode(padded).decode().split("-"))
+    except (ValueError, UnicodeDecodeError):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
+    return year, month, day
+
+def study_hours_columns(fields: Optional[List[str]]) -> tuple:
+    """Columns for a fields= projection, all of STUDY_HOURS_COLUMNS when fields is None"""
+    if fields is None:
+        return STUDY_HOURS_COLUMNS
+    return tuple(column for column in STUDY_HOURS_COLUMNS if column.key in fields)
+
+async def stream_study_hours(owner_filter, stream_format: str, columns: tuple = STUDY_HOURS_COLUMNS) -> AsyncIterator[bytes]:
+    """Yield an owner's study hours as NDJSON lines or JSON array chunks, STREAM_CHUNK_SIZE rows at a time
     
-    # Check if study hours already exist for this day
-    existing_record = db.query(StudyHours).filter(
-        StudyHours.user_id == user.id,
-        StudyHours.month == study_data.month,
-        StudyHours.year == study_data.year,
-        StudyHours.day == study_data.day
-    ).first()
-    
-    if existing_record:
-        # Update existing record
-        existing_record.hours = study_data.hours
-        existing_record.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_record)
-        
-        return StudyHoursResponse(
-            id=existing_record.id,
-            user_id=existing_record.user_id,
-            month=existing_record.month,
-            year=existing_record.year,
-            day=existing_record.day,
-            hours=existing_record.hours,
-            created_at=existing_record.created_at,
-            updated_at=existing_record.updated_at
-        )
-    else:
-        # Create new record
-        new_record = StudyHours(
-            user_id=user.id,
-            month=study_data.month,
-            year=study_data.year,
-            day=study_data.day,
-            hours=study_data.hours
+    Opens its own session for as long as the body is being sent. The request session
+    is not used: FastAPI up to 0.105 tears yield dependencies down after the body is
+    sent, but 0.106+ does it before, which would close the connection mid-stream.
+    """
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(*columns)
+            .where(owner_filter)
+            .order_by(*STUDY_HOURS_ORDER)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
         )
         
-        db.add(new_record)
-        db.commit()
-        db.refresh(new_record)
+        # The columns are StudyHoursResponse fields, so rows go straight to orjson
+        if stream_format == "ndjson":
+            async for rows in result.partitions():
+                yield dumps_rows_ndjson(rows)
+            return
         
-        return StudyHoursResponse(
-            id=new_record.id,
-            user_id=new_record.user_id,
-            month=new_record.month,
-            year=new_record.year,
-            day=new_record.day,
-            hours=new_record.hours,
-            created_at=new_record.created_at,
-            updated_at=new_record.updated_at
+        separator = b"["
+        async for rows in result.partitions():
+            yield separator + dumps_rows(rows)[1:-1]
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+
+class date_bucket(FunctionElement):
+    """date_bucket(literal_column("'week'"), date_column): first day of the day/week/month holding the date"""
+    type = Date()
+    name = "date_bucket"
+    inherit_cache = True
+
+@compiles(date_bucket)
+def compile_date_bucket(element, compiler, **kw):
+    bucket, column = element.clauses
+    return f"CAST(date_trunc({compiler.process(bucket, **kw)}, {compiler.process(column, **kw)}) AS DATE)"
+
+# SQLite has no date_trunc (the test suite runs on it); weeks start on Monday like date_trunc's
+SQLITE_DATE_BUCKET_MODIFIERS = {"day": "", "week": ", '-6 days', 'weekday 1'", "month": ", 'start of month'"}
+
+@compiles(date_bucket, "sqlite")
+def compile_date_bucket_sqlite(element, compiler, **kw):
+    bucket, column = element.clauses
+    modifiers = SQLITE_DATE_BUCKET_MODIFIERS[bucket.name.strip("'")]
+    return f"date({compiler.process(column, **kw)}{modifiers})"
+
+async def build_range_summary(
+    db: AsyncSession,
+    from_date: date,
+    to_date: date,
+    bucket: str,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> StudyHoursRangeResponse:
+    """Study hours between two dates (inclusive), grouped into day/week/month buckets by the database"""
+    
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must not be after 'to'"
         )
+    
+    owner_filter = StudyHours.user_id == user_id if user_id is not None else StudyHours.visitor_id == visitor_id
+    # bucket is one of day/week/month (validated by the route), inlined so GROUP BY matches the select
+    bucket_start = date_bucket(literal_column(f"'{bucket}'"), StudyHours.study_date).label("start")
+    
+    rows = (await db.execute(
+        select(bucket_start, func.sum(StudyHours.hours).label("total_hours"), func.count().label("days_logged"))
+        .where(owner_filter, StudyHours.study_date.between(from_date, to_date))
+        .group_by(bucket_start)
+        .order_by(bucket_start)
+    )).all()
+    
+    total_hours = sum(row.total_hours for row in rows)
+    days_logged = sum(row.days_logged for row in rows)
+    
+    return StudyHoursRangeResponse(
+        from_date=from_date,
+        to_date=to_date,
+        bucket=bucket,
+        total_hours=total_hours,
+        days_logged=days_logged,
+        average_hours=total_hours / days_logged if days_logged else 0.0,
+        buckets=[
+            StudyHoursBucket(start=row.start, total_hours=row.total_hours, days_logged=row.days_logged)
+            for row in rows
+        ]
+    )
 
-@study_router.get("/month/{month}/{year}", response_model=StudyHoursListResponse)
-async def get_month_study_hours(
+async def build_month_summary(
+    db: AsyncSession,
     month: int,
     year: int,
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
-):
-    """Get study hours for a specific month and year"""
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None,
+    summary_only: bool = False
+) -> StudyHoursListResponse:
+    """Study hours and statistics for one owner's month (totals from the study_hours_monthly rollup)"""
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
+    if not 1 <= month <= 12:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Month must be between 1 and 12"
         )
     
-    # Get study hours for the month
-    study_records = db.query(StudyHours).filter(
-        StudyHours.user_id == user.id,
-        StudyHours.month == month,
-        StudyHours.year == year
-    ).all()
-    
-    # Calculate statistics
-    total_hours = sum(record.hours for record in study_records)
-    average_hours = total_hours / len(study_records) if study_records else 0
-    
-    # Calculate progress (assuming 7 hours per day target)
-    days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month-1] if month > 0 else 31
-    target_hours = days_in_month * 7  # 7 hours per day target
-    progress_percentage = (total_hours / target_hours * 100) if target_hours > 0 else 0
-    
-    # Convert to response format
-    response_data = [
-        StudyHoursResponse(
-            id=record.id,
-            user_id=record.user_id,
-            month=record.month,
-            year=record.year,
-            day=record.day,
-            hours=record.hours,
-            created_at=record.created_at,
-            updated_at=record.updated_at
-        )
-        for record in study_records
-    ]
+    # Month totals are a single row from the rollup, kept current by every save and delete
+    rollup = (await db.execute(select(
+        StudyHoursMonthly.total_hours,
+        StudyHoursMonthly.days_logged,
+        StudyHoursMonthly.max_day_hours
+    ).where(
+        rollup_owner_filter(user_id, visitor_id),
+        StudyHoursMonthly.year == year,
+        StudyHoursMonthly.month == month
+    ))).first()
+    total_hours, days_logged, max_day_hours = rollup if rollup else (0.0, 0, 0.0)
+    average_hours = total_hours / days_logged if days_logged else 0.0
+    
+    response_data = []
+    if not summary_only:
+        # Raw rows only for the per-day list
+        owner_filter = StudyHours.user_id == user_id if user_id is not None else StudyHours.visitor_id == visitor_id
+        rows = (await db.execute(select(
+            StudyHours.id,
+            StudyHours.user_id,
+            StudyHours.visitor_id,
+            StudyHours.day,
+            StudyHours.hours,
+            StudyHours.created_at,
+            StudyHours.updated_at
+        ).where(owner_filter, StudyHours.month == month, StudyHours.year == year).order_by(StudyHours.day))).all()
+        
+        # Built from our own query, no need to validate again
+        response_data = [
+            StudyHoursResponse.model_construct(
+                id=row.id,
+                user_id=row.user_id,
+                visitor_id=row.visitor_id,
+                month=month,
+                year=year,
+                day=row.day,
+                hours=row.hours,
+                created_at=row.created_at,
+                updated_at=row.updated_at
+            )
+            for row in rows
+        ]
+    
+    # Progress against the owner's daily goal for this month
+    goal = await get_study_goal(db, user_id=user_id, visitor_id=visitor_id)
+    pacing = month_pacing(year, month, total_hours, goal.daily_hours)
     
     return StudyHoursListResponse(
         data=response_data,
         total_hours=total_hours,
         average_hours=average_hours,
-        progress_percentage=progress_percentage
+        days_logged=days_logged,
+        max_day_hours=max_day_hours,
+        progress_percentage=pacing.progress_percentage,
+        pacing=pacing
+    )
+
+async def study_hours_conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> Optional[Response]:
+    """ETag check for study hours reads, today's date is part of the tag (pacing and streaks depend on it)"""
+    return await conditional_get(request, response, db, STUDY_HOURS_SCOPE, date.today(), user_id=user_id, visitor_id=visitor_id)
+
+async def cached_month_summary(
+    db: AsyncSession,
+    month: int,
+    year: int,
+    data_version: int,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None,
+    summary_only: bool = False
+) -> StudyHoursListResponse:
+    """build_month_summary through the response cache (keyed by the owner's data version)
+
+    Today's date is part of the key: pacing (days left, required hours per day) changes at midnight.
+    """
+    return await response_cache.get_or_build(
+        "study-hours/month",
+        owner_key(user_id, visitor_id),
+        data_version,
+        (year, month, summary_only, date.today()),
+        StudyHoursListResponse,
+        lambda: build_month_summary(db, month, year, user_id=user_id, visitor_id=visitor_id, summary_only=summary_only)
     )
 
+async def bulk_save_study_hours(
+    db: AsyncSession,
+    bulk_data: StudyHoursBulkCreate,
+    user_id: Optional[int] = None,
+    visitor_id: Optional[str] = None
+) -> StudyHoursListResponse:
+    """Upsert many days of one month in a single statement and transaction, return the month summary"""
+    
+    if not bulk_data.entries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No study hours entries provided"
+        )
+    
+    month, year = bulk_data.entries[0].month, bulk_data.entries[0].year
+    if any(entry.month != month or entry.year != year for entry in bulk_data.entries):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="All entries must belong to the same month"
+        )
+    
+    # Last entry wins when the same day appears twice (ON CONFLICT can't touch a row twice)
+    rows = list({entry.day: entry.model_dump() for entry in bulk_data.entries}.values())
+    
+    await db.execute(study_hours_upsert(rows, user_id=user_id, visitor_id=visitor_id))
+    await refresh_month_rollup(db, year, month, user_id=user_id, visitor_id=visitor_id)
+    await bump_data_version(db, STUDY_HOURS_SCOPE, user_id=user_id, visitor_id=visitor_id)
+    summary = await build_month_summary(db, month, year, user_id=user_id, visitor_id=visitor_id)
+    await db.commit()
+    
+    return summary
+
+# Study Hours endpoints for authenticated users
+
+@study_router.post("/save-day", response_model=StudyHoursResponse)
+async def save_study_hours(
+    study_data: StudyHoursCreate,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save study hours for authenticated user"""
+    
+    # Insert or update the day in one round trip
+    record = await db.scalar(
+        study_hours_upsert([study_data.model_dump()], user_id=user_id)
+        .returning(StudyHours)
+        .execution_options(populate_existing=True)
+    )
+    await refresh_month_rollup(db, study_data.year, study_data.month, user_id=user_id)
+    await bump_data_version(db, STUDY_HOURS_SCOPE, user_id=user_id)
+    await db.commit()
+    
+    return StudyHoursResponse.model_validate(record)
+
+@study_router.post("/save-days", response_model=StudyHoursListResponse)
+async def save_study_hours_bulk(
+    bulk_data: StudyHoursBulkCreate,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save many days of study hours at once for authenticated user"""
+    
+    return await bulk_save_study_hours(db, bulk_data, user_id=user_id)
+
+@study_router.get("/month/{month}/{year}", response_model=StudyHoursListResponse)
+async def get_month_study_hours(
+    request: Request,
+    response: Response,
+    month: int,
+    year: int,
+    summary_only: bool = False,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get study hours for a specific month and year (summary_only=true returns just the totals)"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, user_id=user_id)
+    if not_modified:
+        return not_modified
+    
+    summary = await cached_month_summary(db, month, year, request.state.data_version, user_id=user_id, summary_only=summary_only)
+    return model_response(summary, headers=dict(response.headers))
+
+@study_router.get("/range", response_model=StudyHoursRangeResponse)
+async def get_study_hours_range(
+    request: Request,
+    response: Response,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    bucket: Literal["day", "week", "month"] = "day",
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get study hours between two dates (inclusive), totalled per day, week or month"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, user_id=user_id)
+    if not_modified:
+        return not_modified
+    
+    summary = await build_range_summary(db, from_date, to_date, bucket, user_id=user_id)
+    return model_response(summary, headers=dict(response.headers))
+
+@study_router.get("/analytics", response_model=StudyAnalyticsResponse)
+async def get_analytics(
+    request: Request,
+    response: Response,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get streaks, rolling averages and weekday distribution for authenticated user"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, user_id=user_id)
+    if not_modified:
+        return not_modified
+    
+    return await get_study_analytics(db, request.state.data_version, user_id=user_id)
+
+@study_router.get("/goal", response_model=StudyGoalResponse)
+async def get_goal(
+    request: Request,
+    response: Response,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the daily study goal for authenticated user"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, user_id=user_id)
+    if not_modified:
+        return not_modified
+    
+    return await get_study_goal(db, user_id=user_id)
+
+@study_router.put("/goal", response_model=StudyGoalResponse)
+async def update_goal(
+    goal: StudyGoalUpdate,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Set the daily study goal for authenticated user"""
+    
+    # Bumps the data version too: month pacing depends on the goal
+    return await save_study_goal(db, goal, user_id=user_id)
+
 @study_router.get("/all", response_model=List[StudyHoursResponse])
 async def get_all_study_hours(
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: Optional[Literal["ndjson", "json"]] = None,
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all study hours for authenticated user"""
+    """Get all study hours for authenticated user
+    
+    - limit/cursor: one page ordered by (year, month, day), the next cursor is sent in X-Next-Cursor
+    - stream=ndjson|json: the whole history streamed in chunks with flat memory use (not combined with limit/cursor)
+    - fields=day,hours,...: only these columns are selected and returned
+    """
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
+    if stream and (limit or cursor):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="stream returns the whole history and cannot be combined with limit or cursor"
         )
+    projection = parse_fields(fields, StudyHoursResponse)
+    not_modified = await study_hours_conditional_get(request, response, db, user_id=user_id)
+    if not_modified:
+        return not_modified
     
-    # Get all study hours
-    study_records = db.query(StudyHours).filter(
-        StudyHours.user_id == user.id
-    ).all()
-    
-    # Convert to response format
-    response_data = [
-        StudyHoursResponse(
-            id=record.id,
-            user_id=record.user_id,
-            month=record.month,
-            year=record.year,
-            day=record.day,
-            hours=record.hours,
-            created_at=record.created_at,
-            updated_at=record.updated_at
+    owner_filter = StudyHours.user_id == user_id
+    columns = study_hours_columns(projection)
+    
+    if stream:
+        # Hand the request's connection back now, the stream checks out its own
+        await db.close()
+        return StreamingResponse(
+            stream_study_hours(owner_filter, stream, columns),
+            media_type="application/x-ndjson" if stream == "ndjson" else "application/json",
+            headers=dict(response.headers)
         )
-        for record in study_records
-    ]
     
-    return response_data
+    if limit and projection is not None:
+        # The next cursor is built from the sort columns, select them even when not projected
+        columns += tuple(column for column in STUDY_HOURS_ORDER if column.key not in projection)
+    query = select(*columns).where(owner_filter).order_by(*STUDY_HOURS_ORDER)
+    if cursor:
+        query = query.where(tuple_(*STUDY_HOURS_ORDER) > decode_study_hours_cursor(cursor))
+    if limit:
+        # Fetch one extra row to know whether another page follows
+        query = query.limit(limit + 1)
+    
+    rows = (await db.execute(query)).all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_study_hours_cursor(last.year, last.month, last.day)
+    
+    # Rows already have the StudyHoursResponse fields, skip building models
+    return rows_response(rows, headers=dict(response.headers), fields=projection)
 
 @study_router.delete("/all", response_model=dict)
 async def delete_all_study_hours(
-    current_user_email: str = Depends(get_current_user_email),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete all study hours for authenticated user"""
     
-    # Get current user
-    user = db.query(User).filter(User.email == current_user_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Delete all study hours for this user
-    deleted_count = db.query(StudyHours).filter(
-        StudyHours.user_id == user.id
-    ).delete(synchronize_session=False)
+    deleted_count = (await db.execute(delete(StudyHours).where(
+        StudyHours.user_id == user_id
+    ))).rowcount
+    await delete_owner_rollups(db, user_id=user_id)
+    await bump_data_version(db, STUDY_HOURS_SCOPE, user_id=user_id)
     
-    db.commit()
+    await db.commit()
     
     return {"message": f"Deleted {deleted_count} study hours records", "deleted_count": deleted_count}
 
@@ -232,119 +555,125 @@ async def delete_all_study_hours(
 async def save_visitor_study_hours(
     study_data: StudyHoursCreate,
     visitor_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Save study hours for visitor (non-authenticated user)"""
     
-    # Check if study hours already exist for this day
-    existing_record = db.query(StudyHours).filter(
-        StudyHours.visitor_id == visitor_id,
-        StudyHours.month == study_data.month,
-        StudyHours.year == study_data.year,
-        StudyHours.day == study_data.day
-    ).first()
-    
-    if existing_record:
-        # Update existing record
-        existing_record.hours = study_data.hours
-        existing_record.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_record)
-        
-        return StudyHoursResponse(
-            id=existing_record.id,
-            visitor_id=existing_record.visitor_id,
-            month=existing_record.month,
-            year=existing_record.year,
-            day=existing_record.day,
-            hours=existing_record.hours,
-            created_at=existing_record.created_at,
-            updated_at=existing_record.updated_at
-        )
-    else:
-        # Create new record
-        new_record = StudyHours(
-            visitor_id=visitor_id,
-            month=study_data.month,
-            year=study_data.year,
-            day=study_data.day,
-            hours=study_data.hours
-        )
-        
-        db.add(new_record)
-        db.commit()
-        db.refresh(new_record)
-        
-        return StudyHoursResponse(
-            id=new_record.id,
-            visitor_id=new_record.visitor_id,
-            month=new_record.month,
-            year=new_record.year,
-            day=new_record.day,
-            hours=new_record.hours,
-            created_at=new_record.created_at,
-            updated_at=new_record.updated_at
-        )
+    # Insert or update the day in one round trip
+    record = await db.scalar(
+        study_hours_upsert([study_data.model_dump()], visitor_id=visitor_id)
+        .returning(StudyHours)
+        .execution_options(populate_existing=True)
+    )
+    await refresh_month_rollup(db, study_data.year, study_data.month, visitor_id=visitor_id)
+    await bump_data_version(db, STUDY_HOURS_SCOPE, visitor_id=visitor_id)
+    await db.commit()
+    
+    return StudyHoursResponse.model_validate(record)
+
+@study_router.post("/visitor/save-days", response_model=StudyHoursListResponse)
+async def save_visitor_study_hours_bulk(
+    bulk_data: StudyHoursBulkCreate,
+    visitor_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Save many days of study hours at once for visitor"""
+    
+    return await bulk_save_study_hours(db, bulk_data, visitor_id=visitor_id)
 
 @study_router.get("/visitor/{visitor_id}/{month}/{year}", response_model=StudyHoursListResponse)
 async def get_visitor_month_study_hours(
+    request: Request,
+    response: Response,
     visitor_id: str,
     month: int,
     year: int,
-    db: Session = Depends(get_db)
+    summary_only: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get study hours for a specific month and year for visitor"""
-    
-    # Get study hours for the month
-    study_records = db.query(StudyHours).filter(
-        StudyHours.visitor_id == visitor_id,
-        StudyHours.month == month,
-        StudyHours.year == year
-    ).all()
-    
-    # Calculate statistics
-    total_hours = sum(record.hours for record in study_records)
-    average_hours = total_hours / len(study_records) if study_records else 0
-    
-    # Calculate progress
-    days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month-1] if month > 0 else 31
-    target_hours = days_in_month * 7
-    progress_percentage = (total_hours / target_hours * 100) if target_hours > 0 else 0
-    
-    # Convert to response format
-    response_data = [
-        StudyHoursResponse(
-            id=record.id,
-            visitor_id=record.visitor_id,
-            month=record.month,
-            year=record.year,
-            day=record.day,
-            hours=record.hours,
-            created_at=record.created_at,
-            updated_at=record.updated_at
-        )
-        for record in study_records
-    ]
+    """Get study hours for a specific month and year for visitor (summary_only=true returns just the totals)"""
     
-    return StudyHoursListResponse(
-        data=response_data,
-        total_hours=total_hours,
-        average_hours=average_hours,
-        progress_percentage=progress_percentage
-    )
+    not_modified = await study_hours_conditional_get(request, response, db, visitor_id=visitor_id)
+    if not_modified:
+        return not_modified
+    
+    summary = await cached_month_summary(db, month, year, request.state.data_version, visitor_id=visitor_id, summary_only=summary_only)
+    return model_response(summary, headers=dict(response.headers))
+
+@study_router.get("/visitor/{visitor_id}/range", response_model=StudyHoursRangeResponse)
+async def get_visitor_study_hours_range(
+    request: Request,
+    response: Response,
+    visitor_id: str,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    bucket: Literal["day", "week", "month"] = "day",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get study hours between two dates (inclusive) for visitor, totalled per day, week or month"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, visitor_id=visitor_id)
+    if not_modified:
+        return not_modified
+    
+    summary = await build_range_summary(db, from_date, to_date, bucket, visitor_id=visitor_id)
+    return model_response(summary, headers=dict(response.headers))
+
+@study_router.get("/visitor/{visitor_id}/analytics", response_model=StudyAnalyticsResponse)
+async def get_visitor_analytics(
+    request: Request,
+    response: Response,
+    visitor_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get streaks, rolling averages and weekday distribution for visitor"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, visitor_id=visitor_id)
+    if not_modified:
+        return not_modified
+    
+    return await get_study_analytics(db, request.state.data_version, visitor_id=visitor_id)
+
+@study_router.get("/visitor/{visitor_id}/goal", response_model=StudyGoalResponse)
+async def get_visitor_goal(
+    request: Request,
+    response: Response,
+    visitor_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the daily study goal for visitor"""
+    
+    not_modified = await study_hours_conditional_get(request, response, db, visitor_id=visitor_id)
+    if not_modified:
+        return not_modified
+    
+    return await get_study_goal(db, visitor_id=visitor_id)
+
+@study_router.put("/visitor/{visitor_id}/goal", response_model=StudyGoalResponse)
+async def update_visitor_goal(
+    visitor_id: str,
+    goal: StudyGoalUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Set the daily study goal for visitor"""
+    
+    # Bumps the data version too: month pacing depends on the goal
+    return await save_study_goal(db, goal, visitor_id=visitor_id)
 
 @study_router.delete("/visitor/{visitor_id}/all", response_model=dict)
 async def delete_visitor_all_study_hours(
     visitor_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete all study hours for visitor"""
     
     # Delete all study hours for this visitor
-    deleted_count = db.query(StudyHours).filter(
+    deleted_count = (await db.execute(delete(StudyHours).where(
         StudyHours.visitor_id == visitor_id
-    ).delete(synchronize_session=False)
+    ))).rowcount
+    await delete_owner_rollups(db, visitor_id=visitor_id)
+    await bump_data_version(db, STUDY_HOURS_SCOPE, visitor_id=visitor_id)
     
-    db.commit()
+    await db.commit()
     
     return {"message": f"Deleted {deleted_count} visitor study hours records", "deleted_count": deleted_count}
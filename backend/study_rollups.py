@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Monthly study hours rollup for Win GATE Study Tracker
+study_hours_monthly keeps one row per owner and month (total, days logged,
+best day) so month summaries are a single indexed row read. The study hours
+endpoints refresh the affected month in the same transaction as every save
+or delete; this script rebuilds the whole table from raw rows.
+
+Usage: python study_rollups.py
+"""
+
+import sys
+from typing import Optional
+
+from sqlalchemy import delete, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import engine, StudyHours, StudyHoursMonthly
+
+def rollup_owner_filter(user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    return StudyHoursMonthly.user_id == user_id if user_id is not None else StudyHoursMonthly.visitor_id == visitor_id
+
+async def refresh_month_rollup(db: AsyncSession, year: int, month: int, user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    """Recompute one owner's month from raw rows, inside the caller's transaction"""
+    owner_column = StudyHoursMonthly.user_id if user_id is not None else StudyHoursMonthly.visitor_id
+    
+    # Upsert the rollup row first: it stays locked until commit, so concurrent saves for the
+    # same month recompute one after another and the later one sees the earlier one's rows
+    lock_row = insert(StudyHoursMonthly).values(user_id=user_id, visitor_id=visitor_id, year=year, month=month)
+    await db.execute(lock_row.on_conflict_do_update(
+        index_elements=[owner_column, StudyHoursMonthly.year, StudyHoursMonthly.month],
+        set_={"updated_at": func.now()}
+    ))
+    
+    # One aggregate pass over the month's raw rows (at most 31, read from the owner/day index).
+    # A full recompute rather than a delta: an overwrite can lower the best day, and the
+    # upsert does not tell us the hours it replaced.
+    month_totals = select(
+        func.coalesce(func.sum(StudyHours.hours), 0.0),
+        func.count(),
+        func.coalesce(func.max(StudyHours.hours), 0.0)
+    ).where(
+        StudyHours.user_id == user_id if user_id is not None else StudyHours.visitor_id == visitor_id,
+        StudyHours.year == year,
+        StudyHours.month == month
+    ).scalar_subquery()
+    await db.execute(
+        update(StudyHoursMonthly)
+        .where(rollup_owner_filter(user_id, visitor_id), StudyHoursMonthly.year == year, StudyHoursMonthly.month == month)
+        .values({
+            tuple_(StudyHoursMonthly.total_hours, StudyHoursMonthly.days_logged, StudyHoursMonthly.max_day_hours): month_totals
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+async def delete_owner_rollups(db: AsyncSession, user_id: Optional[int] = None, visitor_id: Optional[str] = None):
+    """Drop every rollup row of an owner, inside the caller's transaction"""
+    await db.execute(delete(StudyHoursMonthly).where(rollup_owner_filter(user_id, visitor_id)))
+
+def rebuild_monthly_rollups() -> int:
+    """Recompute the whole rollup table from study_hours in one transaction, returns the row count"""
+    with engine.begin() as connection:
+        # Block writers while rebuilding so no save lands between the delete and the insert
+        connection.execute(text("LOCK TABLE study_hours_monthly IN EXCLUSIVE MODE"))
+        connection.execute(delete(StudyHoursMonthly))
+        return connection.execute(insert(StudyHoursMonthly).from_select(
+            ["user_id", "visitor_id", "year", "month", "total_hours", "days_logged", "max_day_hours"],
+            select(
+                StudyHours.user_id,
+                StudyHours.visitor_id,
+                StudyHours.year,
+                StudyHours.month,
+                func.sum(StudyHours.hours),
+                func.count(),
+                func.max(StudyHours.hours)
+            ).group_by(StudyHours.user_id, StudyHours.visitor_id, StudyHours.year, StudyHours.month)
+        )).rowcount
+
+if __name__ == "__main__":
+    try:
+        rows = rebuild_monthly_rollups()
+    except Exception as e:
+        print(f"❌ Rollup rebuild failed: {e}")
+        sys.exit(1)
+    
+    print(f"✅ Rebuilt study_hours_monthly: {rows} owner-months")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Async database layer tests: routers run on AsyncSession and hand every
+connection back to the pool once the request is done.
+
+Usage: python -m pytest test_async_db.py
+"""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models import StudyHours, async_engine, get_async_db, get_pool_stats
+
+def test_get_async_db_yields_a_working_session(db_session):
+    async def scenario(_):
+        dependency = get_async_db()
+        db = await dependency.__anext__()
+        try:
+            assert isinstance(db, AsyncSession)
+            return (await db.execute(select(StudyHours.id).limit(1))).all()
+        finally:
+            await dependency.aclose()
+
+    assert isinstance(db_session(scenario), list)
+
+def test_concurrent_requests_share_the_pool(api, visitor_id):
+    day = {"month": 2, "year": 2024, "day": 1, "hours": 2.0}
+
+    async def scenario(client):
+        saved = await client.post(f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}", json=day)
+        assert saved.status_code == 200, saved.text
+        responses = await asyncio.gather(*(
+            client.get(f"/api/study-hours/visitor/{visitor_id}/2/2024") for _ in range(20)
+        ))
+        return [response.status_code for response in responses], get_pool_stats(async_engine)
+
+    statuses, pool = api(scenario)
+    assert statuses == [200] * 20
+    assert pool["checked_out"] == 0
+
+def test_pool_stats_endpoint(api):
+    async def scenario(client):
+        return (await client.get("/health/db-pool")).json()
+
+    stats = api(scenario)
+    assert {"pool_size", "checked_out", "checkouts", "wait_time_avg_ms", "timeouts"} <= stats["async_pool"].keys()
+    assert stats["profile"]["pool_size"] == stats["async_pool"]["pool_size"]
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Authentication tests: resolving the current user (and its cache), user id
+and token version claims, and token revocation
+
+Usage: python -m pytest test_auth.py
+"""
+
+from contextlib import contextmanager
+
+import jwt
+from sqlalchemy import event
+
+from database_models import async_engine
+from utils import ALGORITHM, SECRET_KEY, create_access_token, token_version_cache, user_cache
+
+@contextmanager
+def users_queries():
+    """Collects every statement that reads the users table while the block runs"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+def test_me_is_served_from_the_user_cache(api, register_user):
+    async def scenario(client):
+        headers, user = await register_user(client)
+        first = await client.get("/api/auth/me", headers=headers)
+        with users_queries() as statements:
+            second = await client.get("/api/auth/me", headers=headers)
+        return user, first.json(), second.json(), statements
+
+    user, first, second, statements = api(scenario)
+    assert first == second
+    assert (first["id"], first["email"]) == (user["id"], user["email"])
+    assert user_cache.get(user["email"]).id == user["id"]
+    assert statements == []
+
+def test_token_without_user_id_is_resolved_by_email(api, register_user):
+    # Tokens issued before the uid claim existed only carry the email
+    async def scenario(client):
+        _, user = await register_user(client)
+        legacy = {"Authorization": f"Bearer {create_access_token({'sub': user['email']})}"}
+        saved = await client.post("/api/study-hours/save-day", json={"month": 2, "year": 2024, "day": 1, "hours": 1}, headers=legacy)
+        return user, saved
+
+    user, saved = api(scenario)
+    assert saved.status_code == 200, saved.text
+    assert saved.json()["user_id"] == user["id"]
+
+def test_token_for_an_unknown_user_is_rejected(api):
+    async def scenario(client):
+        token = create_access_token({"sub": "nobody@example.com"})
+        return await client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert api(scenario).status_code == 404
+
+def test_missing_or_forged_token_is_rejected(api):
+    async def scenario(client):
+        return (
+            (await client.get("/api/auth/me")).status_code,
+            (await client.get("/api/auth/me", headers={"Authorization": "Bearer not-a-jwt"})).status_code,
+        )
+
+    missing, forged = api(scenario)
+    assert missing in (401, 403)
+    assert forged == 401
+
+def test_token_carries_user_id_and_version(api, register_user):
+    async def scenario(client):
+        headers, user = await register_user(client)
+        return user, headers["Authorization"].removeprefix("Bearer ")
+
+    user, token = api(scenario)
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert (claims["uid"], claims["ver"]) == (user["id"], 0)
+
+def test_requests_with_a_user_id_claim_skip_the_users_lookup(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        await client.get("/api/study-hours/month/2/2024", headers=headers)   # caches the token version
+        with users_queries() as statements:
+            response = await client.get("/api/study-hours/goal", headers=headers)
+        return response, statements
+
+    response, statements = api(scenario)
+    assert response.status_code == 200
+    assert statements == []
+
+def test_revoked_tokens_are_rejected(api, register_user):
+    async def scenario(client):
+        headers, user = await register_user(client, password="revoke-me")
+        revoked = await client.post("/api/auth/revoke-tokens", headers=headers)
+        assert revoked.status_code == 200, revoked.text
+        old_token = await client.get("/api/study-hours/goal", headers=headers)
+        old_token_me = await client.get("/api/auth/me", headers=headers)
+        login = await client.post("/api/auth/login", json={"email": user["email"], "password": "revoke-me"})
+        new_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        new_token = await client.get("/api/study-hours/goal", headers=new_headers)
+        return old_token, old_token_me, new_token
+
+    old_token, old_token_me, new_token = api(scenario)
+    assert old_token.status_code == old_token_me.status_code == 401
+    assert old_token.json()["detail"] == "Token has been revoked"
+    assert new_token.status_code == 200
+
+def test_revocation_reaches_workers_whose_cache_expired(api, register_user):
+    # Another worker bumped token_version: once this worker's cached copy is gone it rereads it
+    async def scenario(client):
+        headers, user = await register_user(client)
+        assert (await client.post("/api/auth/revoke-tokens", headers=headers)).status_code == 200
+        token_version_cache.set(user["id"], 0)   # this worker's stale copy
+        stale = await client.get("/api/study-hours/goal", headers=headers)
+        token_version_cache.pop(user["id"])      # TTL ran out
+        fresh = await client.get("/api/study-hours/goal", headers=headers)
+        return stale.status_code, fresh.status_code
+
+    assert api(scenario) == (200, 401)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Response compression tests: Accept-Encoding negotiation, the middleware
+driven directly through ASGI messages (no server needed), and compressed
+responses from the app's endpoints.
+
+Usage: python -m pytest test_compression.py
+"""
+
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+import compression
+from compression import CompressionMiddleware, Compressor, choose_encoding
+
+needs_brotli = pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+
+@needs_brotli
+def test_brotli_preferred_over_gzip():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("br;q=1.0, gzip;q=1.0") == "br"
+
+@needs_brotli
+def test_q_values_decide():
+    assert choose_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert choose_encoding("gzip;q=0.2, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+
+def test_gzip_only_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("br") is None
+
+def test_identity_when_nothing_acceptable():
+    assert choose_encoding("") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("deflate") is None
+    assert choose_encoding("gzip;q=0, br;q=0") is None
+    assert choose_encoding("gzip;q=oops") is None
+
+def test_wildcard():
+    assert choose_encoding("*") == ("br" if compression.brotli is not None else "gzip")
+    assert choose_encoding("*, br;q=0") == "gzip"
+    assert choose_encoding("*;q=0") is None
+
+def test_gzip_chunks_decode_as_they_arrive():
+    compressor = Compressor("gzip")
+    decoder = zlib.decompressobj(31)
+
+    assert decoder.decompress(compressor.chunk(b'{"day":1}\n')) == b'{"day":1}\n'
+    assert decoder.decompress(compressor.chunk(b'{"day":2}\n')) == b'{"day":2}\n'
+    decoder.decompress(compressor.finish())
+    assert decoder.eof
+
+@needs_brotli
+def test_brotli_chunks_decode_as_they_arrive():
+    compressor = Compressor("br")
+    decoder = compression.brotli.Decompressor()
+
+    assert decoder.process(compressor.chunk(b'{"day":1}\n')) == b'{"day":1}\n'
+    assert decoder.process(compressor.finish(b'{"day":2}\n')) == b'{"day":2}\n'
+
+def run_app(body_chunks, accept_encoding: str, headers=None, minimum_size: int = 100):
+    """Messages sent by CompressionMiddleware around an app that sends body_chunks"""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers or []})
+        for index, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(body_chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send))
+    start = sent[0]
+    return {name.decode(): value.decode() for name, value in start["headers"]}, [message["body"] for message in sent[1:]]
+
+def test_middleware_gzips_large_body_and_weakens_etag():
+    body = b'{"topic":"Deadlock"},' * 50
+    headers, bodies = run_app([body], "gzip", headers=[(b"content-length", str(len(body)).encode()), (b"etag", b'"v1"')])
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"v1"'
+    assert int(headers["content-length"]) == len(bodies[0]) < len(body)
+    assert gzip.decompress(bodies[0]) == body
+
+def test_middleware_leaves_small_body_alone():
+    headers, bodies = run_app([b"{}"], "gzip", headers=[(b"content-length", b"2"), (b"etag", b'"v1"')])
+
+    assert "content-encoding" not in headers
+    assert headers["etag"] == '"v1"'
+    assert bodies == [b"{}"]
+
+def test_middleware_streams_every_chunk():
+    chunks = [b'{"day":1}\n', b'{"day":2}\n', b""]
+    headers, bodies = run_app(chunks, "gzip", minimum_size=1000)
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    decoder = zlib.decompressobj(31)
+    assert [decoder.decompress(body) for body in bodies[:2]] == chunks[:2]
+
+def study_month(client, visitor_id):
+    entries = [{"year": 2024, "month": 3, "day": day, "hours": 2} for day in range(1, 32)]
+    return client.post(f"/api/study-hours/visitor/save-days?visitor_id={visitor_id}", json={"entries": entries})
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    pytest.param("br, gzip", "br", marks=needs_brotli),
+    ("identity", None),
+])
+def test_endpoint_negotiates_the_encoding(api, visitor_id, accept_encoding, expected):
+    async def scenario(client):
+        assert (await study_month(client, visitor_id)).status_code == 200
+        compressed = await client.get(f"/api/study-hours/visitor/{visitor_id}/3/2024", headers={"Accept-Encoding": accept_encoding})
+        plain = await client.get(f"/api/study-hours/visitor/{visitor_id}/3/2024", headers={"Accept-Encoding": "identity"})
+        return compressed, plain
+
+    compressed, plain = api(scenario)
+    assert compressed.status_code == 200
+    assert compressed.headers.get("content-encoding") == expected
+    if expected:
+        assert compressed.headers["vary"] == "Accept-Encoding"
+    # httpx decodes the body, it is the same JSON either way
+    assert compressed.json() == plain.json()
+    assert compressed.json()["days_logged"] == 31
+
+def test_compressed_etag_still_revalidates(api, visitor_id):
+    async def scenario(client):
+        assert (await study_month(client, visitor_id)).status_code == 200
+        url = f"/api/study-hours/visitor/{visitor_id}/3/2024"
+        first = await client.get(url, headers={"Accept-Encoding": "gzip"})
+        again = await client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+        return first, again
+
+    first, again = api(scenario)
+    assert first.headers["etag"].startswith('W/"')
+    assert again.status_code == 304
+
+def test_small_endpoint_responses_are_not_compressed(api, visitor_id):
+    async def scenario(client):
+        return await client.get(f"/api/study-hours/visitor/{visitor_id}/goal", headers={"Accept-Encoding": "gzip"})
+
+    response = api(scenario)
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+def test_streamed_history_is_compressed(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        entries = [{"year": 2024, "month": 3, "day": day, "hours": 2} for day in range(1, 32)]
+        assert (await client.post("/api/study-hours/save-days", json={"entries": entries}, headers=headers)).status_code == 200
+        return await client.get("/api/study-hours/all?stream=ndjson", headers={**headers, "Accept-Encoding": "gzip"})
+
+    response = api(scenario)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 31
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Curriculum endpoint tests: single and batch saves, the shared topic catalogue,
+counts and fields= projections, run against
+the app in-process (see conftest.py for the database)
+
+Usage: python -m pytest test_curriculum.py
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from curriculum_endpoints import CurriculumStatsResponse, ProjectedCurriculumStatsResponse, build_curriculum_stats
+from curriculum_catalogue import CurriculumCatalogue
+from database_models import CURRICULUM_TESTED, CURRICULUM_WATCHED, CurriculumData, CurriculumSubject, CurriculumTopic
+from response_cache import decode_response, encode_response
+
+TOPICS = [
+    {"subject": "Operating System", "topic": "Deadlock", "watched": True, "tested": True},
+    {"subject": "Computer Networks", "topic": "ICMP", "revised": True},
+]
+
+def save_topics(client, visitor_id, topics=TOPICS):
+    return client.post(f"/api/curriculum/visitor/save-topics?visitor_id={visitor_id}", json={"topics": topics})
+
+def test_projected_stats_survive_the_redis_serialization(api, db_session, visitor_id):
+    async def seed(client):
+        assert (await save_topics(client, visitor_id)).status_code == 200
+
+    async def round_trip(db):
+        stats = await build_curriculum_stats(db, visitor_id=visitor_id, projection=["topic", "tested"])
+        return stats, decode_response(encode_response(stats), ProjectedCurriculumStatsResponse)
+
+    api(seed)
+    stats, decoded = db_session(round_trip)
+    assert isinstance(stats, ProjectedCurriculumStatsResponse)
+    assert decoded == stats
+    topic = decoded.subjects[0].topics[0]
+    assert topic.id is None and topic.created_at is None
+    assert [(topic.topic, topic.tested) for subject in decoded.subjects for topic in subject.topics] == [
+        ("ICMP", False), ("Deadlock", True)
+    ]
+
+def test_full_stats_keep_the_strict_model(api, db_session, visitor_id):
+    async def seed(client):
+        assert (await save_topics(client, visitor_id)).status_code == 200
+
+    async def round_trip(db):
+        stats = await build_curriculum_stats(db, visitor_id=visitor_id)
+        return stats, decode_response(encode_response(stats), CurriculumStatsResponse)
+
+    api(seed)
+    stats, decoded = db_session(round_trip)
+    assert type(stats) is CurriculumStatsResponse
+    assert decoded == stats
+    assert all(topic.id is not None for subject in decoded.subjects for topic in subject.topics)
+
+def test_fields_returns_only_the_requested_topic_fields(api, visitor_id):
+    async def scenario(client):
+        assert (await save_topics(client, visitor_id)).status_code == 200
+        return await client.get(f"/api/curriculum/visitor/{visitor_id}?fields=topic,tested")
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    topics = [topic for subject in response.json()["subjects"] for topic in subject["topics"]]
+    assert topics and all(set(topic) == {"topic", "tested"} for topic in topics)
+
+def test_counts_per_subject_and_overall(api, visitor_id):
+    topics = [
+        {"subject": "Digital Logic", "topic": "Boolean algebra", "watched": True, "revised": True, "tested": True},
+        {"subject": "Digital Logic", "topic": "Minimization", "watched": True},
+        {"subject": "Digital Logic", "topic": "Fast adders"},
+        *TOPICS,
+    ]
+
+    async def scenario(client):
+        assert (await save_topics(client, visitor_id, topics)).status_code == 200
+        return (await client.get(f"/api/curriculum/visitor/{visitor_id}")).json()
+
+    stats = api(scenario)
+    counts = {
+        subject["subject"]: (subject["total_topics"], subject["watched_count"], subject["revised_count"], subject["tested_count"])
+        for subject in stats["subjects"]
+    }
+    assert counts == {"Computer Networks": (1, 0, 1, 0), "Digital Logic": (3, 2, 1, 1), "Operating System": (1, 1, 0, 1)}
+    assert [subject["subject"] for subject in stats["subjects"]] == sorted(counts)
+    assert (stats["total_topics"], stats["watched_topics"], stats["revised_topics"], stats["tested_topics"]) == (5, 3, 2, 2)
+    assert stats["overall_progress"] == 40.0
+    assert sum(len(subject["topics"]) for subject in stats["subjects"]) == 5
+
+def test_stats_only_keeps_the_counts_without_topics(api, visitor_id):
+    async def scenario(client):
+        assert (await save_topics(client, visitor_id)).status_code == 200
+        full = await client.get(f"/api/curriculum/visitor/{visitor_id}")
+        stats_only = await client.get(f"/api/curriculum/visitor/{visitor_id}?stats_only=true")
+        return full.json(), stats_only.json()
+
+    full, stats_only = api(scenario)
+    assert all(subject["topics"] == [] for subject in stats_only["subjects"])
+    for subject in full["subjects"]:
+        subject["topics"] = []
+    assert stats_only == full
+
+def test_empty_curriculum_has_zero_progress(api, visitor_id):
+    async def scenario(client):
+        return (await client.get(f"/api/curriculum/visitor/{visitor_id}?stats_only=true")).json()
+
+    assert api(scenario) == {
+        "total_topics": 0, "watched_topics": 0, "revised_topics": 0, "tested_topics": 0, "overall_progress": 0, "subjects": []
+    }
+
+def test_batch_save_returns_the_updated_counts(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        first = await client.post("/api/curriculum/save-topics", json={"topics": TOPICS}, headers=headers)
+        second = await client.post(
+            "/api/curriculum/save-topics",
+            json={"topics": [{"subject": "Computer Networks", "topic": "ICMP", "tested": True}]},
+            headers=headers
+        )
+        return first.json(), second.json()
+
+    first, second = api(scenario)
+    assert (first["total_topics"], first["tested_topics"]) == (2, 1)
+    # Counts only: the topic lists stay empty
+    assert all(subject["topics"] == [] for subject in first["subjects"])
+    assert (second["total_topics"], second["tested_topics"], second["revised_topics"]) == (2, 2, 0)
+
+def test_repeated_topic_keeps_the_last_change(api, db_session, visitor_id):
+    topic = {"subject": "Operating System", "topic": "Deadlock"}
+
+    async def scenario(client):
+        response = await save_topics(client, visitor_id, [{**topic, "watched": True}, {**topic, "tested": True}])
+        assert response.status_code == 200, response.text
+
+    async def rows(db):
+        return (await db.scalars(select(CurriculumData.flags).where(CurriculumData.visitor_id == visitor_id))).all()
+
+    api(scenario)
+    assert db_session(rows) == [CURRICULUM_TESTED]
+
+def test_empty_batch_is_rejected(api, visitor_id):
+    async def scenario(client):
+        return await save_topics(client, visitor_id, [])
+
+    response = api(scenario)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No curriculum topics provided"
+
+def test_unique_index_rejects_a_duplicate_topic(api, db_session, visitor_id):
+    async def seed(client):
+        assert (await save_topics(client, visitor_id)).status_code == 200
+
+    async def scenario(db):
+        topic_id = await db.scalar(select(CurriculumData.topic_id).where(CurriculumData.visitor_id == visitor_id))
+        db.add(CurriculumData(visitor_id=visitor_id, topic_id=topic_id, flags=0))
+        with pytest.raises(IntegrityError):
+            await db.commit()
+        await db.rollback()
+
+    api(seed)
+    db_session(scenario)
+
+def test_topics_outside_the_syllabus_are_rejected(api, db_session, visitor_id):
+    async def scenario(client):
+        return await save_topics(client, visitor_id, [*TOPICS, {"subject": "Operating System", "topic": "Bogosort"}])
+
+    async def rows(db):
+        return (await db.scalars(select(CurriculumData.id).where(CurriculumData.visitor_id == visitor_id))).all()
+
+    response = api(scenario)
+    assert response.status_code == 400
+    assert "Operating System / Bogosort" in response.json()["detail"]
+    # The valid topics of the rejected batch were not written either
+    assert db_session(rows) == []
+
+def test_owners_share_catalogue_topic_ids(api, db_session, visitor_id):
+    other = f"{visitor_id}-other"
+    topic = {"subject": "Operating System", "topic": "Deadlock", "watched": True, "tested": True}
+
+    async def scenario(client):
+        first = await client.post(f"/api/curriculum/visitor/save?visitor_id={visitor_id}", json=topic)
+        second = await client.post(f"/api/curriculum/visitor/save?visitor_id={other}", json={**topic, "tested": False})
+        return first.json(), second.json()
+
+    async def stored(db):
+        catalogue = (await db.execute(
+            select(CurriculumTopic.id)
+            .join(CurriculumSubject, CurriculumSubject.id == CurriculumTopic.subject_id)
+            .where(CurriculumSubject.name == topic["subject"], CurriculumTopic.name == topic["topic"])
+        )).scalar_one()
+        rows = (await db.execute(
+            select(CurriculumData.visitor_id, CurriculumData.topic_id, CurriculumData.flags)
+            .where(CurriculumData.visitor_id.in_([visitor_id, other]))
+            .order_by(CurriculumData.visitor_id)
+        )).all()
+        return catalogue, [tuple(row) for row in rows]
+
+    first, second = api(scenario)
+    catalogue_id, rows = db_session(stored)
+    assert first["topic_id"] == second["topic_id"] == catalogue_id
+    assert (first["subject"], first["topic"], first["watched"], first["tested"]) == ("Operating System", "Deadlock", True, True)
+    assert rows == [(visitor_id, catalogue_id, CURRICULUM_WATCHED | CURRICULUM_TESTED), (other, catalogue_id, CURRICULUM_WATCHED)]
+
+def test_catalogue_maps_ids_back_to_names(db_session):
+    pair = ("Computer Networks", "ICMP")
+
+    async def scenario(db):
+        catalogue = CurriculumCatalogue()
+        topic_id = (await catalogue.resolve_topic_ids([pair]))[pair]
+        names = await catalogue.topic_names(db, [topic_id])
+        subject_id = await catalogue.subject_id(db, pair[0])
+        return topic_id, names, await catalogue.subject_names(db, [subject_id])
+
+    topic_id, names, subject_names = db_session(scenario)
+    assert names == {topic_id: pair}
+    assert list(subject_names.values()) == [pair[0]]
+    with pytest.raises(ValueError):
+        asyncio.run(CurriculumCatalogue().resolve_topic_ids([("Operating System", "Bogosort")]))
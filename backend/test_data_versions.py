@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+ETag tests: the helpers, and conditional GETs against the endpoints as
+writes bump each owner's data version
+
+Usage: python -m pytest test_data_versions.py
+"""
+
+from data_versions import CURRICULUM_SCOPE, STUDY_HOURS_SCOPE, etag_matches, get_data_version, make_etag
+
+def test_etag_is_quoted_and_stable():
+    etag = make_etag(STUDY_HOURS_SCOPE, 3, 1, None, "month", 2024, 2)
+
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 34
+    assert etag == make_etag(STUDY_HOURS_SCOPE, 3, 1, None, "month", 2024, 2)
+    assert "user" not in etag
+
+def test_etag_changes_with_version_owner_scope_and_extra():
+    etag = make_etag(STUDY_HOURS_SCOPE, 3, 1, None)
+
+    assert etag != make_etag(STUDY_HOURS_SCOPE, 4, 1, None)
+    assert etag != make_etag(STUDY_HOURS_SCOPE, 3, 2, None)
+    assert etag != make_etag(STUDY_HOURS_SCOPE, 3, None, "1")
+    assert etag != make_etag(CURRICULUM_SCOPE, 3, 1, None)
+    assert etag != make_etag(STUDY_HOURS_SCOPE, 3, 1, None, "fields=hours")
+
+def test_exact_match():
+    etag = make_etag(CURRICULUM_SCOPE, 1, None, "visitor-a")
+
+    assert etag_matches(etag, etag)
+    assert not etag_matches(make_etag(CURRICULUM_SCOPE, 2, None, "visitor-a"), etag)
+
+def test_weak_etag_matches():
+    etag = make_etag(CURRICULUM_SCOPE, 1, None, "visitor-a")
+
+    assert etag_matches("W/" + etag, etag)
+
+def test_match_in_a_list_and_wildcard():
+    etag = make_etag(STUDY_HOURS_SCOPE, 5, 7, None)
+
+    assert etag_matches(f'"stale", W/"older" , {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"stale", W/"older"', etag)
+
+def test_missing_header_never_matches():
+    etag = make_etag(STUDY_HOURS_SCOPE, 5, 7, None)
+
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches(etag.strip('"'), etag)   # unquoted is not the same entity tag
+
+def save_day(client, visitor_id, day=1):
+    return client.post(
+        f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+        json={"year": 2024, "month": 2, "day": day, "hours": 2}
+    )
+
+def test_matching_etag_gets_304_until_a_write(api, visitor_id):
+    url = f"/api/study-hours/visitor/{visitor_id}/2/2024"
+
+    async def scenario(client):
+        assert (await save_day(client, visitor_id)).status_code == 200
+        first = await client.get(url)
+        unchanged = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        assert (await save_day(client, visitor_id, day=2)).status_code == 200
+        changed = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        return first, unchanged, changed
+
+    first, unchanged, changed = api(scenario)
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == first.headers["etag"]
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert changed.json()["days_logged"] == 2
+
+def test_writes_bump_only_their_own_scope(api, db_session, visitor_id):
+    async def scenario(client):
+        assert (await save_day(client, visitor_id)).status_code == 200
+        assert (await save_day(client, visitor_id, day=2)).status_code == 200
+        topic = {"subject": "Operating System", "topic": "Deadlock", "watched": True}
+        assert (await client.post(f"/api/curriculum/visitor/save?visitor_id={visitor_id}", json=topic)).status_code == 200
+
+    async def versions(db):
+        return (
+            await get_data_version(db, STUDY_HOURS_SCOPE, visitor_id=visitor_id),
+            await get_data_version(db, CURRICULUM_SCOPE, visitor_id=visitor_id),
+            await get_data_version(db, CURRICULUM_SCOPE, visitor_id=f"{visitor_id}-other"),
+        )
+
+    api(scenario)
+    assert db_session(versions) == (2, 1, 0)
+
+def test_etags_are_per_owner(api, visitor_id):
+    other = f"{visitor_id}-other"
+
+    async def scenario(client):
+        mine = await client.get(f"/api/curriculum/visitor/{visitor_id}")
+        theirs = await client.get(f"/api/curriculum/visitor/{other}", headers={"If-None-Match": mine.headers["etag"]})
+        return mine, theirs
+
+    mine, theirs = api(scenario)
+    # Both owners are at version 0, the tag still tells them apart
+    assert theirs.status_code == 200
+    assert theirs.headers["etag"] != mine.headers["etag"]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Connection pool wait statistics and engine profile selection
+
+Usage: python -m pytest test_db_pool.py
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from database_models import ENGINE_PROFILES, TimedQueuePool, load_engine_profile
+
+def slow_creator(delay: float):
+    def connect():
+        time.sleep(delay)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+    return connect
+
+def test_opening_a_connection_is_not_counted_as_waiting():
+    pool = TimedQueuePool(slow_creator(0.3), pool_size=1, max_overflow=0, timeout=5)
+
+    pool.connect().close()
+    assert pool.checkout_count == 1
+    assert pool.wait_time_max < 0.1
+    pool.dispose()
+
+def test_waiting_for_a_busy_connection_is_counted():
+    pool = TimedQueuePool(slow_creator(0), pool_size=1, max_overflow=0, timeout=5)
+    held = pool.connect()
+    threading.Timer(0.3, held.close).start()
+
+    pool.connect().close()
+    assert pool.checkout_count == 2
+    assert pool.wait_time_max >= 0.25
+    pool.dispose()
+
+def test_timeouts_are_counted():
+    pool = TimedQueuePool(slow_creator(0), pool_size=1, max_overflow=0, timeout=0.1)
+    held = pool.connect()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    assert pool.timeout_count == 1
+    held.close()
+    pool.dispose()
+
+def test_profile_from_environment(monkeypatch):
+    monkeypatch.delenv("DB_ENGINE_PROFILE", raising=False)
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.setenv("ENVIRONMENT", "production")
+
+    assert load_engine_profile().pool_size == ENGINE_PROFILES["production"].pool_size
+
+def test_unknown_environment_falls_back_to_development(monkeypatch, capsys):
+    monkeypatch.delenv("DB_ENGINE_PROFILE", raising=False)
+    monkeypatch.setenv("ENVIRONMENT", "staging")
+    monkeypatch.setenv("DB_ECHO", "false")
+
+    profile = load_engine_profile()
+    assert profile == ENGINE_PROFILES["development"].model_copy(update={"echo": False})
+    assert "ENVIRONMENT=staging" in capsys.readouterr().out
+
+def test_unknown_explicit_profile_lists_the_valid_ones(monkeypatch):
+    monkeypatch.setenv("DB_ENGINE_PROFILE", "staging")
+
+    with pytest.raises(ValueError, match="development, production"):
+        load_engine_profile()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Email delivery queue tests against a local debugging SMTP server (aiosmtpd)
+No real mail account needed: the server runs on 127.0.0.1 in a thread and
+keeps what it receives in memory.
+
+Usage: python -m pytest test_email_queue.py
+"""
+
+import json
+import os
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from email_queue import EmailDeliveryQueue, SMTPConnectionPool
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode("utf-8", "replace")))
+        return "250 OK"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+def make_queue(spool_dir, port: int, **kwargs) -> EmailDeliveryQueue:
+    pool = SMTPConnectionPool("127.0.0.1", port, None, None, use_tls=False, timeout=2)
+    return EmailDeliveryQueue(pool, sender="noreply@wingate.test", spool_dir=str(spool_dir), **kwargs)
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+def test_delivers_over_reused_connection(tmp_path, smtp_server):
+    controller, handler = smtp_server
+    email_queue = make_queue(tmp_path, controller.port, workers=1)
+    email_queue.start()
+    try:
+        for index in range(3):
+            email_queue.enqueue(f"user{index}@wingate.test", "Hello", f"<p>message {index}</p>")
+        assert wait_for(lambda: email_queue.stats()["sent"] == 3)
+    finally:
+        email_queue.stop()
+
+    assert sorted(rcpt[0] for rcpt, _ in handler.messages) == ["user0@wingate.test", "user1@wingate.test", "user2@wingate.test"]
+    assert email_queue.stats()["smtp_connections_opened"] == 1
+    assert os.listdir(tmp_path) == []
+
+def test_expired_message_is_dropped_unsent(tmp_path, smtp_server):
+    controller, handler = smtp_server
+    email_queue = make_queue(tmp_path, controller.port, workers=1)
+    email_queue.enqueue("late@wingate.test", "OTP", "<p>123456</p>", expires_at=time.time() - 1)
+    email_queue.start()
+    try:
+        assert wait_for(lambda: email_queue.stats()["expired"] == 1)
+    finally:
+        email_queue.stop()
+
+    assert handler.messages == []
+    assert os.listdir(tmp_path) == []
+
+def test_failed_expiring_message_is_redacted(tmp_path):
+    email_queue = make_queue(tmp_path, free_port(), workers=1, max_attempts=1)   # nothing listens there
+    message_id = email_queue.enqueue("otp@wingate.test", "OTP", "<p>123456</p>", expires_at=time.time() + 300)
+    email_queue.start()
+    try:
+        assert wait_for(lambda: email_queue.stats()["failed"] == 1)
+    finally:
+        email_queue.stop()
+
+    assert os.listdir(tmp_path) == [message_id + ".failed"]
+    with open(tmp_path / (message_id + ".failed")) as failed_file:
+        failed = json.load(failed_file)
+    assert failed["html_body"] is None
+    assert failed["to"] == "otp@wingate.test"
+
+def test_shared_spool_delivers_each_message_once(tmp_path, smtp_server):
+    controller, handler = smtp_server
+    writer = make_queue(tmp_path, controller.port)
+    for index in range(20):
+        writer.enqueue(f"user{index}@wingate.test", "Hello", "<p>hi</p>")
+
+    # Two uvicorn workers starting at once both rescan the same spool
+    queues = [make_queue(tmp_path, controller.port, workers=2) for _ in range(2)]
+    for email_queue in queues:
+        email_queue.start()
+    try:
+        assert wait_for(lambda: sum(q.stats()["sent"] for q in queues) == 20 and not os.listdir(tmp_path))
+    finally:
+        for email_queue in queues:
+            email_queue.stop()
+
+    assert len(handler.messages) == 20
+
+def test_stale_claim_is_retried_on_start(tmp_path, smtp_server):
+    controller, handler = smtp_server
+    writer = make_queue(tmp_path, controller.port)
+    message_id = writer.enqueue("crashed@wingate.test", "Hello", "<p>hi</p>")
+    claimed_path = tmp_path / (message_id + ".sending")
+    os.rename(tmp_path / (message_id + ".json"), claimed_path)
+    os.utime(claimed_path, (time.time() - 3600, time.time() - 3600))
+
+    email_queue = make_queue(tmp_path, controller.port, workers=1)
+    email_queue.start()
+    try:
+        assert wait_for(lambda: email_queue.stats()["sent"] == 1)
+    finally:
+        email_queue.stop()
+    assert handler.messages[0][0] == ["crashed@wingate.test"]
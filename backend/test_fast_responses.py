@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Fast JSON response helper tests
+Rows come from an in-memory SQLite engine, so they are real SQLAlchemy rows.
+The endpoint tests check the fast paths still return their response_model's JSON.
+
+Usage: python -m pytest test_fast_responses.py
+"""
+
+import json
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import create_engine, literal, select, union_all
+
+from fast_responses import dumps_rows, dumps_rows_ndjson, model_response, parse_fields, rows_response
+from study_hours_endpoints import StudyHoursListResponse, StudyHoursResponse
+
+class TopicModel(BaseModel):
+    topic: str
+    completed: bool
+    notes: Optional[str] = None
+
+class SubjectModel(BaseModel):
+    subject: str
+    updated_at: datetime
+    topics: List[TopicModel]
+
+@pytest.fixture(scope="module")
+def rows():
+    engine = create_engine("sqlite://")
+    query = union_all(
+        select(literal(1).label("day"), literal(2.5).label("hours"), literal("a").label("visitor_id")),
+        select(literal(2).label("day"), literal(0.0).label("hours"), literal("a").label("visitor_id"))
+    )
+    with engine.connect() as connection:
+        result = connection.execute(query).all()
+    engine.dispose()
+    return result
+
+def test_dumps_rows(rows):
+    assert json.loads(dumps_rows(rows)) == [
+        {"day": 1, "hours": 2.5, "visitor_id": "a"},
+        {"day": 2, "hours": 0.0, "visitor_id": "a"}
+    ]
+    assert dumps_rows([]) == b"[]"
+
+def test_dumps_rows_ndjson(rows):
+    lines = dumps_rows_ndjson(rows).split(b"\n")
+
+    assert lines[-1] == b""
+    assert [json.loads(line)["day"] for line in lines[:-1]] == [1, 2]
+
+def test_rows_response_with_and_without_fields(rows):
+    response = rows_response(rows, headers={"ETag": '"v1"'})
+
+    assert response.media_type == "application/json"
+    assert response.headers["etag"] == '"v1"'
+    assert json.loads(response.body)[0] == {"day": 1, "hours": 2.5, "visitor_id": "a"}
+    assert json.loads(rows_response(rows, fields=["day", "hours"]).body) == [{"day": 1, "hours": 2.5}, {"day": 2, "hours": 0.0}]
+
+def test_model_response_matches_pydantic_json():
+    model = SubjectModel(
+        subject="Databases",
+        updated_at=datetime(2024, 3, 10, 8, 30),
+        topics=[TopicModel(topic="SQL", completed=True), TopicModel(topic="Indexing", completed=False, notes="B+ trees")]
+    )
+    response = model_response(model)
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == json.loads(model.model_dump_json())
+    assert json.loads(response.body)["updated_at"] == "2024-03-10T08:30:00"
+
+def test_model_response_exclude():
+    model = SubjectModel(subject="Databases", updated_at=datetime(2024, 3, 10), topics=[TopicModel(topic="SQL", completed=True)])
+    body = json.loads(model_response(model, exclude={"topics": {"__all__": {"notes"}}}).body)
+
+    assert body["topics"] == [{"topic": "SQL", "completed": True}]
+
+def test_parse_fields_in_model_order():
+    assert parse_fields(None, TopicModel) is None
+    assert parse_fields("notes, topic", TopicModel) == ["topic", "notes"]
+    assert parse_fields("completed,completed,", TopicModel) == ["completed"]
+
+@pytest.mark.parametrize("fields, detail", [
+    ("topic,secret", "Unknown fields: secret. Available: topic, completed, notes"),
+    (" , ", "Unknown fields: (none given). Available: topic, completed, notes")
+])
+def test_parse_fields_rejects_unknown(fields, detail):
+    with pytest.raises(HTTPException) as error:
+        parse_fields(fields, TopicModel)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == detail
+
+def test_study_hours_pages_match_the_response_model(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        for day in (1, 2):
+            saved = await client.post("/api/study-hours/save-day", json={"year": 2024, "month": 2, "day": day, "hours": day * 1.5}, headers=headers)
+            assert saved.status_code == 200, saved.text
+        return (
+            await client.get("/api/study-hours/all", headers=headers),
+            await client.get("/api/study-hours/all?fields=day,hours", headers=headers),
+            await client.get("/api/study-hours/month/2/2024", headers=headers),
+        )
+
+    page, projected, month = api(scenario)
+    assert page.status_code == projected.status_code == month.status_code == 200
+    # Same JSON pydantic would have produced from the same data
+    for row in page.json():
+        assert row == json.loads(StudyHoursResponse.model_validate(row).model_dump_json())
+    assert set(page.json()[0]) == set(StudyHoursResponse.model_fields)
+    assert projected.json() == [{"day": 1, "hours": 1.5}, {"day": 2, "hours": 3.0}]
+    assert month.json() == json.loads(StudyHoursListResponse.model_validate(month.json()).model_dump_json())
+    assert set(month.json()) == set(StudyHoursListResponse.model_fields)
+
+def test_unknown_fields_are_rejected_by_the_endpoints(api, register_user, visitor_id):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        return (
+            await client.get("/api/study-hours/all?fields=day,password", headers=headers),
+            await client.get(f"/api/curriculum/visitor/{visitor_id}?fields=", headers=headers),
+        )
+
+    study_hours, curriculum = api(scenario)
+    assert study_hours.status_code == curriculum.status_code == 400
+    assert study_hours.json()["detail"].startswith("Unknown fields: password.")
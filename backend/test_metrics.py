@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics tests: route template labels, per-request SQL statement
+counts and the /metrics scrape, through the app in-process
+
+Usage: python -m pytest test_metrics.py
+"""
+
+from prometheus_client import REGISTRY
+
+MONTH_ROUTE = "/api/study-hours/visitor/{visitor_id}/{month}/{year}"
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_requests_are_labelled_by_route_template(api, visitor_id):
+    before = sample("win_gate_http_requests_total", method="GET", route=MONTH_ROUTE, status="200")
+    queries_before = sample("win_gate_db_queries_per_request_sum", method="GET", route=MONTH_ROUTE)
+
+    async def scenario(client):
+        for month in (1, 2):
+            response = await client.get(f"/api/study-hours/visitor/{visitor_id}/{month}/2024")
+            assert response.status_code == 200, response.text
+
+    api(scenario)
+    # Two months, one label value: ids and path parameters never become labels
+    assert sample("win_gate_http_requests_total", method="GET", route=MONTH_ROUTE, status="200") == before + 2
+    assert sample("win_gate_db_queries_per_request_sum", method="GET", route=MONTH_ROUTE) > queries_before
+    assert sample("win_gate_http_requests_in_flight", method="GET") == 0
+
+def test_status_codes_and_unmatched_paths(api, visitor_id):
+    rejected_before = sample("win_gate_http_requests_total", method="GET", route=MONTH_ROUTE, status="400")
+    unmatched_before = sample("win_gate_http_requests_total", method="GET", route="unmatched", status="404")
+
+    async def scenario(client):
+        return (
+            (await client.get(f"/api/study-hours/visitor/{visitor_id}/13/2024")).status_code,
+            (await client.get(f"/api/no-such-route/{visitor_id}")).status_code,
+        )
+
+    assert api(scenario) == (400, 404)
+    assert sample("win_gate_http_requests_total", method="GET", route=MONTH_ROUTE, status="400") == rejected_before + 1
+    assert sample("win_gate_http_requests_total", method="GET", route="unmatched", status="404") == unmatched_before + 1
+
+def test_scrape_includes_request_and_pool_metrics(api):
+    async def scenario(client):
+        await client.get("/health")
+        return await client.get("/metrics")
+
+    response = api(scenario)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'win_gate_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/health"}' in response.text
+    assert 'win_gate_db_pool_connections{engine="async",state="checked_out"}' in response.text
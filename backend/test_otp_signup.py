@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+OTP signup tests against the database pending signup store (the one every
+worker shares): signup, verification, attempt limits and expiry
+
+Usage: python -m pytest test_otp_signup.py
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import otp_endpoints
+from database_models import PendingSignup
+from otp_utils import OTP_MAX_ATTEMPTS, pending_signups
+from pending_signup_store import DatabasePendingSignupStore, PendingSignupData
+
+OTP = "123456"
+
+@pytest.fixture
+def email(monkeypatch) -> str:
+    monkeypatch.setattr(otp_endpoints, "generate_otp", lambda: OTP)
+    return f"signup-{uuid.uuid4().hex[:12]}@example.com"
+
+def test_signup_verify_and_complete(api, email):
+    async def scenario(client):
+        steps = [
+            await client.post("/api/auth/signup", json={"email": email}),
+            await client.post("/api/auth/complete-signup", json={"email": email, "password": "too-early"}),
+            await client.post("/api/auth/verify-otp", json={"email": email, "otp": OTP}),
+            await client.post("/api/auth/complete-signup", json={"email": email, "password": "signup-password"}),
+        ]
+        headers = {"Authorization": f"Bearer {steps[-1].json()['access_token']}"}
+        me = await client.get("/api/auth/me", headers=headers)
+        return [step.status_code for step in steps], me.json()
+
+    statuses, me = api(scenario)
+    assert statuses == [200, 400, 200, 200]
+    assert me["email"] == email
+
+def test_pending_signup_is_stored_in_the_database(api, db_session, email):
+    assert isinstance(pending_signups, DatabasePendingSignupStore)
+
+    async def signup(client):
+        assert (await client.post("/api/auth/signup", json={"email": email})).status_code == 200
+
+    async def stored(db):
+        return await pending_signups.get(db, email)
+
+    api(signup)
+    data = db_session(stored)
+    assert data.signup_pending and not data.verified
+    assert data.otp_hash != OTP
+
+def test_wrong_guesses_are_limited(api, email):
+    async def scenario(client):
+        await client.post("/api/auth/signup", json={"email": email})
+        statuses = [
+            (await client.post("/api/auth/verify-otp", json={"email": email, "otp": "000000"})).status_code
+            for _ in range(OTP_MAX_ATTEMPTS)
+        ]
+        # The OTP is gone after the last allowed guess, even the right one no longer works
+        right = await client.post("/api/auth/verify-otp", json={"email": email, "otp": OTP})
+        return statuses, right.status_code
+
+    statuses, right = api(scenario)
+    assert statuses == [400] * (OTP_MAX_ATTEMPTS - 1) + [429]
+    assert right == 404
+
+def test_expired_entries_are_invisible_and_purged(db_session):
+    store = DatabasePendingSignupStore()
+    expired_email = f"expired-{uuid.uuid4().hex[:12]}@example.com"
+    live_email = f"live-{uuid.uuid4().hex[:12]}@example.com"
+
+    def pending(email):
+        return PendingSignupData(email=email, otp_hash="hash", otp_expiry=datetime.utcnow() + timedelta(minutes=5))
+
+    async def scenario(db):
+        await store.put(db, pending(expired_email), expires_at=datetime.utcnow() - timedelta(seconds=1))
+        hidden = await store.get(db, expired_email)
+        attempt = await store.add_attempt(db, expired_email)
+        await store.put(db, pending(live_email))   # purges a batch of expired rows
+        leftover = await db.scalar(select(PendingSignup.email).where(PendingSignup.email == expired_email))
+        return hidden, attempt, leftover, await store.get(db, live_email)
+
+    hidden, attempt, leftover, live = db_session(scenario)
+    assert hidden is None and attempt is None and leftover is None
+    assert live.email == live_email
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Password hashing pool tests: admission limits, and jobs stay counted until
+their thread finishes even when the awaiting request is cancelled
+
+Usage: python -m pytest test_password_pool.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from utils import PasswordHashingPool
+
+async def wait_for(condition, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_admission_rejects_beyond_workers_plus_queue():
+    pool = PasswordHashingPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        jobs = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await wait_for(lambda: pool.running == 1)
+        with pytest.raises(HTTPException) as rejected:
+            await asyncio.wait_for(pool.run(lambda: None), 1)
+        busy = pool.stats()
+        release.set()
+        await asyncio.gather(*jobs)
+        return rejected.value, busy
+
+    try:
+        rejected, busy = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert rejected.status_code == 503
+    assert rejected.headers == {"Retry-After": "1"}
+    assert (busy["running"], busy["queued"], busy["rejected"]) == (1, 1, 1)
+    assert (pool.in_flight, pool.completed) == (0, 2)
+
+def test_cancelled_request_keeps_its_running_job_counted():
+    pool = PasswordHashingPool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        job = asyncio.create_task(pool.run(release.wait))
+        await wait_for(lambda: pool.running == 1)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        # The thread is still hashing: it must still hold its slot
+        counted = pool.in_flight
+        with pytest.raises(HTTPException):
+            await asyncio.wait_for(pool.run(lambda: None), 1)
+        release.set()
+        await wait_for(lambda: pool.in_flight == 0)
+        return counted
+
+    try:
+        counted = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert counted == 1
+    assert (pool.completed, pool.rejected) == (1, 1)
+
+def test_cancelled_queued_job_frees_its_slot():
+    pool = PasswordHashingPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(pool.run(release.wait))
+        await wait_for(lambda: pool.running == 1)
+        queued = asyncio.create_task(pool.run(release.wait))
+        await wait_for(lambda: pool.in_flight == 2)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        # Never started, so cancelling the executor future released it right away
+        freed = pool.in_flight
+        release.set()
+        await running
+        return freed
+
+    try:
+        freed = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert freed == 1
+    assert pool.in_flight == 0
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+In-memory pending signup store tests (no database needed, the session
+argument is unused by this backend)
+
+Usage: python -m pytest test_pending_signup_store.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from pending_signup_store import PENDING_SIGNUP_GRACE, InMemoryPendingSignupStore, PendingSignupData, PendingSignupStore
+
+def pending(email: str, otp_minutes: float = 10) -> PendingSignupData:
+    return PendingSignupData(email=email, otp_hash="hash", otp_expiry=datetime.utcnow() + timedelta(minutes=otp_minutes))
+
+def test_put_get_delete():
+    store = InMemoryPendingSignupStore()
+
+    async def scenario():
+        await store.put(None, pending("a@wingate.test"))
+        stored = await store.get(None, "a@wingate.test")
+        stored.verified = True   # a copy, the store is unchanged
+        unchanged = await store.get(None, "a@wingate.test")
+        await store.delete(None, "a@wingate.test")
+        return unchanged, await store.get(None, "a@wingate.test")
+
+    unchanged, deleted = asyncio.run(scenario())
+    assert unchanged.verified is False
+    assert deleted is None
+    assert len(store) == 0
+
+def test_default_expiry_adds_the_grace_period():
+    data = pending("a@wingate.test")
+
+    assert InMemoryPendingSignupStore.default_expiry(data) == data.otp_expiry + PENDING_SIGNUP_GRACE
+
+def test_expired_entries_are_purged_in_expiry_order():
+    store = InMemoryPendingSignupStore()
+    now = datetime.utcnow()
+
+    async def fill():
+        for minutes, email in [(30, "late@wingate.test"), (10, "early@wingate.test"), (20, "middle@wingate.test")]:
+            await store.put(None, pending(email), expires_at=now + timedelta(minutes=minutes))
+
+    asyncio.run(fill())
+    store._purge_expired(now + timedelta(minutes=15))
+    assert sorted(store._entries) == ["late@wingate.test", "middle@wingate.test"]
+    store._purge_expired(now + timedelta(minutes=25))
+    assert list(store._entries) == ["late@wingate.test"]
+
+def test_replaced_entry_outlives_its_old_expiry():
+    store = InMemoryPendingSignupStore()
+    now = datetime.utcnow()
+
+    async def resend():
+        await store.put(None, pending("a@wingate.test"), expires_at=now + timedelta(minutes=5))
+        await store.put(None, pending("a@wingate.test"), expires_at=now + timedelta(minutes=15))
+
+    asyncio.run(resend())
+    store._purge_expired(now + timedelta(minutes=10))   # pops the stale heap entry only
+    assert len(store) == 1
+    store._purge_expired(now + timedelta(minutes=20))
+    assert len(store) == 0
+
+def test_already_expired_entry_is_not_returned():
+    store = InMemoryPendingSignupStore()
+
+    async def scenario():
+        await store.put(None, pending("a@wingate.test"), expires_at=datetime.utcnow() - timedelta(seconds=1))
+        return await store.get(None, "a@wingate.test")
+
+    assert asyncio.run(scenario()) is None
+
+def test_add_attempt_counts_guesses():
+    store = InMemoryPendingSignupStore()
+
+    async def scenario():
+        await store.put(None, pending("a@wingate.test"))
+        counts = [await store.add_attempt(None, "a@wingate.test") for _ in range(3)]
+        return counts, await store.add_attempt(None, "missing@wingate.test"), await store.get(None, "a@wingate.test")
+
+    counts, missing, stored = asyncio.run(scenario())
+    assert counts == [1, 2, 3]
+    assert missing is None
+    assert stored.attempts == 3
+
+def test_add_attempt_ignores_finished_signups():
+    store = InMemoryPendingSignupStore()
+    data = pending("a@wingate.test")
+    data.signup_pending = False
+
+    async def scenario():
+        await store.put(None, data)
+        return await store.add_attempt(None, "a@wingate.test")
+
+    assert asyncio.run(scenario()) is None
+
+def test_store_interface_is_abstract():
+    class Incomplete(PendingSignupStore):
+        async def get(self, db, email):
+            return None
+
+    with pytest.raises(TypeError):
+        PendingSignupStore()
+    with pytest.raises(TypeError):
+        Incomplete()
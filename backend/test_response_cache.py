@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Response cache tests: keys on the in-memory backend (no Redis needed), and the
+endpoints serving a fresh response after every kind of write
+
+Usage: python -m pytest test_response_cache.py
+"""
+
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from response_cache import InMemoryResponseCacheBackend, ResponseCache, ResponseCacheBackend, create_response_cache, owner_key
+
+class Summary(BaseModel):
+    total_hours: float
+
+class Builder:
+    """Counts builds, returning the current total each time"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_hours = 1.0
+
+    async def __call__(self) -> Summary:
+        self.calls += 1
+        return Summary(total_hours=self.total_hours)
+
+def test_owner_key():
+    assert owner_key(1, None) == "user:1"
+    assert owner_key(None, "abc") == "visitor:abc"
+
+def test_second_read_is_a_hit():
+    cache = ResponseCache(InMemoryResponseCacheBackend())
+    build = Builder()
+
+    async def scenario():
+        first = await cache.get_or_build("month", "user:1", 1, (2024, 2), Summary, build)
+        second = await cache.get_or_build("month", "user:1", 1, (2024, 2), Summary, build)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == Summary(total_hours=1.0)
+    assert build.calls == 1
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+def test_params_and_owner_are_part_of_the_key():
+    cache = ResponseCache(InMemoryResponseCacheBackend())
+    build = Builder()
+
+    async def scenario():
+        await cache.get_or_build("month", "user:1", 1, (2024, 2, False), Summary, build)
+        await cache.get_or_build("month", "user:1", 1, (2024, 2, True), Summary, build)
+        await cache.get_or_build("month", "user:2", 1, (2024, 2, False), Summary, build)
+        await cache.get_or_build("month", "visitor:1", 1, (2024, 2, False), Summary, build)
+
+    asyncio.run(scenario())
+    assert build.calls == 4
+
+def test_new_data_version_rebuilds():
+    cache = ResponseCache(InMemoryResponseCacheBackend())
+    build = Builder()
+
+    async def scenario():
+        await cache.get_or_build("month", "user:1", 1, (2024, 2), Summary, build)
+        build.total_hours = 5.0
+        return await cache.get_or_build("month", "user:1", 2, (2024, 2), Summary, build)
+
+    assert asyncio.run(scenario()) == Summary(total_hours=5.0)
+    assert build.calls == 2
+
+def test_unknown_backend_is_rejected():
+    assert isinstance(create_response_cache("memory").backend, InMemoryResponseCacheBackend)
+    with pytest.raises(ValueError):
+        create_response_cache("memcached")
+
+def test_backend_interface_is_abstract():
+    class Incomplete(ResponseCacheBackend):
+        async def get(self, key, model):
+            return None
+
+    with pytest.raises(TypeError):
+        ResponseCacheBackend()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_month_summary_is_fresh_after_save_goal_and_delete(api, visitor_id):
+    month = f"/api/study-hours/visitor/{visitor_id}/2/2024"
+
+    async def scenario(client):
+        seen = []
+        writes = [
+            ("POST", f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}", {"month": 2, "year": 2024, "day": 1, "hours": 4}),
+            ("PUT", f"/api/study-hours/visitor/{visitor_id}/goal", {"daily_hours": 1}),
+            ("DELETE", f"/api/study-hours/visitor/{visitor_id}/all", None),
+        ]
+        for method, path, body in writes:
+            await client.get(month)   # cached before the write
+            response = await client.request(method, path, json=body)
+            assert response.status_code == 200, response.text
+            summary = (await client.get(month)).json()
+            seen.append((summary["total_hours"], summary["pacing"]["target_hours"]))
+        return seen
+
+    after_save, after_goal, after_delete = api(scenario)
+    assert after_save[0] == 4.0
+    assert after_goal == (4.0, 29.0)   # February 2024 at 1 hour a day
+    assert after_delete[0] == 0.0
+
+def test_curriculum_subject_is_fresh_after_a_save(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        topic = {"subject": "Databases", "topic": "SQL"}
+        assert (await client.post("/api/curriculum/save", json=topic, headers=headers)).status_code == 200
+        before = (await client.get("/api/curriculum/subject/Databases", headers=headers)).json()
+        assert (await client.post("/api/curriculum/save", json={**topic, "tested": True}, headers=headers)).status_code == 200
+        after = (await client.get("/api/curriculum/subject/Databases", headers=headers)).json()
+        return before["tested_count"], after["tested_count"]
+
+    assert api(scenario) == (0, 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Study analytics tests: the numpy metrics, plus the per-owner cache keyed by
+the study hours data version
+
+Usage: python -m pytest test_study_analytics.py
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from database_models import StudyHours
+from study_analytics import TREND_DAYS, compute_study_analytics, get_study_analytics
+
+def history(*days):
+    """Parallel (dates, hours) arrays from (iso date, hours) pairs"""
+    return (
+        np.array([day for day, _ in days], dtype="datetime64[D]"),
+        np.array([hours for _, hours in days], dtype=float)
+    )
+
+def test_three_day_streak_up_to_today():
+    analytics = compute_study_analytics(*history(("2024-03-08", 2), ("2024-03-09", 3), ("2024-03-10", 4)), date(2024, 3, 10))
+
+    assert analytics.current_streak == 3
+    assert analytics.longest_streak == 3
+    assert analytics.total_hours == 9
+    assert analytics.days_logged == 3
+    assert analytics.first_study_date == date(2024, 3, 8)
+    assert analytics.last_study_date == date(2024, 3, 10)
+    assert analytics.rolling_7_day_average == pytest.approx(9 / 7)
+    assert analytics.rolling_30_day_average == pytest.approx(9 / 30)
+
+def test_streak_ending_yesterday_is_still_current():
+    study = history(("2024-03-07", 1), ("2024-03-08", 1), ("2024-03-09", 1))
+
+    assert compute_study_analytics(*study, date(2024, 3, 10)).current_streak == 3
+    assert compute_study_analytics(*study, date(2024, 3, 11)).current_streak == 0
+
+def test_longest_streak_outlives_a_gap():
+    study = history(
+        ("2024-03-01", 1), ("2024-03-02", 1), ("2024-03-03", 1), ("2024-03-04", 1),
+        ("2024-03-09", 1), ("2024-03-10", 1)
+    )
+    analytics = compute_study_analytics(*study, date(2024, 3, 10))
+
+    assert analytics.longest_streak == 4
+    assert analytics.current_streak == 2
+
+def test_zero_hour_day_breaks_the_streak():
+    analytics = compute_study_analytics(*history(("2024-03-08", 2), ("2024-03-09", 0), ("2024-03-10", 2)), date(2024, 3, 10))
+
+    assert analytics.current_streak == 1
+    assert analytics.days_logged == 2
+
+def test_trend_has_rolling_averages_per_day():
+    analytics = compute_study_analytics(*history(("2024-03-01", 7), ("2024-03-10", 14)), date(2024, 3, 10))
+
+    assert len(analytics.trend) == TREND_DAYS
+    assert analytics.trend[0].date == date(2024, 2, 10)
+    by_day = {point.date: point for point in analytics.trend}
+    assert by_day[date(2024, 3, 1)].hours == 7
+    assert by_day[date(2024, 3, 7)].rolling_7_day_average == pytest.approx(1.0)   # 03-01..03-07
+    assert by_day[date(2024, 3, 8)].rolling_7_day_average == 0                     # 03-02..03-08
+    assert by_day[date(2024, 3, 10)].rolling_7_day_average == pytest.approx(2.0)
+    assert by_day[date(2024, 3, 10)].rolling_30_day_average == pytest.approx(21 / 30)
+
+def test_weekday_distribution():
+    # 2024-03-04 and 2024-03-11 are Mondays, 2024-03-06 is a Wednesday
+    analytics = compute_study_analytics(*history(("2024-03-04", 2), ("2024-03-06", 1), ("2024-03-11", 4)), date(2024, 3, 11))
+    by_weekday = {stats.weekday: stats for stats in analytics.weekday_distribution}
+
+    assert [stats.weekday for stats in analytics.weekday_distribution][0] == "Monday"
+    assert (by_weekday["Monday"].total_hours, by_weekday["Monday"].days_logged, by_weekday["Monday"].average_hours) == (6, 2, 3)
+    assert (by_weekday["Wednesday"].total_hours, by_weekday["Wednesday"].days_logged) == (1, 1)
+    assert by_weekday["Sunday"].days_logged == 0
+    assert by_weekday["Sunday"].average_hours == 0
+
+def test_future_days_are_ignored_by_the_series():
+    analytics = compute_study_analytics(*history(("2024-03-10", 2), ("2024-03-12", 5)), date(2024, 3, 10))
+
+    assert analytics.current_streak == 1
+    assert analytics.rolling_7_day_average == pytest.approx(2 / 7)
+
+def test_empty_history():
+    analytics = compute_study_analytics(*history(), date(2024, 3, 10))
+
+    assert (analytics.current_streak, analytics.longest_streak, analytics.days_logged) == (0, 0, 0)
+    assert analytics.first_study_date is None
+    assert analytics.rolling_7_day_average == 0
+    assert len(analytics.trend) == TREND_DAYS
+
+def test_cache_misses_when_the_data_version_changes(db_session, visitor_id):
+    async def scenario(db):
+        def study_day(day):
+            return StudyHours(visitor_id=visitor_id, year=2024, month=3, day=day, study_date=date(2024, 3, day), hours=2)
+
+        db.add(study_day(1))
+        await db.commit()
+        first = await get_study_analytics(db, 1, visitor_id=visitor_id)
+        # Written by "another worker": this process's cache was never told
+        db.add(study_day(2))
+        await db.commit()
+        same_version = await get_study_analytics(db, 1, visitor_id=visitor_id)
+        new_version = await get_study_analytics(db, 2, visitor_id=visitor_id)
+        return first, same_version, new_version
+
+    first, same_version, new_version = db_session(scenario)
+    assert same_version is first
+    assert new_version.days_logged == 2
+    assert new_version.total_hours == 4
+
+def test_analytics_endpoint_reflects_each_save(api, visitor_id):
+    async def scenario(client):
+        results = []
+        for day in (1, 2):
+            saved = await client.post(
+                f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+                json={"month": 3, "year": 2024, "day": day, "hours": 3}
+            )
+            assert saved.status_code == 200, saved.text
+            response = await client.get(f"/api/study-hours/visitor/{visitor_id}/analytics")
+            assert response.status_code == 200, response.text
+            results.append((response.headers["etag"], response.json()["days_logged"]))
+        return results
+
+    (first_etag, first_days), (second_etag, second_days) = api(scenario)
+    assert (first_days, second_days) == (1, 2)
+    assert first_etag != second_etag
+
+def test_analytics_endpoint_counts_streaks_up_to_today(api, register_user):
+    today = date.today()
+    # Three days up to today, then a gap, then a two day run
+    days = [today - timedelta(days=offset) for offset in (0, 1, 2, 5, 6)]
+
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        for day in days:
+            saved = await client.post(
+                "/api/study-hours/save-day",
+                json={"year": day.year, "month": day.month, "day": day.day, "hours": 2},
+                headers=headers
+            )
+            assert saved.status_code == 200, saved.text
+        first = await client.get("/api/study-hours/analytics", headers=headers)
+        again = await client.get("/api/study-hours/analytics", headers={**headers, "If-None-Match": first.headers["etag"]})
+        return first, again
+
+    first, again = api(scenario)
+    assert first.status_code == 200, first.text
+    analytics = first.json()
+    assert (analytics["current_streak"], analytics["longest_streak"]) == (3, 3)
+    assert (analytics["days_logged"], analytics["total_hours"]) == (5, 10.0)
+    assert (analytics["first_study_date"], analytics["last_study_date"]) == (days[-1].isoformat(), today.isoformat())
+    assert again.status_code == 304
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Month pacing tests: the calendar math, and goal-aware pacing through the
+goal and month endpoints
+
+Usage: python -m pytest test_study_goals.py
+"""
+
+from datetime import date
+
+import pytest
+
+from study_goals import DEFAULT_DAILY_HOURS, days_in_month, month_pacing, remaining_days_in_month
+
+def test_days_in_month_handles_leap_years():
+    assert days_in_month(2024, 2) == 29
+    assert days_in_month(2023, 2) == 28
+    assert days_in_month(2024, 4) == 30
+
+def test_remaining_days_count_today():
+    assert remaining_days_in_month(2024, 2, date(2024, 2, 20)) == 10
+    assert remaining_days_in_month(2024, 2, date(2024, 2, 29)) == 1
+    assert remaining_days_in_month(2024, 1, date(2024, 2, 20)) == 0
+    assert remaining_days_in_month(2024, 3, date(2024, 2, 20)) == 31
+
+def test_pacing_mid_month():
+    pacing = month_pacing(2024, 2, total_hours=29, daily_hours=2, today=date(2024, 2, 20))
+
+    assert pacing.days_in_month == 29
+    assert pacing.target_hours == 58
+    assert pacing.progress_percentage == pytest.approx(50)
+    assert pacing.remaining_days == 10
+    assert pacing.hours_remaining == 29
+    assert pacing.required_daily_hours == pytest.approx(2.9)
+
+def test_pacing_target_met():
+    pacing = month_pacing(2024, 2, total_hours=60, daily_hours=2, today=date(2024, 2, 20))
+
+    assert pacing.hours_remaining == 0
+    assert pacing.required_daily_hours == 0
+    assert pacing.progress_percentage > 100
+
+def test_pacing_past_month_missed():
+    pacing = month_pacing(2024, 1, total_hours=10, daily_hours=1, today=date(2024, 2, 20))
+
+    assert pacing.remaining_days == 0
+    assert pacing.hours_remaining == 21
+    assert pacing.required_daily_hours is None
+
+def test_pacing_future_month_spreads_over_every_day():
+    pacing = month_pacing(2024, 4, total_hours=0, daily_hours=3, today=date(2024, 2, 20))
+
+    assert pacing.remaining_days == 30
+    assert pacing.required_daily_hours == 3
+
+def test_goal_defaults_until_set(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        before = (await client.get("/api/study-hours/goal", headers=headers)).json()
+        saved = (await client.put("/api/study-hours/goal", json={"daily_hours": 2.5}, headers=headers)).json()
+        after = (await client.get("/api/study-hours/goal", headers=headers)).json()
+        return before, saved, after
+
+    before, saved, after = api(scenario)
+    assert before == {"daily_hours": DEFAULT_DAILY_HOURS, "is_default": True}
+    assert saved == after == {"daily_hours": 2.5, "is_default": False}
+
+def test_month_pacing_follows_the_owner_goal(api, visitor_id):
+    # 2099 is in the future, so every day of the month is still ahead
+    async def scenario(client):
+        await client.put(f"/api/study-hours/visitor/{visitor_id}/goal", json={"daily_hours": 2})
+        await client.post(
+            f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+            json={"year": 2099, "month": 2, "day": 1, "hours": 7}
+        )
+        return (await client.get(f"/api/study-hours/visitor/{visitor_id}/2/2099")).json()
+
+    body = api(scenario)
+    pacing = body["pacing"]
+    assert (pacing["daily_goal_hours"], pacing["days_in_month"], pacing["target_hours"]) == (2.0, 28, 56.0)
+    assert (pacing["remaining_days"], pacing["hours_remaining"]) == (28, 49.0)
+    assert pacing["required_daily_hours"] == pytest.approx(49 / 28)
+    assert body["progress_percentage"] == pytest.approx(12.5)
+
+def test_goals_belong_to_one_owner(api, visitor_id):
+    other = f"{visitor_id}-other"
+
+    async def scenario(client):
+        await client.put(f"/api/study-hours/visitor/{visitor_id}/goal", json={"daily_hours": 1})
+        return (await client.get(f"/api/study-hours/visitor/{other}/2/2024")).json()["pacing"]
+
+    assert api(scenario)["daily_goal_hours"] == DEFAULT_DAILY_HOURS
+
+def test_out_of_range_goals_are_rejected(api, visitor_id):
+    async def scenario(client):
+        url = f"/api/study-hours/visitor/{visitor_id}/goal"
+        return [(await client.put(url, json={"daily_hours": hours})).status_code for hours in (0, -1, 25)]
+
+    assert api(scenario) == [422, 422, 422]
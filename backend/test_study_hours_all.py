@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+/api/study-hours/all tests: keyset pages and the streamed whole history
+
+Usage: python -m pytest test_study_hours_all.py
+"""
+
+import json
+
+from database_models import async_engine, get_pool_stats
+
+DAYS = [(2024, 1, 31, 1.0), (2024, 2, 1, 2.0), (2024, 2, 2, 3.0), (2023, 12, 25, 4.0)]
+
+async def save_days(client, headers):
+    for year, month, day, hours in DAYS:
+        response = await client.post("/api/study-hours/save-day", json={"year": year, "month": month, "day": day, "hours": hours}, headers=headers)
+        assert response.status_code == 200, response.text
+
+def test_pages_follow_the_cursor_in_date_order(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        await save_days(client, headers)
+        pages, cursor = [], None
+        while True:
+            url = "/api/study-hours/all?limit=3" + (f"&cursor={cursor}" if cursor else "")
+            response = await client.get(url, headers=headers)
+            assert response.status_code == 200, response.text
+            pages.append([(row["year"], row["month"], row["day"]) for row in response.json()])
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                return pages
+
+    assert api(scenario) == [[(2023, 12, 25), (2024, 1, 31), (2024, 2, 1)], [(2024, 2, 2)]]
+
+def test_stream_ndjson_and_json(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        await save_days(client, headers)
+        ndjson = await client.get("/api/study-hours/all?stream=ndjson&fields=day,hours", headers=headers)
+        array = await client.get("/api/study-hours/all?stream=json", headers=headers)
+        return ndjson, array, get_pool_stats(async_engine)
+
+    ndjson, array, pool = api(scenario)
+    assert ndjson.status_code == array.status_code == 200
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert "etag" in ndjson.headers
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == [
+        {"day": 25, "hours": 4.0}, {"day": 31, "hours": 1.0}, {"day": 1, "hours": 2.0}, {"day": 2, "hours": 3.0}
+    ]
+    assert [row["hours"] for row in array.json()] == [4.0, 1.0, 2.0, 3.0]
+    # Both the request session and the stream's own session went back to the pool
+    assert pool["checked_out"] == 0
+
+def test_stream_of_an_empty_history_is_valid_json(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        return await client.get("/api/study-hours/all?stream=json", headers=headers)
+
+    response = api(scenario)
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_stream_cannot_be_combined_with_paging(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        return (
+            await client.get("/api/study-hours/all?stream=ndjson&limit=10", headers=headers),
+            await client.get("/api/study-hours/all?cursor=bogus!", headers=headers),
+        )
+
+    streamed_page, bad_cursor = api(scenario)
+    assert streamed_page.status_code == 400
+    assert bad_cursor.status_code == 400
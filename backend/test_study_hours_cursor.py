@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Study hours pagination cursor tests (no database needed)
+
+Usage: python -m pytest test_study_hours_cursor.py
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from study_hours_endpoints import STUDY_HOURS_COLUMNS, decode_study_hours_cursor, encode_study_hours_cursor, study_hours_columns
+
+@pytest.mark.parametrize("position", [(2024, 2, 29), (2023, 12, 31), (2025, 1, 1)])
+def test_cursor_round_trip(position):
+    cursor = encode_study_hours_cursor(*position)
+
+    assert "=" not in cursor
+    assert decode_study_hours_cursor(cursor) == position
+
+def test_cursor_is_url_safe():
+    cursor = encode_study_hours_cursor(2024, 10, 17)
+
+    assert all(char.isalnum() or char in "-_" for char in cursor)
+
+@pytest.mark.parametrize("cursor", ["", "!!!", "bm90LWEtZGF0ZQ", "MjAyNC0y", "__8"])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_study_hours_cursor(cursor)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
+
+def test_columns_follow_the_projection():
+    assert [column.key for column in study_hours_columns(["hours", "day"])] == ["day", "hours"]
+    assert study_hours_columns(None) is STUDY_HOURS_COLUMNS
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Month summary tests: totals, averages and the per-day list for one owner's
+month, and the summary_only mode
+
+Usage: python -m pytest test_study_hours_month.py
+"""
+
+DAYS = [(1, 2.0), (2, 4.5), (10, 1.5)]
+
+async def save_month(client, headers):
+    entries = [{"year": 2024, "month": 2, "day": day, "hours": hours} for day, hours in DAYS]
+    response = await client.post("/api/study-hours/save-days", json={"entries": entries}, headers=headers)
+    assert response.status_code == 200, response.text
+
+def test_month_totals_and_days(api, register_user):
+    async def scenario(client):
+        headers, user = await register_user(client)
+        await save_month(client, headers)
+        return user, (await client.get("/api/study-hours/month/2/2024", headers=headers)).json()
+
+    user, body = api(scenario)
+    assert (body["total_hours"], body["days_logged"], body["max_day_hours"], body["average_hours"]) == (8.0, 3, 4.5, 8.0 / 3)
+    assert [(row["day"], row["hours"]) for row in body["data"]] == DAYS
+    assert {(row["user_id"], row["month"], row["year"]) for row in body["data"]} == {(user["id"], 2, 2024)}
+
+def test_summary_only_skips_the_days(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        await save_month(client, headers)
+        full = await client.get("/api/study-hours/month/2/2024", headers=headers)
+        summary = await client.get("/api/study-hours/month/2/2024?summary_only=true", headers=headers)
+        return full.json(), summary.json()
+
+    full, summary = api(scenario)
+    assert summary["data"] == []
+    assert {key: value for key, value in summary.items() if key != "data"} == {key: value for key, value in full.items() if key != "data"}
+
+def test_empty_month_and_other_months_are_zero(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        await save_month(client, headers)
+        return (await client.get("/api/study-hours/month/3/2024", headers=headers)).json()
+
+    body = api(scenario)
+    assert (body["total_hours"], body["days_logged"], body["max_day_hours"], body["average_hours"]) == (0.0, 0, 0.0, 0.0)
+    assert body["data"] == []
+
+def test_invalid_month_is_rejected(api, register_user, visitor_id):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        return (
+            (await client.get("/api/study-hours/month/13/2024", headers=headers)).status_code,
+            (await client.get(f"/api/study-hours/visitor/{visitor_id}/0/2024?summary_only=true")).status_code,
+        )
+
+    assert api(scenario) == (400, 400)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Date range tests: the study_date column, day/week/month buckets and
+calendar validation of saved days
+
+Usage: python -m pytest test_study_hours_range.py
+"""
+
+from datetime import date
+
+from sqlalchemy import select
+
+from database_models import StudyHours
+
+# 2024-01-29 and 2024-02-05 are Mondays
+DAYS = [(2024, 1, 29, 1.0), (2024, 1, 31, 2.0), (2024, 2, 4, 3.0), (2024, 2, 5, 4.0), (2024, 3, 1, 5.0)]
+
+def range_buckets(api, visitor_id, query):
+    async def scenario(client):
+        for year, month, day, hours in DAYS:
+            saved = await client.post(
+                f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+                json={"year": year, "month": month, "day": day, "hours": hours}
+            )
+            assert saved.status_code == 200, saved.text
+        return await client.get(f"/api/study-hours/visitor/{visitor_id}/range?{query}")
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return body, [(bucket["start"], bucket["total_hours"], bucket["days_logged"]) for bucket in body["buckets"]]
+
+def test_saves_fill_study_date(api, db_session, visitor_id):
+    range_buckets(api, visitor_id, "from=2024-01-01&to=2024-12-31")
+
+    async def scenario(db):
+        return (await db.scalars(
+            select(StudyHours.study_date).where(StudyHours.visitor_id == visitor_id).order_by(StudyHours.study_date)
+        )).all()
+
+    assert db_session(scenario) == [date(year, month, day) for year, month, day, _ in DAYS]
+
+def test_day_buckets_within_the_range(api, visitor_id):
+    body, buckets = range_buckets(api, visitor_id, "from=2024-01-30&to=2024-02-04")
+
+    assert buckets == [("2024-01-31", 2.0, 1), ("2024-02-04", 3.0, 1)]
+    assert (body["total_hours"], body["days_logged"], body["average_hours"]) == (5.0, 2, 2.5)
+
+def test_week_buckets_start_on_monday(api, visitor_id):
+    _, buckets = range_buckets(api, visitor_id, "from=2024-01-01&to=2024-03-31&bucket=week")
+
+    assert buckets == [("2024-01-29", 6.0, 3), ("2024-02-05", 4.0, 1), ("2024-02-26", 5.0, 1)]
+
+def test_month_buckets(api, visitor_id):
+    body, buckets = range_buckets(api, visitor_id, "from=2024-01-01&to=2024-03-31&bucket=month")
+
+    assert buckets == [("2024-01-01", 3.0, 2), ("2024-02-01", 7.0, 2), ("2024-03-01", 5.0, 1)]
+    assert body["bucket"] == "month"
+
+def test_reversed_range_and_unknown_bucket_are_rejected(api, visitor_id):
+    async def scenario(client):
+        base = f"/api/study-hours/visitor/{visitor_id}/range"
+        return (
+            (await client.get(f"{base}?from=2024-02-01&to=2024-01-01")).status_code,
+            (await client.get(f"{base}?from=2024-01-01&to=2024-02-01&bucket=year")).status_code,
+        )
+
+    assert api(scenario) == (400, 422)
+
+def test_impossible_dates_are_rejected(api, visitor_id):
+    async def scenario(client):
+        statuses = []
+        for year, month, day in [(2024, 2, 30), (2023, 2, 29), (2024, 13, 1)]:
+            response = await client.post(
+                f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+                json={"year": year, "month": month, "day": day, "hours": 1}
+            )
+            statuses.append(response.status_code)
+        leap_day = await client.post(
+            f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+            json={"year": 2024, "month": 2, "day": 29, "hours": 1}
+        )
+        return statuses, leap_day.status_code
+
+    assert api(scenario) == ([422, 422, 422], 200)
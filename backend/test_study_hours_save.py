@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Study hours save tests: batch saves of a month for users and visitors, and
+the one-row-per-day upsert behind every save
+
+Usage: python -m pytest test_study_hours_save.py
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from database_models import StudyHours, async_engine
+
+def day(day, hours, month=2, year=2024):
+    return {"year": year, "month": month, "day": day, "hours": hours}
+
+def test_batch_save_returns_the_month_summary(api, register_user):
+    async def scenario(client):
+        headers, _ = await register_user(client)
+        saved = await client.post("/api/study-hours/save-days", json={"entries": [day(1, 2), day(2, 3), day(3, 4)]}, headers=headers)
+        month = await client.get("/api/study-hours/month/2/2024", headers=headers)
+        return saved, month
+
+    saved, month = api(scenario)
+    assert saved.status_code == 200, saved.text
+    body = saved.json()
+    assert [(row["day"], row["hours"]) for row in body["data"]] == [(1, 2.0), (2, 3.0), (3, 4.0)]
+    assert (body["total_hours"], body["days_logged"]) == (9.0, 3)
+    assert month.json()["total_hours"] == 9.0
+
+def test_visitor_batch_save_updates_existing_days(api, db_session, visitor_id):
+    async def scenario(client):
+        url = f"/api/study-hours/visitor/save-days?visitor_id={visitor_id}"
+        await client.post(url, json={"entries": [day(1, 1), day(2, 1)]})
+        return await client.post(url, json={"entries": [day(2, 5), day(3, 1)]})
+
+    async def rows(db):
+        return await db.scalar(select(func.count()).where(StudyHours.visitor_id == visitor_id))
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    assert [(row["day"], row["hours"]) for row in response.json()["data"]] == [(1, 1.0), (2, 5.0), (3, 1.0)]
+    assert db_session(rows) == 3
+
+def test_repeated_day_keeps_the_last_entry(api, visitor_id):
+    async def scenario(client):
+        return await client.post(
+            f"/api/study-hours/visitor/save-days?visitor_id={visitor_id}",
+            json={"entries": [day(1, 2), day(1, 6), day(4, 1)]}
+        )
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    assert [(row["day"], row["hours"]) for row in response.json()["data"]] == [(1, 6.0), (4, 1.0)]
+
+def test_empty_and_mixed_month_batches_are_rejected(api, db_session, visitor_id):
+    async def scenario(client):
+        url = f"/api/study-hours/visitor/save-days?visitor_id={visitor_id}"
+        return (
+            await client.post(url, json={"entries": []}),
+            await client.post(url, json={"entries": [day(31, 1, month=1), day(1, 1)]}),
+        )
+
+    async def rows(db):
+        return await db.scalar(select(func.count()).where(StudyHours.visitor_id == visitor_id))
+
+    empty, mixed = api(scenario)
+    assert empty.status_code == mixed.status_code == 400
+    assert mixed.json()["detail"] == "All entries must belong to the same month"
+    # Nothing of the rejected batch was written
+    assert db_session(rows) == 0
+
+def test_saving_a_day_twice_updates_one_row(api, db_session, register_user):
+    async def scenario(client):
+        headers, user = await register_user(client)
+        first = await client.post("/api/study-hours/save-day", json=day(5, 2), headers=headers)
+        second = await client.post("/api/study-hours/save-day", json=day(5, 3.5), headers=headers)
+        return user, first.json(), second.json()
+
+    user, first, second = api(scenario)
+
+    async def rows(db):
+        return (await db.execute(select(StudyHours.id, StudyHours.hours).where(StudyHours.user_id == user["id"]))).all()
+
+    assert second["id"] == first["id"]
+    assert second["hours"] == 3.5
+    assert db_session(rows) == [(first["id"], 3.5)]
+
+@pytest.mark.skipif(async_engine.dialect.name == "sqlite", reason="SQLite runs one write transaction at a time, the race needs Postgres")
+def test_concurrent_saves_of_one_day_leave_one_row(api, db_session, visitor_id):
+    async def scenario(client):
+        url = f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}"
+        responses = await asyncio.gather(*(client.post(url, json=day(7, hours)) for hours in (1, 2, 3, 4)))
+        return [response.status_code for response in responses]
+
+    async def rows(db):
+        return (await db.scalars(select(StudyHours.hours).where(StudyHours.visitor_id == visitor_id))).all()
+
+    assert api(scenario) == [200] * 4
+    hours = db_session(rows)
+    assert len(hours) == 1 and hours[0] in (1.0, 2.0, 3.0, 4.0)
+
+def test_unique_index_rejects_a_duplicate_day(db_session, visitor_id):
+    async def scenario(db):
+        row = dict(visitor_id=visitor_id, year=2024, month=2, day=9, hours=1.0)
+        db.add(StudyHours(**row))
+        await db.commit()
+        db.add(StudyHours(**row))
+        with pytest.raises(IntegrityError):
+            await db.commit()
+        await db.rollback()
+
+    db_session(scenario)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Monthly rollup tests: every save and delete keeps study_hours_monthly in step
+with the raw rows, and month summaries read their totals from it
+
+Usage: python -m pytest test_study_rollups.py
+"""
+
+from sqlalchemy import select
+
+from database_models import StudyHoursMonthly
+
+def save_day(client, visitor_id, day, hours, month=2):
+    return client.post(
+        f"/api/study-hours/visitor/save-day?visitor_id={visitor_id}",
+        json={"month": month, "year": 2024, "day": day, "hours": hours}
+    )
+
+def month_totals(body):
+    return body["total_hours"], body["days_logged"], body["max_day_hours"], body["average_hours"]
+
+def rollup_rows(db_session, visitor_id):
+    async def scenario(db):
+        return (await db.execute(
+            select(StudyHoursMonthly.month, StudyHoursMonthly.total_hours, StudyHoursMonthly.days_logged, StudyHoursMonthly.max_day_hours)
+            .where(StudyHoursMonthly.visitor_id == visitor_id)
+            .order_by(StudyHoursMonthly.month)
+        )).all()
+
+    return [tuple(row) for row in db_session(scenario)]
+
+def test_saves_refresh_the_month_rollup(api, db_session, visitor_id):
+    async def scenario(client):
+        for day, hours in [(1, 5), (2, 3)]:
+            assert (await save_day(client, visitor_id, day, hours)).status_code == 200
+        assert (await save_day(client, visitor_id, 1, 2, month=3)).status_code == 200
+        full = await client.get(f"/api/study-hours/visitor/{visitor_id}/2/2024")
+        summary = await client.get(f"/api/study-hours/visitor/{visitor_id}/2/2024?summary_only=true")
+        return full.json(), summary.json()
+
+    full, summary = api(scenario)
+    assert rollup_rows(db_session, visitor_id) == [(2, 8.0, 2, 5.0), (3, 2.0, 1, 2.0)]
+    assert month_totals(full) == month_totals(summary) == (8.0, 2, 5.0, 4.0)
+    assert [(entry["day"], entry["hours"]) for entry in full["data"]] == [(1, 5.0), (2, 3.0)]
+    assert summary["data"] == []
+
+def test_overwrite_can_lower_the_best_day(api, db_session, visitor_id):
+    async def scenario(client):
+        for day, hours in [(1, 5), (2, 3), (1, 1)]:
+            assert (await save_day(client, visitor_id, day, hours)).status_code == 200
+        return (await client.get(f"/api/study-hours/visitor/{visitor_id}/2/2024?summary_only=true")).json()
+
+    summary = api(scenario)
+    assert rollup_rows(db_session, visitor_id) == [(2, 4.0, 2, 3.0)]
+    assert month_totals(summary) == (4.0, 2, 3.0, 2.0)
+
+def test_bulk_save_refreshes_the_rollup(api, db_session, visitor_id):
+    async def scenario(client):
+        entries = [{"month": 2, "year": 2024, "day": day, "hours": day} for day in (1, 2, 3)]
+        response = await client.post(f"/api/study-hours/visitor/save-days?visitor_id={visitor_id}", json={"entries": entries})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    body = api(scenario)
+    assert rollup_rows(db_session, visitor_id) == [(2, 6.0, 3, 3.0)]
+    assert month_totals(body) == (6.0, 3, 3.0, 2.0)
+
+def test_delete_all_drops_the_rollup(api, db_session, visitor_id):
+    async def scenario(client):
+        for month in (2, 3):
+            assert (await save_day(client, visitor_id, 1, 4, month=month)).status_code == 200
+        deleted = await client.delete(f"/api/study-hours/visitor/{visitor_id}/all")
+        assert deleted.status_code == 200, deleted.text
+        return (await client.get(f"/api/study-hours/visitor/{visitor_id}/2/2024")).json()
+
+    after = api(scenario)
+    assert rollup_rows(db_session, visitor_id) == []
+    assert month_totals(after) == (0.0, 0, 0.0, 0.0)
+    assert after["data"] == []
@@ -1,11 +1,21 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import jwt
 import os
+import threading
 from datetime import datetime, timedelta
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import HTTPException, status, Depends
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
+from cache import TTLCache
+from database_models import get_async_db, User
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -23,6 +33,83 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHashingPool:
+    """Bounded thread pool for password hashing, rejects work when the queue is full"""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _call(self, func, *args):
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _finished(self, future):
+        # Done callback of the executor future: runs when the job has really finished
+        # (or was cancelled before it started), even if the awaiting request was cancelled
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def run(self, func, *args):
+        """Run func(*args) on the pool, or raise 503 when max_workers + max_queue jobs are in flight"""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please try again",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+
+        try:
+            future = self._executor.submit(self._call, func, *args)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.in_flight - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_pool = PasswordHashingPool(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64")),
+)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hashing pool"""
+    return await password_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hashing pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,20 +120,117 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Claims carried by access tokens
+class TokenClaims(BaseModel):
+    sub: str                    # user email
+    uid: Optional[int] = None   # user id (missing in tokens issued before claims were added)
+    ver: int = 0                # users.token_version when the token was issued
+    exp: datetime
+
+# users.token_version per user id, shared by every worker through the database and
+# cached briefly here: a revoked token stops working everywhere within the TTL
+token_version_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", "5")),
+)
+
+def create_user_access_token(user: User, expires_delta: timedelta = None):
+    """Create an access token carrying the user's id and token version"""
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "ver": user.token_version or 0},
+        expires_delta=expires_delta
+    )
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenClaims:
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return email
-    except jwt.PyJWTError:
+        claims = TokenClaims.model_validate(payload)
+    except (jwt.PyJWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return claims
+
+async def get_token_version(db: AsyncSession, user_id: int) -> Optional[int]:
+    """users.token_version for a user id (None when the user no longer exists)"""
+    token_version = token_version_cache.get(user_id)
+    if token_version is None:
+        token_version = await db.scalar(select(User.token_version).where(User.id == user_id))
+        if token_version is None:
+            return None
+        token_version_cache.set(user_id, token_version)
+    return token_version
+
+async def ensure_token_current(claims: TokenClaims, db: AsyncSession) -> None:
+    """Reject tokens issued before the user's current token_version"""
+    token_version = await get_token_version(db, claims.uid)
+    if token_version is None or claims.ver < token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Resolved user for authenticated requests, cached by token subject (email)
+class CurrentUser(BaseModel):
+    id: int
+    email: str
+    name: str
+    is_verified: bool
+    token_version: int
+    created_at: datetime
+
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+
+async def get_current_user(
+    claims: TokenClaims = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Resolve the authenticated user once per request, from the cache when possible"""
+    current_user = user_cache.get(claims.sub)
+    if current_user is None:
+        user = await db.scalar(select(User).where(User.email == claims.sub))
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        current_user = CurrentUser(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            is_verified=bool(user.is_verified),
+            token_version=user.token_version or 0,
+            created_at=user.created_at
+        )
+        user_cache.set(claims.sub, current_user)
+
+    if claims.uid is not None:
+        await ensure_token_current(claims, db)
+    return current_user
+
+async def get_current_user_id(
+    claims: TokenClaims = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+) -> int:
+    """User id from the token claims, after checking the (briefly cached) token version"""
+    if claims.uid is not None:
+        await ensure_token_current(claims, db)
+        return claims.uid
+    return (await get_current_user(claims, db)).id
+
+def invalidate_cached_user(email: str) -> None:
+    """Drop a user from the cache after their row changes"""
+    user_cache.pop(email)
+
+def revoke_user_tokens(user_id: int, email: str, token_version: int) -> None:
+    """Reject tokens issued before token_version in this worker right away (call after
+    committing the users.token_version bump; other workers see it within the cache TTL)"""
+    token_version_cache.set(user_id, token_version)
+    invalidate_cached_user(email)
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { BookOpen, RotateCcw, CheckCircle2 } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import { curriculumAPI } from '../services/api';
@@ -9,6 +9,8 @@ const Curriculum = ({ darkMode }) => {
   const [expandedSubject, setExpandedSubject] = useState('Engineering Mathematics');
   const [curriculumData, setCurriculumData] = useState({});
   const [syncing, setSyncing] = useState(false);
+  const pendingTopicsRef = useRef({});
+  const flushTimerRef = useRef(null);
   const navigate = useNavigate();
 
   // CS Curriculum Structure
@@ -147,17 +149,29 @@ const Curriculum = ({ darkMode }) => {
     // Update local state immediately
     setCurriculumData(updated);
     
+    // Queue the change, rapid clicks are synced to backend in one request
+    const topicData = updated[subjectName][topic];
+    pendingTopicsRef.current[`${subjectName}::${topic}`] = {
+      subject: subjectName,
+      topic,
+      watched: topicData.watched,
+      revised: topicData.revised,
+      tested: topicData.tested,
+    };
+    clearTimeout(flushTimerRef.current);
+    flushTimerRef.current = setTimeout(flushPendingTopics, 500);
+  };
+
+  const flushPendingTopics = async () => {
+    const topics = Object.values(pendingTopicsRef.current);
+    pendingTopicsRef.current = {};
+    flushTimerRef.current = null;
+    if (topics.length === 0) return;
+
     // Sync to backend
     setSyncing(true);
     try {
-      const topicData = updated[subjectName][topic];
-      await curriculumAPI.saveTopic({
-        subject: subjectName,
-        topic,
-        watched: topicData.watched,
-        revised: topicData.revised,
-        tested: topicData.tested,
-      });
+      await curriculumAPI.saveTopics(topics);
     } catch (error) {
       console.error('Error syncing to backend:', error);
     } finally {
@@ -165,6 +179,12 @@ const Curriculum = ({ darkMode }) => {
     }
   };
 
+  // Send any queued changes when leaving the page
+  useEffect(() => () => {
+    clearTimeout(flushTimerRef.current);
+    flushPendingTopics();
+  }, []);
+
   const getTopicProgress = (subjectName, topic) => {
     const data = curriculumData[subjectName]?.[topic] || { watched: false, revised: false, tested: false };
     return [data.watched, data.revised, data.tested];
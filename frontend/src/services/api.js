@@ -30,17 +30,35 @@ export const authAPI = {
 export const studyHoursAPI = {
   saveDayHours: (month, year, day, hours) =>
     apiClient.post('/study-hours/save-day', { month, year, day, hours }),
+  saveDays: (entries) =>
+    apiClient.post('/study-hours/save-days', { entries }),
   getMonthData: (month, year) =>
     apiClient.get(`/study-hours/month/${month}/${year}`),
+  getMonthSummary: (month, year) =>
+    apiClient.get(`/study-hours/month/${month}/${year}`, { params: { summary_only: true } }),
+  getGoal: () =>
+    apiClient.get('/study-hours/goal'),
+  setGoal: (dailyHours) =>
+    apiClient.put('/study-hours/goal', { daily_hours: dailyHours }),
   getAllData: () =>
-    apiClient.get('/study-hours/all')
+    apiClient.get('/study-hours/all'),
+  getAnalytics: () =>
+    apiClient.get('/study-hours/analytics'),
+  getRange: (from, to, bucket = 'day') =>
+    apiClient.get('/study-hours/range', { params: { from, to, bucket } }),
+  getDataPage: (limit, cursor) =>
+    apiClient.get('/study-hours/all', { params: { limit, cursor } })
 };
 
 export const curriculumAPI = {
   saveTopic: (data) =>
     apiClient.post('/curriculum/save', data),
+  saveTopics: (topics) =>
+    apiClient.post('/curriculum/save-topics', { topics }),
   getAll: () =>
-    apiClient.get('/curriculum/all')
+    apiClient.get('/curriculum/all'),
+  getStats: () =>
+    apiClient.get('/curriculum/all', { params: { stats_only: true } })
 };
 
 export default apiClient;